@@ -0,0 +1,201 @@
+"""Archival of finalized reviews out of the hot ``review_queue`` table.
+
+Approved/rejected rows decided more than ``ARCHIVE_RETENTION_DAYS`` ago are
+written to gzip-compressed JSON Lines files, partitioned by decision date::
+
+    <ARCHIVE_DIR>/date=2026-10-19/part-<ms>-<pid>-<n>.jsonl.gz
+
+and then deleted from ``review_queue``.  Rows carrying a correction keep
+their learner fields (text, correction) in ``review_archive``; group members
+(``dup_of``) have no text and are left out of it.  A row with a
+correction is archived only once the learner has consumed it (its ``seq``
+is at or below the learner watermark).  Files are written and renamed before the
+delete commits.  A crash between the two archives those rows again on the
+next run, so archive files are at-least-once.
+
+Each run ends with an incremental VACUUM step that hands freed pages back
+to the file system.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from . import db
+from .config import ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS, VACUUM_PAGES
+from .review_store import SQLiteReviewStore, get_store
+
+UNDATED = "undated"
+
+
+def _partition(decided_at: Optional[float]) -> str:
+    if decided_at is None:
+        return UNDATED
+    return datetime.fromtimestamp(decided_at, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _write_partition(archive_dir: Path, partition: str, rows: List[Dict], seq: int) -> Path:
+    """Write *rows* as one new gzip JSONL file of *partition*; atomic via rename."""
+    folder = archive_dir / f"date={partition}"
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"part-{int(time.time() * 1000)}-{os.getpid()}-{seq}.jsonl.gz"
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows:
+                gz.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def _store_path() -> Optional[Path]:
+    """Database of the configured store; archival is SQLite-only."""
+    store = get_store()
+    if not isinstance(store, SQLiteReviewStore):
+        raise RuntimeError("archival is only implemented for the SQLite review store")
+    return store.path
+
+
+def archive_reviews(
+    retention_days: float = ARCHIVE_RETENTION_DAYS,
+    archive_dir: str = ARCHIVE_DIR,
+    batch_size: int = 5000,
+    vacuum_pages: int = VACUUM_PAGES,
+    now: Optional[float] = None,
+) -> Dict[str, int]:
+    """Move finalized reviews older than *retention_days* to the archive.
+
+    Works in batches of *batch_size* rows, one transaction each.  Returns the
+    number of archived rows, written files and pages freed by the VACUUM step.
+    Only the SQLite store is archived.
+    """
+    path = _store_path()
+    db.init_db(path)
+    cutoff = (now if now is not None else time.time()) - retention_days * 86400
+    watermark = db.get_learner_watermark(path)
+    folder = Path(archive_dir)
+    archived = 0
+    files = 0
+    while True:
+        conn = db.get_conn(path)
+        try:
+            rows = conn.execute(
+                """
+                SELECT rowid, * FROM review_queue
+                WHERE status IN ('approved', 'rejected')
+                  AND (updated_at IS NULL OR updated_at < ?)
+                  AND (correction IS NULL OR dup_of IS NOT NULL OR seq <= ?)
+                ORDER BY rowid
+                LIMIT ?
+                """,
+                (cutoff, watermark, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            partitions: Dict[str, List[Dict]] = defaultdict(list)
+            for row in rows:
+                item = dict(row)
+                for key in ("flags", "changes"):
+                    try:
+                        item[key] = json.loads(item[key]) if item[key] else []
+                    except ValueError:
+                        pass  # kept verbatim
+                partitions[_partition(item.get("updated_at"))].append(item)
+            for seq, (partition, items) in enumerate(sorted(partitions.items())):
+                _write_partition(folder, partition, items, seq)
+                files += 1
+
+            archived_at = time.time()
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO review_archive
+                    (seq, id, status, text, correction, decided_at, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (r["seq"], r["id"], r["status"], r["text"], r["correction"], r["updated_at"], archived_at)
+                        for r in rows
+                        if r["correction"] is not None and r["dup_of"] is None
+                    ],
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO archive_counters (status, n) VALUES (?, ?)
+                    ON CONFLICT (status) DO UPDATE SET n = n + excluded.n
+                    """,
+                    list(Counter(r["status"] for r in rows).items()),
+                )
+                # A row rewritten since the SELECT has a new updated_at and
+                # stays in the queue, even if it got the same rowid back.
+                conn.executemany(
+                    "DELETE FROM review_queue WHERE rowid = ? AND updated_at IS ?",
+                    [(r["rowid"], r["updated_at"]) for r in rows],
+                )
+            archived += len(rows)
+        finally:
+            conn.close()
+        if len(rows) < batch_size:
+            break
+    freed = incremental_vacuum(vacuum_pages)
+    return {"archived": archived, "files": files, "freed_pages": freed}
+
+
+def incremental_vacuum(pages: int = VACUUM_PAGES) -> int:
+    """Free up to *pages* pages (0 = all); returns the number freed.
+
+    Does nothing unless the database uses ``auto_vacuum = INCREMENTAL``.
+    """
+    path = _store_path()
+    db.init_db(path)
+    conn = db.get_conn(path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # sqlite3's execute() steps this pragma only once (one page);
+        # executescript() runs it to completion.
+        conn.executescript(f"PRAGMA incremental_vacuum({max(0, int(pages))});")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum() -> bool:
+    """Switch an existing database to incremental auto-vacuum.
+
+    Needs one full ``VACUUM``, which rewrites the whole file; returns whether
+    a conversion was done.
+    """
+    path = _store_path()
+    db.init_db(path)
+    conn = db.get_conn(path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+def iter_archive(archive_dir: str = ARCHIVE_DIR, since: Optional[str] = None) -> Iterator[Dict]:
+    """Yield archived rows, oldest partition first; *since* is a ``YYYY-MM-DD`` date."""
+    for folder in sorted(Path(archive_dir).glob("date=*")):
+        partition = folder.name.split("=", 1)[1]
+        if since and partition != UNDATED and partition < since:
+            continue
+        for path in sorted(folder.glob("*.jsonl.gz")):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
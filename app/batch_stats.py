@@ -0,0 +1,152 @@
+"""Per-row resource accounting for batch runs.
+
+``cli/clean_table.py`` feeds every row's stats (from
+``run_pipeline_batch(..., stats=...)``) and flags into :class:`BatchStats`.
+It logs periodic ``batch_progress`` events and builds the JSON summary that
+is written next to the output.
+"""
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence
+
+# Per-row columns added by ``--row-stats``.
+ROW_STATS_COLUMNS = ["row_ms", "prompt_tokens", "completion_tokens", "fallback_used"]
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+# Stages that run in the pool workers; their time counts as worker busy time.
+WORKER_STAGES = ("analysis", "model", "guardrails")
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of millisecond latencies."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "max_ms": self.max,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class BatchStats:
+    """Accumulate row stats and report progress at most every *every_s* seconds.
+
+    *total_rows* (possibly an estimate) enables the ETA; *parallelism* is the
+    number of pool workers, used for the utilization figure.
+    """
+
+    def __init__(self, log, total_rows: Optional[int] = None, parallelism: int = 1, every_s: float = 10.0):
+        self.log = log
+        self.total_rows = total_rows
+        self.parallelism = max(1, parallelism)
+        self.every_s = every_s
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.skipped = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.busy_ms = 0.0
+        self.flags: Counter = Counter()
+        self.fallbacks: Counter = Counter()
+        self.row_latency = LatencyHistogram()
+        self.stage_latency: Dict[str, LatencyHistogram] = {}
+        self.flag_latency: Dict[str, LatencyHistogram] = {}
+        self._last = (self.started, 0, 0, 0.0)  # time, rows, completion tokens, busy ms
+
+    def skip(self, n: int = 1) -> None:
+        self.skipped += n
+
+    def add(self, row: Dict, flags: Iterable) -> None:
+        """Account one processed row: its stats dict and its output flags."""
+        self.rows += 1
+        self.prompt_tokens += row.get("prompt_tokens", 0)
+        self.completion_tokens += row.get("completion_tokens", 0)
+        if row.get("fallback_used"):
+            self.fallbacks[row["fallback_used"]] += 1
+        stage_ms = row.get("stage_ms", {})
+        for name, ms in stage_ms.items():
+            self.stage_latency.setdefault(name, LatencyHistogram()).observe(ms)
+        self.busy_ms += sum(stage_ms.get(name, 0.0) for name in WORKER_STAGES)
+        row_ms = row.get("row_ms", 0.0)
+        self.row_latency.observe(row_ms)
+        types = [t for t in (f.get("type") if isinstance(f, dict) else f for f in flags) if t]
+        self.flags.update(types)
+        for t in set(types):
+            self.flag_latency.setdefault(t, LatencyHistogram()).observe(row_ms)
+
+    def maybe_report(self, force: bool = False) -> None:
+        """Log ``batch_progress`` if *every_s* has passed since the last report,
+        or with *force* if rows were processed since then."""
+        now = time.perf_counter()
+        last_t, last_rows, last_tokens, last_busy = self._last
+        interval = now - last_t
+        if interval < self.every_s and not (force and self.rows > last_rows):
+            return
+        self._last = (now, self.rows, self.completion_tokens, self.busy_ms)
+        rows_per_s = (self.rows - last_rows) / interval if interval > 0 else 0.0
+        eta_s = None
+        elapsed = now - self.started
+        if self.total_rows is not None and self.rows and elapsed > 0:
+            remaining = max(0, self.total_rows - self.rows - self.skipped)
+            eta_s = round(remaining / (self.rows / elapsed), 1)
+        self.log.info(
+            "batch_progress",
+            event="batch_progress",
+            processed=self.rows,
+            skipped=self.skipped,
+            total=self.total_rows,
+            rows_per_s=round(rows_per_s, 2),
+            tokens_per_s=round((self.completion_tokens - last_tokens) / interval, 1) if interval > 0 else 0.0,
+            eta_s=eta_s,
+            worker_utilization=round((self.busy_ms - last_busy) / (interval * 1000 * self.parallelism), 3) if interval > 0 else 0.0,
+        )
+
+    def summary(self) -> Dict:
+        """Totals and latency histograms for the JSON summary."""
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "elapsed_s": elapsed,
+            "rows_per_s": self.rows / elapsed if elapsed > 0 else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_s": self.completion_tokens / elapsed if elapsed > 0 else 0.0,
+            "worker_utilization": self.busy_ms / (elapsed * 1000 * self.parallelism) if elapsed > 0 else 0.0,
+            "flags": dict(self.flags),
+            "fallbacks": dict(self.fallbacks),
+            "row_latency": self.row_latency.to_dict(),
+            "stage_latency": {name: h.to_dict() for name, h in self.stage_latency.items()},
+            "flag_latency": {name: h.to_dict() for name, h in sorted(self.flag_latency.items())},
+        }
+
+
+def row_stats_columns(row: Dict) -> Dict:
+    """The ``ROW_STATS_COLUMNS`` output values for one row's stats."""
+    return {
+        "row_ms": round(row.get("row_ms", 0.0), 3),
+        "prompt_tokens": row.get("prompt_tokens", 0),
+        "completion_tokens": row.get("completion_tokens", 0),
+        "fallback_used": row.get("fallback_used") or "",
+    }
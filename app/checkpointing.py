@@ -1,40 +1,159 @@
 import csv
+import io
+import os
 from pathlib import Path
-from typing import Dict, Iterable, Set
+from typing import BinaryIO, Dict, Iterable, Optional, Set
 
 
 class Checkpointer:
-    """CSV-based checkpointing for idempotent batch processing."""
+    """CSV-based checkpointing for idempotent batch processing.
 
-    def __init__(self, output_path: Path, error_path: Path, id_field: str = "id", fieldnames: Iterable[str] = ()):
+    Rows are appended through one open, buffered handle.  A sidecar index
+    (``<output>.idx``) logs ``<offset>\\t<id>`` per row, where ``offset`` is
+    the output length in bytes after that row, so resuming reads the small
+    index instead of re-parsing the whole CSV.  Both files are flushed and
+    fsynced together every ``sync_every`` rows and on :meth:`close`, so
+    rows written since the last sync may not be visible to other readers
+    yet.  On startup anything in the output past the last indexed offset
+    is a partially written row and is truncated away; rows lost that way
+    are simply processed again.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        error_path: Path,
+        id_field: str = "id",
+        fieldnames: Iterable[str] = (),
+        sync_every: int = 100,
+    ):
         self.output_path = output_path
         self.error_path = error_path
+        self.index_path = output_path.with_name(output_path.name + ".idx")
         self.id_field = id_field
         self.fieldnames = list(fieldnames)
+        self.sync_every = max(1, sync_every)
         self._processed: Set[str] = set()
+        self._out: Optional[BinaryIO] = None
+        self._idx: Optional[BinaryIO] = None
+        self._offset = 0
+        self._unsynced = 0
+        self._buf = io.StringIO()
+        self._writer: Optional[csv.DictWriter] = None
         self._load_processed()
 
     def _load_processed(self) -> None:
         if not self.output_path.exists():
+            if self.index_path.exists():
+                self.index_path.unlink()
+            return
+        if not self.index_path.exists():
+            self._rebuild_index()
             return
-        with self.output_path.open("r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
+
+        data = self.index_path.read_bytes()
+        out_size = self.output_path.stat().st_size
+        end = 0  # last output offset covered by the index
+        valid = 0  # bytes of the index that are complete, durable entries
+        pos = 0
+        while True:
+            nl = data.find(b"\n", pos)
+            if nl == -1:
+                break
+            offset, _, raw_id = data[pos:nl].partition(b"\t")
+            offset = int(offset)
+            if offset > out_size:
+                # The index got ahead of output that never reached the disk.
+                break
+            if raw_id:
+                self._processed.add(raw_id.decode("unicode_escape"))
+            end = offset
+            pos = valid = nl + 1
+        if valid < len(data):
+            with self.index_path.open("r+b") as f:
+                f.truncate(valid)
+        if end < out_size:
+            with self.output_path.open("r+b") as f:
+                f.truncate(end)
+        self._offset = end
+
+    def _rebuild_index(self) -> None:
+        """Index an output CSV written without a sidecar index (one-time cost)."""
+        data = self.output_path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            data = data[: data.rfind(b"\n") + 1]
+            with self.output_path.open("r+b") as f:
+                f.truncate(len(data))
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""))
+        end = str(len(data)).encode()
+        with self.index_path.open("wb") as idx:
+            idx.write(end + b"\t\n")
             for row in reader:
                 if self.id_field in row and row[self.id_field]:
-                    self._processed.add(str(row[self.id_field]))
+                    row_id = str(row[self.id_field])
+                    self._processed.add(row_id)
+                    idx.write(end + b"\t" + row_id.encode("unicode_escape") + b"\n")
+            idx.flush()
+            os.fsync(idx.fileno())
+        self._offset = len(data)
 
     def is_processed(self, row_id: str) -> bool:
         return str(row_id) in self._processed
 
+    def _emit(self, row_id: Optional[str]) -> None:
+        """Move the formatted CSV text to the output and log it in the index."""
+        data = self._buf.getvalue().encode("utf-8")
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._out.write(data)
+        self._offset += len(data)
+        self._idx.write(str(self._offset).encode() + b"\t" + (row_id or "").encode("unicode_escape") + b"\n")
+        # Both handles stay buffered between syncs.  If the index reaches the
+        # disk ahead of the output, loading stops at the first offset past
+        # the end of the output.
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
     def append_row(self, row: Dict) -> None:
-        is_new = not self.output_path.exists()
-        with self.output_path.open("a", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=self.fieldnames or row.keys())
-            if is_new:
-                writer.writeheader()
-            writer.writerow(row)
-        if self.id_field in row:
-            self._processed.add(str(row[self.id_field]))
+        if self._out is None:
+            self._out = self.output_path.open("ab")
+            self._idx = self.index_path.open("ab")
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._buf, fieldnames=self.fieldnames or list(row.keys()))
+            if self._offset == 0:
+                self._writer.writeheader()
+                self._emit(None)
+        self._writer.writerow(row)
+        row_id = str(row[self.id_field]) if self.id_field in row else None
+        self._emit(row_id)
+        if row_id is not None:
+            self._processed.add(row_id)
+
+    def sync(self) -> None:
+        """Flush and fsync the output before the index that points into it."""
+        if self._out is None:
+            return
+        self._out.flush()
+        os.fsync(self._out.fileno())
+        self._idx.flush()
+        os.fsync(self._idx.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if self._out is None:
+            return
+        self.sync()
+        self._out.close()
+        self._idx.close()
+        self._out = self._idx = None
+        self._writer = None
+
+    def __enter__(self) -> "Checkpointer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def append_error(self, row_id: str, error: str, text: str) -> None:
         is_new = not self.error_path.exists()
@@ -15,8 +15,100 @@ def _safe_float(name: str, default: float) -> float:
         return default
 
 
+def _safe_bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {'1', 'true', 'yes', 'on'}
+
+
 MODEL_PATH = os.environ.get('MODEL_PATH')
 N_THREADS = _safe_int('N_THREADS', 8)
 CTX = _safe_int('CTX', 2048)
 TEMP = _safe_float('TEMP', 0.0)
 MAX_TOKENS = _safe_int('MAX_TOKENS', 512)
+# Several models routed by text features (see app/routing.py): a JSON list
+# or the path of a JSON file.  Unset means MODEL_PATH serves everything.
+MODEL_ROUTES = os.environ.get('MODEL_ROUTES')
+# Model output format: "full" rewrites the whole text as clean_text, "edits"
+# only lists before/after edits that are applied to the input.
+OUTPUT_MODE = os.environ.get('OUTPUT_MODE', 'full').strip().lower()
+if OUTPUT_MODE not in {'full', 'edits'}:
+    OUTPUT_MODE = 'full'
+# Speculative decoding (see app/slm_llamacpp.py): "off", "prompt_lookup"
+# (draft tokens copied from the prompt) or "model" (a small draft GGUF
+# sharing the main model's vocabulary, at DRAFT_MODEL_PATH).
+DRAFT_MODE = os.environ.get('DRAFT_MODE', 'off').strip().lower()
+DRAFT_MODEL_PATH = os.environ.get('DRAFT_MODEL_PATH')
+DRAFT_TOKENS = max(1, _safe_int('DRAFT_TOKENS', 10))
+# Memory-map the GGUF so processes share the weights through the page cache;
+# USE_MLOCK additionally pins them in RAM (needs a sufficient RLIMIT_MEMLOCK).
+USE_MMAP = _safe_bool('USE_MMAP', True)
+USE_MLOCK = _safe_bool('USE_MLOCK', False)
+# Model calls the default route runs at once.  A Llama instance serves one
+# call at a time, so each extra call loads another instance from MODEL_PATH
+# (sharing the weights with USE_MMAP; see app/routing.Route.model).
+MODEL_CONCURRENCY = max(1, _safe_int('MODEL_CONCURRENCY', 1))
+
+# How /clean persists pending reviews (see app/review_queue.ReviewWriter):
+# "sync" answers after the commit, "batched" and "async" answer at once and
+# leave a crash window of up to REVIEW_FLUSH_MS or one transaction.
+REVIEW_DURABILITY = os.environ.get('REVIEW_DURABILITY', 'sync').strip().lower()
+if REVIEW_DURABILITY not in {'sync', 'batched', 'async'}:
+    REVIEW_DURABILITY = 'sync'
+REVIEW_BATCH_SIZE = max(1, _safe_int('REVIEW_BATCH_SIZE', 256))
+REVIEW_FLUSH_MS = max(0.0, _safe_float('REVIEW_FLUSH_MS', 200.0))
+# Store pending reviews identical in (text, clean_text, flags) as one group
+# that a single decision resolves (see app/db.upsert_reviews).
+REVIEW_DEDUP = _safe_bool('REVIEW_DEDUP', True)
+# Seconds a reviewer's claim on pending items lasts without a heartbeat.
+REVIEW_LEASE_S = max(1.0, _safe_float('REVIEW_LEASE_S', 300.0))
+# Review queue storage (see app/review_store.py): empty or sqlite:///<path>
+# uses a local SQLite file; postgresql://... shares one queue between API
+# replicas through a pool of PG_POOL_MIN..PG_POOL_MAX connections.
+REVIEW_STORE_URL = os.environ.get('REVIEW_STORE_URL', '').strip()
+PG_POOL_MIN = max(0, _safe_int('PG_POOL_MIN', 1))
+PG_POOL_MAX = max(1, _safe_int('PG_POOL_MAX', 10))
+
+# Logging (see app/logging_utils.py).  Per-record events (pipeline_start,
+# pipeline_end, entity_lock_enforced) log at RECORD_LOG_LEVEL and can be
+# sampled per event, e.g. LOG_SAMPLE_RATES="pipeline_start=0,pipeline_end=0.1".
+# LOG_ENQUEUE hands records to a background thread instead of blocking on stdout.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').strip().upper()
+RECORD_LOG_LEVEL = os.environ.get('RECORD_LOG_LEVEL', 'INFO').strip().upper()
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+LOG_ENQUEUE = _safe_bool('LOG_ENQUEUE', True)
+
+# Opt-in profiling (see app/profiling.py): "cprofile" writes a .pstats file
+# and "sampling" a collapsed-stack file per profiled record, for a
+# PROFILE_RATE share of records, into PROFILE_DIR.  DEBUG_PROFILE enables
+# the /debug/profile endpoint.
+CLEANROOM_PROFILE = os.environ.get('CLEANROOM_PROFILE', 'off').strip().lower()
+if CLEANROOM_PROFILE not in {'off', 'cprofile', 'sampling'}:
+    CLEANROOM_PROFILE = 'off'
+PROFILE_RATE = min(1.0, max(0.0, _safe_float('PROFILE_RATE', 0.01)))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = max(0.1, _safe_float('PROFILE_INTERVAL_MS', 5.0))
+DEBUG_PROFILE = _safe_bool('DEBUG_PROFILE')
+
+# Seconds the dashboard serves a cached /stats/summary before re-reading it.
+STATS_CACHE_TTL_S = max(0.0, _safe_float('STATS_CACHE_TTL_S', 5.0))
+
+# Archival of finalized reviews (see app/archive.py and cli/archive_reviews.py).
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'data/archive')
+ARCHIVE_RETENTION_DAYS = max(0.0, _safe_float('ARCHIVE_RETENTION_DAYS', 30.0))
+# Seconds between archival runs in the API; 0 disables it.
+ARCHIVE_INTERVAL_S = _safe_float('ARCHIVE_INTERVAL_S', 0.0)
+# Free pages returned to the OS per incremental VACUUM step.
+VACUUM_PAGES = max(0, _safe_int('VACUUM_PAGES', 2000))
+
+# Seconds between background rule-learning runs in the API; 0 disables it.
+LEARN_INTERVAL_S = _safe_float('LEARN_INTERVAL_S', 0.0)
+
+# Fake model backend for load tests without a GGUF (see app/fake_llama.py).
+FAKE_LLM = _safe_bool('FAKE_LLM')
+FAKE_LLM_PROMPT_TPS = _safe_float('FAKE_LLM_PROMPT_TPS', 200.0)
+FAKE_LLM_DECODE_TPS = _safe_float('FAKE_LLM_DECODE_TPS', 20.0)
+FAKE_LLM_TTFT_MS = _safe_float('FAKE_LLM_TTFT_MS', 50.0)
+FAKE_LLM_JSON_FAIL_RATE = _safe_float('FAKE_LLM_JSON_FAIL_RATE', 0.0)
+FAKE_LLM_SEED = _safe_int('FAKE_LLM_SEED', 0)
@@ -1,28 +1,124 @@
-from typing import Dict, List
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Query, Response
 
-from .db import get_queue_stats, get_length_stats
-from .learner import Learner
+from .config import STATS_CACHE_TTL_S
+from .learner import get_learner
+from .review_store import get_store
 
 router = APIRouter(prefix="/stats")
 
+# (store key, expiry on the monotonic clock, summary)
+_summary_cache: Optional[Tuple[str, float, Dict]] = None
+_summary_lock = threading.Lock()
 
-@router.get("/summary")
-def get_summary() -> Dict:
-    """Return high-level statistics of the system."""
-    queue_stats = get_queue_stats()
+# Sorted rule views of the current rules version, keyed by (sort, order, type).
+_rules_views: Dict[Tuple[str, str, Optional[str]], List[Dict]] = {}
+_rules_views_version: Optional[str] = None
+_rules_lock = threading.Lock()
+
+
+def _build_summary() -> Dict:
+    store = get_store()
+    queue_stats = store.get_queue_stats()
     total_reviewed = sum(queue_stats.values())
-    length_stats = get_length_stats()
+    length_stats = store.get_length_stats()
     return {
         "queue_stats": queue_stats,
         "total_reviewed": total_reviewed,
         "length_stats": length_stats,
+        "archived": store.get_archive_stats(),
     }
 
 
+@router.get("/summary")
+def get_summary() -> Dict:
+    """Return high-level statistics of the system.
+
+    Reads the trigger-maintained counters, so the cost does not grow with
+    the queue; the result is cached for ``STATS_CACHE_TTL_S`` seconds.
+    """
+    global _summary_cache
+    key = get_store().key
+    with _summary_lock:
+        cached = _summary_cache
+        if cached is not None and cached[0] == key and cached[1] > time.monotonic():
+            return cached[2]
+        summary = _build_summary()
+        _summary_cache = (key, time.monotonic() + STATS_CACHE_TTL_S, summary)
+        return summary
+
+
+@router.get("/series")
+def get_series(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    status: Optional[str] = None,
+) -> List[Dict]:
+    """Return review writes per hour and status over the last *hours* hours."""
+    return get_store().get_review_series(time.time() - hours * 3600, status=status)
+
+
+@router.get("/flags")
+def get_flags(status: Optional[str] = Query("pending", pattern="^(pending|approved|rejected|all)$")) -> Dict:
+    """Return items per flag type and per change source/type for one status.
+
+    Counted from the indexed ``review_flags``/``review_changes`` tables.
+    """
+    status_filter = None if status == "all" else status
+    return {
+        "status": status,
+        "flags": get_store().get_flag_distribution(status_filter),
+        "changes": get_store().get_change_distribution(status_filter),
+    }
+
+
+def _rules_etag(learner) -> str:
+    # The file version changes whenever rules are saved or reloaded; the
+    # object id covers rules that only exist in memory.
+    version = learner.version
+    tag = f"{version[0]:x}-{version[1]:x}" if version else "none"
+    return f'"rules-{tag}-{id(learner.rules):x}"'
+
+
+def _sorted_rules(etag: str, rules: List[Dict], sort: str, order: str, rule_type: Optional[str]) -> List[Dict]:
+    global _rules_views_version
+    key = (sort, order, rule_type)
+    with _rules_lock:
+        if _rules_views_version != etag:
+            _rules_views.clear()
+            _rules_views_version = etag
+        view = _rules_views.get(key)
+        if view is None:
+            view = [r for r in rules if rule_type is None or r.get("type") == rule_type]
+            if sort in {"confidence", "count"}:
+                view.sort(key=lambda r: r.get(sort) or 0, reverse=order == "desc")
+            else:
+                view.sort(key=lambda r: str(r.get(sort) or ""), reverse=order == "desc")
+            _rules_views[key] = view
+        return view
+
+
 @router.get("/rules")
-def get_rules() -> List[Dict]:
-    """Return the currently active harmonization rules."""
-    learner = Learner()
-    return learner.get_rules()
+def get_rules(
+    response: Response,
+    sort: str = Query("confidence", pattern="^(confidence|count|pattern|type)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    type: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Return one sorted page of the active harmonization rules.
+
+    Served from the in-memory rule set.  The ``ETag`` follows the rules
+    version, so a matching ``If-None-Match`` gets ``304 Not Modified``.
+    """
+    learner = get_learner()
+    etag = _rules_etag(learner)
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    rules = _sorted_rules(etag, learner.get_rules(), sort, order, type)
+    response.headers["ETag"] = etag
+    return {"total": len(rules), "offset": offset, "limit": limit, "items": rules[offset : offset + limit]}
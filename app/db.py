@@ -1,21 +1,397 @@
+import hashlib
 import json
 import os
 import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
 DB_PATH = Path(os.environ.get("DB_PATH", "data/cleanroom.db"))
 
+# Characters of the original text returned in the summary projection.
+PREVIEW_CHARS = 160
 
-def get_conn():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+# Width in seconds of the buckets of the review_series table.
+SERIES_BUCKET_S = 3600
+
+# Bumped with each migration in ``_MIGRATIONS``; stored as PRAGMA user_version.
+SCHEMA_VERSION = 9
+
+# Databases already initialised by this process, by path.
+_initialized: Set[str] = set()
+_init_lock = threading.Lock()
+
+
+def get_conn(path: Optional[Path] = None):
+    """Open the database at *path*, by default ``DB_PATH``.
+
+    Every public function here takes the same *path*, so one process can
+    use several databases (see ``app.review_store.SQLiteReviewStore``).
+    """
+    path = Path(path) if path else DB_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     return conn
 
 
-def init_db():
-    conn = get_conn()
+def _counter_delta(row: str, sign: str) -> str:
+    """SQL upserting ``review_counters`` by the NEW or OLD *row*."""
+    return f"""
+        INSERT INTO review_counters (status, n, len_n, text_len, clean_len)
+        SELECT COALESCE({row}.status, ''), {sign}1, {sign}has_len,
+               {sign}has_len * COALESCE(LENGTH({row}.text), 0),
+               {sign}has_len * COALESCE(LENGTH({row}.clean_text), 0)
+        FROM (SELECT ({row}.text IS NOT NULL AND {row}.clean_text IS NOT NULL) AS has_len)
+        WHERE true
+        ON CONFLICT (status) DO UPDATE SET
+            n = n + excluded.n,
+            len_n = len_n + excluded.len_n,
+            text_len = text_len + excluded.text_len,
+            clean_len = clean_len + excluded.clean_len;
+    """
+
+
+def _series_bump(row: str) -> str:
+    """SQL counting a write of *row*'s status in its ``review_series`` bucket."""
+    return f"""
+        INSERT INTO review_series (bucket, status, n)
+        VALUES (
+            CAST(COALESCE({row}.updated_at, strftime('%s', 'now')) / {SERIES_BUCKET_S} AS INTEGER) * {SERIES_BUCKET_S},
+            COALESCE({row}.status, ''),
+            1
+        )
+        ON CONFLICT (bucket, status) DO UPDATE SET n = n + 1;
+    """
+
+
+def _create_triggers(conn: sqlite3.Connection) -> None:
+    """Triggers keeping ``review_counters`` and ``review_series`` current.
+
+    Rewrites go through ``INSERT ... ON CONFLICT DO UPDATE``, which fires
+    the UPDATE triggers, so the series counts new items on insert and
+    rewrites only when their status changes.
+    """
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS review_queue_ai AFTER INSERT ON review_queue BEGIN
+            {_counter_delta("NEW", "+")}
+            {_series_bump("NEW")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS review_queue_ad AFTER DELETE ON review_queue BEGIN
+            {_counter_delta("OLD", "-")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS review_queue_au AFTER UPDATE OF status, text, clean_text ON review_queue BEGIN
+            {_counter_delta("OLD", "-")}
+            {_counter_delta("NEW", "+")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS review_queue_au_status AFTER UPDATE OF status ON review_queue
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            {_series_bump("NEW")}
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    """Timestamps plus trigger-maintained counters and a time series.
+
+    ``review_counters`` holds per-status row counts and text length sums so
+    the dashboard summary never scans ``review_queue``; ``review_series``
+    counts writes per status and time bucket.  Existing rows are counted
+    once here.
+    """
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(review_queue)")}
+    for column in ("created_at", "updated_at"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE review_queue ADD COLUMN {column} REAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS review_counters (
+            status TEXT PRIMARY KEY,
+            n INTEGER NOT NULL DEFAULT 0,
+            len_n INTEGER NOT NULL DEFAULT 0,
+            text_len INTEGER NOT NULL DEFAULT 0,
+            clean_len INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS review_series (
+            bucket INTEGER,
+            status TEXT,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, status)
+        )
+        """
+    )
+    conn.execute("DELETE FROM review_counters")
+    conn.execute(
+        """
+        INSERT INTO review_counters (status, n, len_n, text_len, clean_len)
+        SELECT COALESCE(status, ''), COUNT(*),
+               SUM(text IS NOT NULL AND clean_text IS NOT NULL),
+               SUM(CASE WHEN text IS NOT NULL AND clean_text IS NOT NULL THEN LENGTH(text) ELSE 0 END),
+               SUM(CASE WHEN text IS NOT NULL AND clean_text IS NOT NULL THEN LENGTH(clean_text) ELSE 0 END)
+        FROM review_queue GROUP BY COALESCE(status, '')
+        """
+    )
+    _create_triggers(conn)
+
+
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    """Tables for the archival job (see ``app.archive``).
+
+    ``review_archive`` keeps what the learner needs (text and correction) of
+    archived reviews that carry a correction; ``archive_counters`` counts
+    archived rows per status.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS review_archive (
+            source_rowid INTEGER PRIMARY KEY,
+            id TEXT,
+            status TEXT,
+            text TEXT,
+            correction TEXT,
+            decided_at REAL,
+            archived_at REAL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_decided ON review_archive(decided_at)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS archive_counters (status TEXT PRIMARY KEY, n INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_status_updated ON review_queue(status, updated_at)")
+
+
+def _migrate_v3(conn: sqlite3.Connection) -> None:
+    """Grouping of identical pending reviews.
+
+    ``group_key`` hashes (text, clean_text, flags); ``dup_of`` points a
+    group member at the pending item that carries the group's content.
+    Pending items already queued are keyed here but not grouped.
+    """
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(review_queue)")}
+    for column in ("group_key", "dup_of"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE review_queue ADD COLUMN {column} TEXT")
+    rows = conn.execute("SELECT id, text, clean_text, flags FROM review_queue WHERE status = 'pending'").fetchall()
+    conn.executemany(
+        "UPDATE review_queue SET group_key = ? WHERE id = ?",
+        [(review_group_key(r["text"], r["clean_text"], _decode_json(r["flags"])), r["id"]) for r in rows],
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_review_group ON review_queue(group_key) "
+        "WHERE status = 'pending' AND dup_of IS NULL"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_dup ON review_queue(dup_of) WHERE dup_of IS NOT NULL")
+    # Members have no text; the counter triggers of v1 summed NULL lengths.
+    for trigger in ("review_queue_ai", "review_queue_ad", "review_queue_au", "review_queue_au_status"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_triggers(conn)
+
+
+def _child_rows(row: str, source: str = "") -> str:
+    """SQL filling ``review_flags``/``review_changes`` for the review *row*.
+
+    *row* is ``NEW`` in a trigger; a backfill passes a table alias and the
+    *source* tables (ending in a comma) that define it.  Group members take
+    the flags and changes of their leader.
+    """
+    flags = f"COALESCE({row}.flags, (SELECT flags FROM review_queue WHERE id = {row}.dup_of))"
+    changes = f"COALESCE({row}.changes, (SELECT changes FROM review_queue WHERE id = {row}.dup_of))"
+    return f"""
+        INSERT OR IGNORE INTO review_flags (review_rowid, review_id, type, status)
+        SELECT DISTINCT {row}.rowid, {row}.id,
+               CASE j.type WHEN 'object' THEN json_extract(j.value, '$.type') WHEN 'text' THEN j.value END,
+               {row}.status
+        FROM {source} json_each(CASE WHEN json_valid({flags}) THEN {flags} ELSE '[]' END) AS j
+        WHERE CASE j.type WHEN 'object' THEN json_extract(j.value, '$.type') WHEN 'text' THEN j.value END IS NOT NULL;
+        INSERT INTO review_changes (review_rowid, review_id, source, type, n, status)
+        SELECT {row}.rowid, {row}.id, COALESCE(json_extract(j.value, '$.source'), ''),
+               COALESCE(json_extract(j.value, '$.type'), ''), COUNT(*), {row}.status
+        FROM {source} json_each(CASE WHEN json_valid({changes}) THEN {changes} ELSE '[]' END) AS j
+        WHERE j.type = 'object'
+        GROUP BY 1, 3, 4;
+    """
+
+
+def _migrate_v4(conn: sqlite3.Connection) -> None:
+    """Flag types and change sources as indexed child tables of ``review_queue``.
+
+    One ``review_flags`` row per item and flag type, one ``review_changes``
+    row per item, change source and type.  Both carry the item's status and
+    are kept in step by triggers, so flag filters and distributions are
+    index lookups instead of ``json_each`` over every row.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS review_flags (
+            review_rowid INTEGER NOT NULL,
+            review_id TEXT,
+            type TEXT NOT NULL,
+            status TEXT,
+            PRIMARY KEY (review_rowid, type)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS review_changes (
+            review_rowid INTEGER NOT NULL,
+            review_id TEXT,
+            source TEXT NOT NULL,
+            type TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 1,
+            status TEXT,
+            PRIMARY KEY (review_rowid, source, type)
+        ) WITHOUT ROWID
+        """
+    )
+    # Indexes of WITHOUT ROWID tables end in the primary key, so this one
+    # also orders by review_rowid within a (status, type).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_flags_status ON review_flags(status, type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_source ON review_changes(status, source, review_rowid)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_status ON review_changes(status, source, type)")
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS review_children_ai AFTER INSERT ON review_queue BEGIN
+            {_child_rows("NEW")}
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS review_children_ad AFTER DELETE ON review_queue BEGIN
+            DELETE FROM review_flags WHERE review_rowid = OLD.rowid;
+            DELETE FROM review_changes WHERE review_rowid = OLD.rowid;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS review_children_au_status AFTER UPDATE OF status ON review_queue
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            UPDATE review_flags SET status = NEW.status WHERE review_rowid = NEW.rowid;
+            UPDATE review_changes SET status = NEW.status WHERE review_rowid = NEW.rowid;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS review_children_au_content
+        AFTER UPDATE OF flags, changes, dup_of ON review_queue BEGIN
+            DELETE FROM review_flags WHERE review_rowid = OLD.rowid;
+            DELETE FROM review_changes WHERE review_rowid = OLD.rowid;
+            {_child_rows("NEW")}
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+    conn.execute("DELETE FROM review_flags")
+    conn.execute("DELETE FROM review_changes")
+    for statement in _child_rows("q", "review_queue AS q,").split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _migrate_v5(conn: sqlite3.Connection) -> None:
+    """Reviewer claims: who holds a pending item and until when."""
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(review_queue)")}
+    for column, kind in (("claimed_by", "TEXT"), ("claim_expires", "REAL")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE review_queue ADD COLUMN {column} {kind}")
+
+
+def _migrate_v6(conn: sqlite3.Connection) -> None:
+    """Index of live claims, for a reviewer's heartbeat and release."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_claimed ON review_queue(claimed_by) WHERE claimed_by IS NOT NULL")
+
+
+def _migrate_v7(conn: sqlite3.Connection) -> None:
+    """Stop counting same-status rewrites in ``review_series`` (see ``_create_triggers``)."""
+    conn.execute("DROP TRIGGER IF EXISTS review_queue_ai")
+    _create_triggers(conn)
+
+
+def _migrate_v8(conn: sqlite3.Connection) -> None:
+    """Number decisions from a persistent sequence instead of by rowid.
+
+    ``review_queue`` has no AUTOINCREMENT key, so SQLite reuses the rowids
+    of the highest rows once archival deletes them, and a rowid watermark
+    would skip later decisions.  ``seq`` is drawn from the one-row counter
+    ``review_seq``, which never goes down.  Existing decisions keep their
+    rowid as ``seq``, and the counter starts above every rowid, watermark
+    and archived row seen so far.  ``review_archive`` gets a key of its own
+    and keeps the archived row's ``seq``.
+    """
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(review_queue)")}
+    if "seq" not in columns:
+        conn.execute("ALTER TABLE review_queue ADD COLUMN seq INTEGER")
+    conn.execute("UPDATE review_queue SET seq = rowid WHERE status != 'pending' AND seq IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_seq ON review_queue(seq) WHERE seq IS NOT NULL")
+    conn.execute(
+        """
+        CREATE TABLE review_archive_v8 (
+            archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seq INTEGER,
+            id TEXT,
+            status TEXT,
+            text TEXT,
+            correction TEXT,
+            decided_at REAL,
+            archived_at REAL
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO review_archive_v8 (seq, id, status, text, correction, decided_at, archived_at)
+        SELECT source_rowid, id, status, text, correction, decided_at, archived_at
+        FROM review_archive ORDER BY source_rowid
+        """
+    )
+    conn.execute("DROP TABLE review_archive")
+    conn.execute("ALTER TABLE review_archive_v8 RENAME TO review_archive")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_decided ON review_archive(decided_at)")
+    conn.execute("CREATE TABLE IF NOT EXISTS review_seq (n INTEGER NOT NULL)")
+    conn.execute(
+        """
+        INSERT INTO review_seq (n)
+        SELECT MAX(
+            (SELECT COALESCE(MAX(rowid), 0) FROM review_queue),
+            (SELECT COALESCE(MAX(seq), 0) FROM review_archive),
+            (SELECT COALESCE(MAX(value), 0) FROM learner_state WHERE key = 'watermark')
+        )
+        WHERE NOT EXISTS (SELECT 1 FROM review_seq)
+        """
+    )
+
+
+def _migrate_v9(conn: sqlite3.Connection) -> None:
+    """Bump the series after insert again (see ``_create_triggers``).
+
+    ``upsert_reviews`` no longer replaces rows, so AFTER INSERT sees only new
+    items; the BEFORE INSERT trigger would now double-count status changes.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS review_queue_bi_series")
+    conn.execute("DROP TRIGGER IF EXISTS review_queue_ai")
+    _create_triggers(conn)
+
+
+_MIGRATIONS = [
+    _migrate_v1, _migrate_v2, _migrate_v3, _migrate_v4, _migrate_v5, _migrate_v6, _migrate_v7, _migrate_v8, _migrate_v9
+]
+
+
+def init_db(path: Optional[Path] = None):
+    """Create the schema and run pending migrations, once per process and path."""
+    path = Path(path) if path else DB_PATH
+    key = str(path)
+    if key in _initialized and path.exists():
+        return
+    with _init_lock:
+        _init_db(path)
+        _initialized.add(key)
+
+
+def _init_db(path: Path):
+    conn = get_conn(path)
+    if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+        # Only takes effect before the first table exists; older databases
+        # are converted by ``app.archive.enable_incremental_vacuum``.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
     c = conn.cursor()
     c.execute(
         """
@@ -30,110 +406,620 @@ def init_db():
         )
         """
     )
-    conn.commit()
-    conn.close()
-
-
-def upsert_review(item_id: str, payload: Dict[str, Any]) -> None:
-    init_db()
-    conn = get_conn()
-    c = conn.cursor()
+    # Secondary indexes carry the rowid, so this also serves the keyset
+    # pagination over pending items.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_review_status ON review_queue(status)")
+    # Persistent counters for the incremental rule miner.
     c.execute(
         """
-        INSERT OR REPLACE INTO review_queue
-        (id, status, text, clean_text, flags, changes, correction)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            item_id,
-            payload.get("status", "pending"),
-            payload.get("text"),
-            payload.get("clean_text"),
-            json.dumps(payload.get("flags", [])),
-            json.dumps(payload.get("changes", [])),
-            payload.get("correction"),
-        ),
+        CREATE TABLE IF NOT EXISTS rule_patterns (
+            pattern TEXT,
+            fix TEXT,
+            type TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (pattern, fix, type)
+        )
+        """
     )
+    c.execute("CREATE TABLE IF NOT EXISTS learner_state (key TEXT PRIMARY KEY, value INTEGER)")
     conn.commit()
+    # Each migration runs in its own write transaction; re-reading the
+    # version under the lock lets concurrent processes migrate safely.
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(_MIGRATIONS):
+            conn.rollback()
+            break
+        try:
+            _MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
     conn.close()
 
 
-def get_review(item_id: str) -> Optional[Dict]:
-    init_db()
-    conn = get_conn()
+def upsert_review(item_id: str, payload: Dict[str, Any], path: Optional[Path] = None) -> None:
+    upsert_reviews([(item_id, payload)], path=path)
+
+
+def review_group_key(text: Optional[str], clean_text: Optional[str], flags: Any) -> str:
+    """Hash identifying identical reviews: same text, clean text and flags."""
+    raw = "\x1f".join([text or "", clean_text or "", json.dumps(flags or [], sort_keys=True)])
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def upsert_reviews(
+    items: Sequence[Tuple[str, Dict[str, Any]]], dedup: Optional[bool] = None, path: Optional[Path] = None
+) -> None:
+    """Write several review items in a single transaction.
+
+    A rewrite updates the item in place, keeping its rowid (the paging
+    cursor) and ``created_at``, and drops its claim; ``updated_at`` is now.
+    Every decided item written gets the next ``seq`` (see ``_migrate_v8``);
+    the transaction holds the write lock, so ``seq`` order is commit order.
+    With *dedup* (default ``REVIEW_DEDUP``) a pending item identical to
+    another pending item is stored as a member of that item's group: only
+    its id and ``dup_of`` are kept, and a decision on the group applies to
+    it (see :func:`decide_group`).
+    """
+    from .config import REVIEW_DEDUP
+
+    dedup = REVIEW_DEDUP if dedup is None else dedup
+    init_db(path)
+    now = time.time()
+    conn = get_conn(path)
+    try:
+        # IMMEDIATE: the leader lookup and the writes see the same queue.
+        conn.execute("BEGIN IMMEDIATE")
+        keyed = [
+            (item_id, payload, review_group_key(payload.get("text"), payload.get("clean_text"), payload.get("flags")))
+            for item_id, payload in items
+        ]
+        leaders: Dict[str, str] = {}
+        if dedup:
+            keys = list({key for _, payload, key in keyed if payload.get("status", "pending") == "pending"})
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                leaders.update(
+                    (r["group_key"], r["id"])
+                    for r in conn.execute(
+                        f"""
+                        SELECT group_key, id FROM review_queue
+                        WHERE status = 'pending' AND dup_of IS NULL
+                          AND group_key IN ({",".join("?" * len(chunk))})
+                        """,
+                        chunk,
+                    )
+                )
+        decided = sum(1 for _, payload, _ in keyed if payload.get("status", "pending") != "pending")
+        seq = 0
+        if decided:
+            seq = conn.execute("UPDATE review_seq SET n = n + ? RETURNING n", (decided,)).fetchone()[0] - decided
+        rows = []
+        for item_id, payload, key in keyed:
+            status = payload.get("status", "pending")
+            dup_of = payload.get("dup_of")
+            if dedup and status == "pending":
+                leader = leaders.setdefault(key, item_id)
+                dup_of = leader if leader != item_id else None
+            if dup_of is None:
+                content = (
+                    payload.get("text"),
+                    payload.get("clean_text"),
+                    json.dumps(payload.get("flags", [])),
+                    json.dumps(payload.get("changes", [])),
+                )
+            else:
+                content = (None, None, None, None)
+            if status != "pending":
+                seq += 1
+            rows.append(
+                (
+                    item_id, status, *content, payload.get("correction"), now, now, key, dup_of,
+                    seq if status != "pending" else None,
+                )
+            )
+        conn.executemany(
+            """
+            INSERT INTO review_queue
+            (id, status, text, clean_text, flags, changes, correction, created_at, updated_at, group_key, dup_of, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                status = excluded.status, text = excluded.text, clean_text = excluded.clean_text,
+                flags = excluded.flags, changes = excluded.changes, correction = excluded.correction,
+                updated_at = excluded.updated_at, group_key = excluded.group_key, dup_of = excluded.dup_of,
+                seq = excluded.seq, claimed_by = NULL, claim_expires = NULL
+            """,
+            rows,
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def decide_group(
+    leader_id: str,
+    status: str,
+    correction: Optional[str] = None,
+    reviewer: Optional[str] = None,
+    path: Optional[Path] = None,
+) -> Optional[List[Optional[float]]]:
+    """Decide *leader_id* and the pending members of its group in one transaction.
+
+    Only a pending leader that nobody else holds a live claim on is decided
+    (*reviewer*'s own claim is fine); otherwise nothing is written and None
+    is returned.  The leader gets the next ``seq`` and loses its claim;
+    *correction*, when given, replaces the stored one.  Returns the
+    ``created_at`` of the leader and of each member decided, leader first.
+    """
+    init_db(path)
+    now = time.time()
+    conn = get_conn(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        seq = conn.execute("UPDATE review_seq SET n = n + 1 RETURNING n").fetchone()[0]
+        leader = conn.execute(
+            """
+            UPDATE review_queue SET status = ?, correction = COALESCE(?, correction), updated_at = ?, seq = ?,
+                claimed_by = NULL, claim_expires = NULL
+            WHERE id = ? AND status = 'pending' AND dup_of IS NULL
+              AND (claim_expires IS NULL OR claim_expires < ? OR claimed_by = ?)
+            RETURNING created_at
+            """,
+            (status, correction, now, seq, leader_id, now, reviewer),
+        ).fetchone()
+        if leader is None:
+            conn.rollback()
+            return None
+        members = conn.execute(
+            """
+            UPDATE review_queue SET status = ?, correction = COALESCE(?, correction), updated_at = ?
+            WHERE dup_of = ? AND status = 'pending'
+            RETURNING created_at
+            """,
+            (status, correction, now, leader_id),
+        ).fetchall()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return [leader["created_at"]] + [r["created_at"] for r in members]
+
+
+def claim_pending(reviewer: str, limit: int = 10, lease_s: float = 300.0, path: Optional[Path] = None) -> List[Dict]:
+    """Claim up to *limit* pending groups for *reviewer*, oldest first.
+
+    Unclaimed items, expired claims and *reviewer*'s own claims qualify, so
+    calling again renews what the reviewer holds instead of piling up more.
+    A claim lasts *lease_s* seconds.  Claims are made under ``BEGIN
+    IMMEDIATE``, so concurrent reviewers get disjoint items.  Returns the
+    claimed items (leaders, with ``group_size``).
+    """
+    init_db(path)
+    now = time.time()
+    conn = get_conn(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        ids = [
+            r["id"]
+            for r in conn.execute(
+                """
+                SELECT id FROM review_queue
+                WHERE status = 'pending' AND dup_of IS NULL
+                  AND (claim_expires IS NULL OR claim_expires < ? OR claimed_by = ?)
+                ORDER BY rowid LIMIT ?
+                """,
+                (now, reviewer, limit),
+            )
+        ]
+        conn.executemany(
+            "UPDATE review_queue SET claimed_by = ?, claim_expires = ? WHERE id = ?",
+            [(reviewer, now + lease_s, item_id) for item_id in ids],
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return [item for item in (get_review(item_id, path=path) for item_id in ids) if item is not None]
+
+
+def claim_items(reviewer: str, ids: Sequence[str], lease_s: float = 300.0, path: Optional[Path] = None) -> List[str]:
+    """Claim the given pending leaders for *reviewer* if nobody else holds them.
+
+    Returns the ids claimed; an id that is decided, a group member or
+    claimed by another reviewer is left out.
+    """
+    if not ids:
+        return []
+    init_db(path)
+    now = time.time()
+    conn = get_conn(path)
+    with conn:
+        rows = conn.execute(
+            f"""
+            UPDATE review_queue SET claimed_by = ?, claim_expires = ?
+            WHERE id IN ({",".join("?" * len(ids))}) AND status = 'pending' AND dup_of IS NULL
+              AND (claim_expires IS NULL OR claim_expires < ? OR claimed_by = ?)
+            RETURNING id
+            """,
+            [reviewer, now + lease_s, *ids, now, reviewer],
+        ).fetchall()
+    conn.close()
+    return [r["id"] for r in rows]
+
+
+def heartbeat_claims(
+    reviewer: str, ids: Optional[Sequence[str]] = None, lease_s: float = 300.0, path: Optional[Path] = None
+) -> List[str]:
+    """Extend *reviewer*'s live claims (all, or those in *ids*) by *lease_s* from now.
+
+    Expired claims are not revived; returns the ids extended.
+    """
+    init_db(path)
+    now = time.time()
+    where = "claimed_by = ? AND claim_expires >= ? AND status = 'pending'"
+    params: List[Any] = [now + lease_s, reviewer, now]
+    if ids is not None:
+        if not ids:
+            return []
+        where += f" AND id IN ({','.join('?' * len(ids))})"
+        params.extend(ids)
+    conn = get_conn(path)
+    with conn:
+        rows = conn.execute(
+            f"UPDATE review_queue SET claim_expires = ? WHERE {where} RETURNING id", params
+        ).fetchall()
+    conn.close()
+    return [r["id"] for r in rows]
+
+
+def release_claims(reviewer: str, ids: Optional[Sequence[str]] = None, path: Optional[Path] = None) -> int:
+    """Drop *reviewer*'s claims (all, or those in *ids*); returns how many."""
+    init_db(path)
+    where = "claimed_by = ?"
+    params: List[Any] = [reviewer]
+    if ids is not None:
+        if not ids:
+            return 0
+        where += f" AND id IN ({','.join('?' * len(ids))})"
+        params.extend(ids)
+    conn = get_conn(path)
+    with conn:
+        n = conn.execute(
+            f"UPDATE review_queue SET claimed_by = NULL, claim_expires = NULL WHERE {where}", params
+        ).rowcount
+    conn.close()
+    return n
+
+
+def _decode_json(raw: Optional[str]) -> Any:
+    try:
+        return json.loads(raw) if raw else []
+    except ValueError:
+        return []
+
+
+def _decode_row(row: sqlite3.Row) -> Dict:
+    """Return *row* as a dict with the ``flags``/``changes`` JSON decoded."""
+    item = dict(row)
+    for key in ("flags", "changes"):
+        raw = item.get(key)
+        if isinstance(raw, str):
+            try:
+                item[key] = json.loads(raw)
+            except ValueError:
+                item[key] = []
+    return item
+
+
+# Group members carry no content of their own; they show their leader's.
+_MERGED_SELECT = """
+    SELECT q.id, q.status,
+           COALESCE(q.text, l.text) AS text, COALESCE(q.clean_text, l.clean_text) AS clean_text,
+           COALESCE(q.flags, l.flags) AS flags, COALESCE(q.changes, l.changes) AS changes,
+           q.correction, q.created_at, q.updated_at, q.group_key, q.dup_of, q.claimed_by, q.claim_expires
+    FROM review_queue q LEFT JOIN review_queue l ON l.id = q.dup_of
+"""
+
+_GROUP_SIZE = "1 + (SELECT COUNT(*) FROM review_queue m WHERE m.dup_of = {table}.id AND m.status = {table}.status)"
+
+
+def get_review(item_id: str, path: Optional[Path] = None) -> Optional[Dict]:
+    init_db(path)
+    conn = get_conn(path)
     c = conn.cursor()
-    c.execute("SELECT * FROM review_queue WHERE id = ?", (item_id,))
+    c.execute(
+        f"SELECT *, {_GROUP_SIZE.format(table='merged')} AS group_size "
+        f"FROM ({_MERGED_SELECT} WHERE q.id = ?) AS merged",
+        (item_id,),
+    )
     row = c.fetchone()
     conn.close()
     if not row:
         return None
-    return dict(row)
+    return _decode_row(row)
+
+
+def get_pending_reviews(path: Optional[Path] = None) -> List[Dict]:
+    """Return every pending item, group members included."""
+    init_db(path)
+    conn = get_conn(path)
+    c = conn.cursor()
+    c.execute(f"{_MERGED_SELECT} WHERE q.status = 'pending'")
+    rows = c.fetchall()
+    conn.close()
+    return [_decode_row(r) for r in rows]
 
 
-def get_pending_reviews() -> List[Dict]:
-    init_db()
-    conn = get_conn()
+def get_pending_page(
+    limit: int = 50,
+    after: Optional[int] = None,
+    flag_type: Optional[str] = None,
+    summary: bool = True,
+    change_source: Optional[str] = None,
+    path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Return one keyset-paginated page of pending reviews, oldest first.
+
+    Each group of identical items is listed once, as its leader with a
+    ``group_size``.  ``after`` is the ``next_cursor`` of the previous page.
+    ``flag_type`` and ``change_source`` keep items carrying that flag type
+    or a change from that source; both are answered from the indexes of
+    ``review_flags``/``review_changes``.  The summary
+    projection only carries a text preview and the decoded flags, which keeps
+    pages small; ``summary=False`` returns the full rows.
+    """
+    init_db(path)
+    if summary:
+        columns = (
+            "q.rowid AS cursor, q.id, q.status, substr(q.text, 1, ?) AS preview, "
+            "length(q.text) AS text_length, q.flags, json_array_length(q.changes) AS change_count"
+        )
+        params: List[Any] = [PREVIEW_CHARS]
+    else:
+        columns = "q.rowid AS cursor, q.*"
+        params = []
+    columns += f", {_GROUP_SIZE.format(table='q')} AS group_size"
+    where = ["q.status = 'pending'", "q.dup_of IS NULL"]
+    if flag_type:
+        # Scan the flag's index range in rowid order and look each item up;
+        # CROSS JOIN keeps SQLite from driving the scan from review_queue.
+        source = "review_flags f CROSS JOIN review_queue q ON q.rowid = f.review_rowid"
+        where[:0] = ["f.status = 'pending'", "f.type = ?"]
+        params.append(flag_type)
+        key = "f.review_rowid"
+    else:
+        source = "review_queue q"
+        key = "q.rowid"
+    if change_source:
+        where.append(
+            "EXISTS (SELECT 1 FROM review_changes c "
+            "WHERE c.review_rowid = q.rowid AND c.status = 'pending' AND c.source = ?)"
+        )
+        params.append(change_source)
+    if after is not None:
+        where.append(f"{key} > ?")
+        params.append(after)
+    params.append(limit + 1)
+    conn = get_conn(path)
     c = conn.cursor()
-    c.execute("SELECT * FROM review_queue WHERE status = 'pending'")
+    c.execute(
+        f"SELECT {columns} FROM {source} WHERE {' AND '.join(where)} ORDER BY {key} LIMIT ?",
+        params,
+    )
     rows = c.fetchall()
     conn.close()
+    items = [_decode_row(r) for r in rows[:limit]]
+    next_cursor = items[-1]["cursor"] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_flag_distribution(status: Optional[str] = "pending", path: Optional[Path] = None) -> Dict[str, int]:
+    """Return the number of items per flag type, for one status or all (``None``).
+
+    Group members count as items of their own.
+    """
+    init_db(path)
+    where, params = ("WHERE status = ?", [status]) if status else ("", [])
+    conn = get_conn(path)
+    rows = conn.execute(
+        f"SELECT type, COUNT(*) AS n FROM review_flags {where} GROUP BY type ORDER BY n DESC, type",
+        params,
+    ).fetchall()
+    conn.close()
+    return {r["type"]: r["n"] for r in rows}
+
+
+def get_change_distribution(status: Optional[str] = "pending", path: Optional[Path] = None) -> List[Dict]:
+    """Return items and changes per change source and type, for one status or all."""
+    init_db(path)
+    where, params = ("WHERE status = ?", [status]) if status else ("", [])
+    conn = get_conn(path)
+    rows = conn.execute(
+        f"""
+        SELECT source, type, COUNT(*) AS items, SUM(n) AS changes FROM review_changes {where}
+        GROUP BY source, type ORDER BY items DESC, source, type
+        """,
+        params,
+    ).fetchall()
+    conn.close()
     return [dict(r) for r in rows]
 
 
-def get_review_history(limit: int = 1000) -> List[Dict]:
-    """Return approved/rejected reviews that include a correction, newest first."""
-    init_db()
-    conn = get_conn()
+def get_review_history(limit: int = 1000, path: Optional[Path] = None) -> List[Dict]:
+    """Return approved/rejected reviews that include a correction, newest first.
+
+    Archived reviews (``review_archive``) are included.
+    """
+    init_db(path)
+    conn = get_conn(path)
     c = conn.cursor()
     c.execute(
         """
-        SELECT * FROM review_queue
-        WHERE status IN ('approved','rejected') AND correction IS NOT NULL
-        ORDER BY rowid DESC
+        SELECT id, status, text, correction, updated_at AS decided_at FROM review_queue
+        WHERE status IN ('approved','rejected') AND correction IS NOT NULL AND dup_of IS NULL
+        UNION ALL
+        SELECT id, status, text, correction, decided_at FROM review_archive
+        ORDER BY decided_at DESC
         LIMIT ?
         """,
         (limit,),
     )
     rows = c.fetchall()
     conn.close()
+    return [_decode_row(r) for r in rows]
+
+
+def get_reviews_since(after: int, limit: int = 1000, path: Optional[Path] = None) -> List[Dict]:
+    """Return finalized reviews with a correction whose ``seq`` is above *after*, oldest first.
+
+    Every decided write draws a new ``seq``, so a ``seq`` high-water mark
+    also picks up reviews decided again after it was stored.  Group members
+    are skipped: their group's decision counts once.
+    """
+    init_db(path)
+    conn = get_conn(path)
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT seq, id, status, text, correction FROM review_queue
+        WHERE seq > ? AND status IN ('approved','rejected') AND correction IS NOT NULL
+          AND dup_of IS NULL
+        ORDER BY seq
+        LIMIT ?
+        """,
+        (after, limit),
+    )
+    rows = c.fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def get_learner_watermark(path: Optional[Path] = None) -> int:
+    """Return the ``seq`` of the last review consumed by the learner."""
+    init_db(path)
+    conn = get_conn(path)
+    row = conn.execute("SELECT value FROM learner_state WHERE key = 'watermark'").fetchone()
+    conn.close()
+    return int(row["value"]) if row else 0
+
+
+def record_rule_patterns(
+    counts: Dict[Tuple[str, str, str], int], watermark: int, path: Optional[Path] = None
+) -> Dict[Tuple[str, str, str], int]:
+    """Add *counts* to the stored pattern counters and advance the watermark.
+
+    Both happen in one transaction, so a crash cannot count a review twice.
+    Returns the updated totals of the touched patterns.
+    """
+    init_db(path)
+    conn = get_conn(path)
+    totals: Dict[Tuple[str, str, str], int] = {}
+    with conn:
+        for (pattern, fix, rtype), n in counts.items():
+            row = conn.execute(
+                """
+                INSERT INTO rule_patterns (pattern, fix, type, count) VALUES (?, ?, ?, ?)
+                ON CONFLICT (pattern, fix, type) DO UPDATE SET count = count + excluded.count
+                RETURNING count
+                """,
+                (pattern, fix, rtype, n),
+            ).fetchone()
+            totals[(pattern, fix, rtype)] = row["count"]
+        conn.execute(
+            "INSERT OR REPLACE INTO learner_state (key, value) VALUES ('watermark', ?)",
+            (watermark,),
+        )
+    conn.close()
+    return totals
+
+
+def get_rule_patterns(min_count: int = 1, path: Optional[Path] = None) -> List[Dict]:
+    """Return stored pattern counters seen at least *min_count* times."""
+    init_db(path)
+    conn = get_conn(path)
+    rows = conn.execute(
+        "SELECT pattern, fix, type, count FROM rule_patterns WHERE count >= ? ORDER BY count DESC",
+        (min_count,),
+    ).fetchall()
+    conn.close()
     return [dict(r) for r in rows]
 
 
-def get_queue_stats() -> Dict[str, int]:
-    """Return counts per status in the review queue."""
-    init_db()
-    conn = get_conn()
+def get_queue_stats(path: Optional[Path] = None) -> Dict[str, int]:
+    """Return counts per status in the review queue (from the counters table)."""
+    init_db(path)
+    conn = get_conn(path)
     c = conn.cursor()
-    c.execute("SELECT status, COUNT(*) as count FROM review_queue GROUP BY status")
+    c.execute("SELECT status, n AS count FROM review_counters WHERE n > 0")
     rows = c.fetchall()
     conn.close()
     return {r["status"]: r["count"] for r in rows if r["status"]}
 
 
-def get_length_stats() -> Dict[str, float]:
-    """Return basic length stats for originals vs clean text."""
-    init_db()
-    conn = get_conn()
+def get_archive_stats(path: Optional[Path] = None) -> Dict[str, int]:
+    """Return counts per status of reviews moved out by the archival job."""
+    init_db(path)
+    conn = get_conn(path)
+    rows = conn.execute("SELECT status, n FROM archive_counters WHERE n > 0").fetchall()
+    conn.close()
+    return {r["status"]: r["n"] for r in rows}
+
+
+def get_length_stats(path: Optional[Path] = None) -> Dict[str, float]:
+    """Return basic length stats for originals vs clean text (from the counters table)."""
+    init_db(path)
+    conn = get_conn(path)
     c = conn.cursor()
     c.execute(
         """
         SELECT
-            COUNT(*) as n,
-            AVG(LENGTH(text)) as avg_input,
-            AVG(LENGTH(clean_text)) as avg_clean
-        FROM review_queue
-        WHERE text IS NOT NULL AND clean_text IS NOT NULL
+            SUM(len_n) as n,
+            SUM(text_len) as text_len,
+            SUM(clean_len) as clean_len
+        FROM review_counters
         """
     )
     row = c.fetchone()
     conn.close()
     if not row or not row["n"]:
         return {"count": 0, "avg_input": 0.0, "avg_clean": 0.0, "avg_delta": 0.0}
-    avg_input = row["avg_input"] or 0.0
-    avg_clean = row["avg_clean"] or 0.0
+    avg_input = row["text_len"] / row["n"]
+    avg_clean = row["clean_len"] / row["n"]
     return {
         "count": row["n"],
         "avg_input": avg_input,
         "avg_clean": avg_clean,
         "avg_delta": avg_clean - avg_input,
     }
+
+
+def get_review_series(since: float, status: Optional[str] = None, path: Optional[Path] = None) -> List[Dict]:
+    """Return review writes per ``SERIES_BUCKET_S`` bucket and status since *since*.
+
+    A bucket counts the items that reached a status in it: enqueued items
+    under ``pending``, decisions under ``approved``/``rejected``.
+    """
+    init_db(path)
+    params: List[Any] = [int(since // SERIES_BUCKET_S) * SERIES_BUCKET_S]
+    where = "bucket >= ?"
+    if status:
+        where += " AND status = ?"
+        params.append(status)
+    conn = get_conn(path)
+    rows = conn.execute(
+        f"SELECT bucket, status, n FROM review_series WHERE {where} ORDER BY bucket, status",
+        params,
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
@@ -0,0 +1,110 @@
+"""Deterministic stand-in for ``llama_cpp.Llama`` with a latency model.
+
+``FakeLlama`` answers ``create_chat_completion`` like the real model would
+(echoing the ``<USER_INPUT>`` block as ``clean_text``, or an empty edit list
+when called with the edits-mode grammar), but spends simulated
+time on prompt evaluation and per-token decoding while holding a single-slot
+lock, the way one ``Llama`` instance serialises requests.  A configurable
+share of answers is cut short to exercise the JSON fallback paths.  Enable it
+with ``FAKE_LLM=1`` to load-test without a GGUF file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List
+
+from .config import (
+    FAKE_LLM_DECODE_TPS,
+    FAKE_LLM_JSON_FAIL_RATE,
+    FAKE_LLM_PROMPT_TPS,
+    FAKE_LLM_SEED,
+    FAKE_LLM_TTFT_MS,
+)
+from .slm_llamacpp import EDITS_GRAMMAR
+
+USER_INPUT_RE = re.compile(r"<USER_INPUT>\n?(.*?)\n?</USER_INPUT>", re.DOTALL)
+
+
+class FakeLlama:
+    def __init__(
+        self,
+        prompt_tps: float = FAKE_LLM_PROMPT_TPS,
+        decode_tps: float = FAKE_LLM_DECODE_TPS,
+        ttft_ms: float = FAKE_LLM_TTFT_MS,
+        json_fail_rate: float = FAKE_LLM_JSON_FAIL_RATE,
+        seed: int = FAKE_LLM_SEED,
+        chars_per_token: float = 4.0,
+    ):
+        self.prompt_tps = prompt_tps
+        self.decode_tps = decode_tps
+        self.ttft_ms = ttft_ms
+        self.json_fail_rate = json_fail_rate
+        self.seed = seed
+        self.chars_per_token = chars_per_token
+        self._slot = threading.Lock()
+
+    def _tokens(self, text: str) -> int:
+        return max(1, math.ceil(len(text) / self.chars_per_token))
+
+    def _fails(self, text: str) -> bool:
+        """Decide deterministically from the seed and input whether to fail."""
+        if self.json_fail_rate <= 0:
+            return False
+        digest = hashlib.blake2b(f"{self.seed}\x1f{text}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2**64 < self.json_fail_rate
+
+    def create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.0,
+        max_tokens: int = 512,
+        grammar: Any = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        match = USER_INPUT_RE.search(messages[-1].get("content", "")) if messages else None
+        user_input = match.group(1) if match else ""
+        if grammar == EDITS_GRAMMAR:
+            content = json.dumps({"edits": [], "flags": []}, ensure_ascii=False)
+        else:
+            content = json.dumps({"clean_text": user_input, "flags": [], "changes": []}, ensure_ascii=False)
+        finish_reason = "stop"
+        if self._fails(user_input):
+            # Truncated output, as when the model runs out of tokens mid-object.
+            content = content[: len(content) // 2]
+        completion_tokens = self._tokens(content)
+        if completion_tokens > max_tokens:
+            content = content[: int(max_tokens * self.chars_per_token)]
+            completion_tokens = max_tokens
+            finish_reason = "length"
+        prompt_tokens = self._tokens(prompt)
+
+        # A rate of 0 means that phase is instantaneous.
+        prompt_s = prompt_tokens / self.prompt_tps if self.prompt_tps > 0 else 0.0
+        decode_s = completion_tokens / self.decode_tps if self.decode_tps > 0 else 0.0
+        with self._slot:
+            time.sleep(self.ttft_ms / 1000.0 + prompt_s)
+            time.sleep(decode_s)
+
+        return {
+            "object": "chat.completion",
+            "model": "fake",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
@@ -1,29 +1,416 @@
 from pathlib import Path
 import pandas as pd
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence
 
-def read_table(path: str) -> pd.DataFrame:
+try:  # optional dependency for Parquet/Feather
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+try:  # pandas' own Excel engine; imported directly for streaming .xlsx
+    import openpyxl
+except Exception:  # pragma: no cover - openpyxl is optional
+    openpyxl = None
+
+# Columns the pipeline reads; everything else is only passed through.
+PIPELINE_COLUMNS = ["id", "text", "protected_terms", "translate_embedded"]
+# Pipeline output columns holding lists of dicts.
+NESTED_COLUMNS = ("flags", "changes")
+
+EXCEL_SUFFIXES = {".xlsx", ".xlsm", ".xls"}
+# Formats openpyxl can stream; legacy .xls still goes through pandas/xlrd.
+XLSX_SUFFIXES = {".xlsx", ".xlsm"}
+PARQUET_SUFFIXES = {".parquet", ".pq"}
+FEATHER_SUFFIXES = {".feather", ".arrow"}
+
+if pa is not None:
+    # Known keys of flags/changes become typed struct fields; anything else
+    # (model-specific keys, unexpected types) is kept as JSON in ``extra``.
+    NESTED_FIELDS = {
+        "flags": {
+            "type": pa.string(),
+            "start": pa.int64(),
+            "end": pa.int64(),
+            "score": pa.float64(),
+            "entity_type": pa.string(),
+            "value": pa.string(),
+            "action": pa.string(),
+            "source": pa.string(),
+        },
+        "changes": {
+            "span": pa.list_(pa.int64()),
+            "type": pa.string(),
+            "source": pa.string(),
+            "before": pa.string(),
+            "after": pa.string(),
+        },
+    }
+    NESTED_TYPES = {
+        name: pa.list_(pa.struct([pa.field(k, t) for k, t in fields.items()] + [pa.field("extra", pa.string())]))
+        for name, fields in NESTED_FIELDS.items()
+    }
+
+
+def _suffix(path: Any) -> str:
+    return Path(path).suffix.lower()
+
+
+def _is_arrow(path: Any) -> bool:
+    return _suffix(path) in PARQUET_SUFFIXES | FEATHER_SUFFIXES
+
+
+def _is_excel(path: Any) -> bool:
+    return _suffix(path) in EXCEL_SUFFIXES
+
+
+def _streams_xlsx(path: Any) -> bool:
+    return openpyxl is not None and _suffix(path) in XLSX_SUFFIXES
+
+
+def _require_arrow(path: Any) -> None:
+    if pa is None:
+        raise RuntimeError(f"Reading or writing {Path(path).name} requires pyarrow (pip install pyarrow)")
+
+
+def _xlsx_header(rows: Iterator[tuple]) -> List[str]:
+    header = next(rows, ())
+    return [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(header)]
+
+
+def _iter_xlsx(path: Path, columns: Optional[List[str]], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream the first sheet of an .xlsx file with openpyxl's read-only mode.
+
+    Cells are read row by row from the sheet XML instead of building the
+    whole workbook object model, so memory is bounded by *chunk_size*.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = _xlsx_header(rows)
+        names = columns if columns is not None else header
+        missing = [c for c in names if c not in header]
+        if missing:
+            raise ValueError(f"Columns not found in {path.name}: {missing}")
+        picks = [header.index(c) for c in names]
+        chunk: List[List[Any]] = []
+        for row in rows:
+            # Sheets often carry formatted but empty trailing rows.
+            if not any(v is not None for v in row):
+                continue
+            chunk.append([row[i] if i < len(row) else None for i in picks])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=names)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=names)
+    finally:
+        wb.close()
+
+
+def table_columns(path: str) -> List[str]:
+    """Return the column names of a table without loading its rows."""
+    p = Path(path)
+    if _suffix(p) in PARQUET_SUFFIXES:
+        _require_arrow(p)
+        return list(pq.read_schema(p).names)
+    if _suffix(p) in FEATHER_SUFFIXES:
+        _require_arrow(p)
+        with pa.memory_map(str(p)) as source:
+            return list(pa_ipc.open_file(source).schema.names)
+    if _streams_xlsx(p):
+        wb = openpyxl.load_workbook(p, read_only=True)
+        try:
+            return _xlsx_header(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+    if _is_excel(p):
+        return list(pd.read_excel(p, nrows=0).columns)
+    return list(pd.read_csv(p, nrows=0).columns)
+
+
+def estimate_rows(path: str) -> Optional[int]:
+    """Return the number of data rows in a table, cheaply and for progress only.
+
+    Parquet, Feather and .xlsx report it from their metadata.  CSV rows are
+    estimated from the line count, which overcounts quoted multi-line
+    fields.  Returns ``None`` when no cheap count exists.
+    """
+    p = Path(path)
+    if _suffix(p) in PARQUET_SUFFIXES:
+        _require_arrow(p)
+        return pq.ParquetFile(p).metadata.num_rows
+    if _suffix(p) in FEATHER_SUFFIXES:
+        _require_arrow(p)
+        with pa.memory_map(str(p)) as source:
+            reader = pa_ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    if _streams_xlsx(p):
+        wb = openpyxl.load_workbook(p, read_only=True)
+        try:
+            rows = wb.worksheets[0].max_row
+        finally:
+            wb.close()
+        return max(0, rows - 1) if rows else None
+    if _is_excel(p):
+        return None
+    lines = 0
+    last = b"\n"
+    with p.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(0, lines - 1)
+
+
+def read_table(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
     p = Path(path)
-    if p.suffix.lower() in {".xlsx", ".xls"}:
-        return pd.read_excel(p)
-    return pd.read_csv(p)
+    cols = list(columns) if columns is not None else None
+    if _suffix(p) in PARQUET_SUFFIXES:
+        _require_arrow(p)
+        return pq.read_table(p, columns=cols).to_pandas()
+    if _suffix(p) in FEATHER_SUFFIXES:
+        _require_arrow(p)
+        return pd.read_feather(p, columns=cols)
+    if _streams_xlsx(p):
+        chunks = list(_iter_xlsx(p, cols, chunk_size=100_000))
+        if not chunks:
+            return pd.DataFrame(columns=cols if cols is not None else table_columns(str(p)))
+        return pd.concat(chunks, ignore_index=True)
+    if _is_excel(p):
+        return pd.read_excel(p, usecols=cols)
+    return pd.read_csv(p, usecols=cols)
+
+
+def iter_table(
+    path: str, columns: Optional[Sequence[str]] = None, chunk_size: int = 10_000, as_text: bool = False
+) -> Iterator[pd.DataFrame]:
+    """Yield a table in chunks of about *chunk_size* rows.
+
+    Parquet is streamed row group by row group, Feather record batch by
+    record batch and .xlsx row by row, reading only *columns*, so memory
+    stays bounded.  Legacy .xls files are read whole.  With *as_text*, CSV
+    cells are read as the strings written, without pandas guessing types
+    or NA markers (``007`` and ``NA`` stay as they are); only empty cells
+    are missing.
+    """
+    p = Path(path)
+    cols = list(columns) if columns is not None else None
+    if _suffix(p) in PARQUET_SUFFIXES:
+        _require_arrow(p)
+        for batch in pq.ParquetFile(p).iter_batches(batch_size=chunk_size, columns=cols):
+            yield batch.to_pandas()
+    elif _suffix(p) in FEATHER_SUFFIXES:
+        _require_arrow(p)
+        with pa.memory_map(str(p)) as source:
+            reader = pa_ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if cols is not None:
+                    batch = batch.select(cols)
+                yield batch.to_pandas()
+    elif _streams_xlsx(p):
+        yield from _iter_xlsx(p, cols, chunk_size)
+    elif _is_excel(p):
+        yield read_table(str(p), columns=cols)
+    elif as_text:
+        yield from pd.read_csv(
+            p, usecols=cols, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""]
+        )
+    else:
+        yield from pd.read_csv(p, usecols=cols, chunksize=chunk_size)
+
+
+def _nested_value(items: Any, fields: Dict[str, Any]) -> Optional[List[Dict]]:
+    """Map one flags/changes cell onto the struct fields of ``NESTED_TYPES``."""
+    if isinstance(items, str):
+        items = json.loads(items) if items else []
+    if items is None or (isinstance(items, float) and pd.isna(items)):
+        return None
+    out = []
+    for item in items:
+        if not isinstance(item, dict):
+            item = {"type": str(item)}
+        row: Dict[str, Any] = {}
+        extra: Dict[str, Any] = {}
+        for key, value in item.items():
+            ftype = fields.get(key)
+            if ftype is None or value is None:
+                extra[key] = value
+            elif pa.types.is_string(ftype) and isinstance(value, str):
+                row[key] = value
+            elif pa.types.is_int64(ftype) and isinstance(value, int) and not isinstance(value, bool):
+                row[key] = value
+            elif pa.types.is_float64(ftype) and isinstance(value, (int, float)) and not isinstance(value, bool):
+                row[key] = float(value)
+            elif pa.types.is_list(ftype) and isinstance(value, list) and all(
+                isinstance(v, int) and not isinstance(v, bool) for v in value
+            ):
+                row[key] = value
+            else:
+                extra[key] = value
+        row["extra"] = serialize(extra) if extra else None
+        out.append(row)
+    return out
+
+
+def _to_arrow(df: pd.DataFrame, schema: Optional["pa.Schema"] = None) -> "pa.Table":
+    """Convert *df* to Arrow with native list<struct> flags/changes columns."""
+    nested = [c for c in NESTED_COLUMNS if c in df.columns]
+    table = pa.Table.from_pandas(df.drop(columns=nested), preserve_index=False)
+    for name in nested:
+        values = [_nested_value(v, NESTED_FIELDS[name]) for v in df[name]]
+        table = table.append_column(pa.field(name, NESTED_TYPES[name]), pa.array(values, type=NESTED_TYPES[name]))
+    table = table.select(list(df.columns))
+    if schema is None:
+        # Columns that are all-null in the first chunk default to strings so
+        # later chunks can still be cast to the schema.
+        fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+        return table.cast(pa.schema(fields))
+    return table.cast(schema)
+
+
+def _excel_value(value: Any) -> Any:
+    """Convert a DataFrame cell to something openpyxl writes faithfully."""
+    if hasattr(value, "tolist") and not isinstance(value, str):
+        value = value.tolist()  # numpy scalars and arrays
+    if isinstance(value, (list, dict)):
+        return serialize(value)
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value is pd.NaT:
+        return None
+    return value
+
+
+def _to_text_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Serialize list-valued flags/changes cells for CSV/Excel output."""
+    nested = [c for c in NESTED_COLUMNS if c in df.columns]
+    if not nested:
+        return df
+    df = df.copy()
+    for name in nested:
+        df[name] = [v if isinstance(v, str) else serialize(v) for v in df[name]]
+    return df
+
 
 def write_table(df: pd.DataFrame, path: str) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    if p.suffix.lower() in {".xlsx", ".xls"}:
-        df.to_excel(p, index=False)
+    if _is_arrow(p):
+        with TableWriter(str(p)) as writer:
+            writer.write(df)
+    elif _streams_xlsx(p):
+        with TableWriter(str(p)) as writer:
+            writer.write(df)
+    elif _is_excel(p):
+        _to_text_frame(df).to_excel(p, index=False)
     else:
-        df.to_csv(p, index=False)
+        _to_text_frame(df).to_csv(p, index=False)
+
+
+class TableWriter:
+    """Append DataFrame chunks to a CSV, Excel, Parquet or Feather file.
+
+    Parquet gets one row group and Feather one record batch per chunk, with
+    ``flags``/``changes`` stored as native list<struct> columns; CSV and
+    Excel keep them as JSON strings.  .xlsx rows go straight to an openpyxl
+    write-only sheet, which streams them to a temporary file instead of
+    keeping cell objects in memory; the workbook is assembled on close.
+
+    With *columns*, a writer closed without any rows still leaves a file
+    with that header (or, for Parquet/Feather, a schema of string columns).
+    """
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None):
+        self.path = Path(path)
+        self.columns = list(columns) if columns is not None else None
+        self._written = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if _is_arrow(self.path):
+            _require_arrow(self.path)
+        self._writer = None
+        self._schema = None
+        self._sink = None
+        self._csv_started = False
+        self._excel_chunks: List[pd.DataFrame] = []
+        self._workbook = None
+        self._sheet = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        self._written = True
+        suffix = _suffix(self.path)
+        if _is_arrow(self.path):
+            table = _to_arrow(df, self._schema)
+            if self._writer is None:
+                self._schema = table.schema
+                if suffix in PARQUET_SUFFIXES:
+                    self._writer = pq.ParquetWriter(self.path, self._schema)
+                else:
+                    self._sink = pa.OSFile(str(self.path), "wb")
+                    self._writer = pa_ipc.new_file(self._sink, self._schema)
+            self._writer.write_table(table)
+        elif _streams_xlsx(self.path):
+            if self._workbook is None:
+                self._workbook = openpyxl.Workbook(write_only=True)
+                self._sheet = self._workbook.create_sheet()
+                self._sheet.append([str(c) for c in df.columns])
+            for row in df.itertuples(index=False, name=None):
+                self._sheet.append([_excel_value(v) for v in row])
+        elif _is_excel(self.path):
+            self._excel_chunks.append(_to_text_frame(df))
+        else:
+            _to_text_frame(df).to_csv(self.path, mode="a" if self._csv_started else "w", header=not self._csv_started, index=False)
+            self._csv_started = True
+
+    def close(self) -> None:
+        if not self._written and self.columns is not None:
+            self.write(pd.DataFrame(columns=self.columns))
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        if self._workbook is not None:
+            self._workbook.save(self.path)
+            self._workbook = self._sheet = None
+        if self._excel_chunks:
+            pd.concat(self._excel_chunks, ignore_index=True).to_excel(self.path, index=False)
+            self._excel_chunks = []
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
 
 def parse_terms(x: Any) -> List[str]:
     if x is None or (isinstance(x, float) and pd.isna(x)):
         return []
+    if hasattr(x, "tolist") and not isinstance(x, str):
+        x = x.tolist()  # list columns from Parquet/Feather arrive as arrays
     if isinstance(x, list):
         return [str(t).strip() for t in x]
     # "term1; term2; term3"
     return [t.strip() for t in str(x).split(";") if t.strip()]
 
+def parse_flag(x: Any) -> bool:
+    """Read a yes/no cell: booleans and numbers as such, text like "true"/"1"/"yes"."""
+    if x is None or (isinstance(x, float) and pd.isna(x)):
+        return False
+    if isinstance(x, str):
+        value = x.strip().lower()
+        if value in {"true", "yes", "y", "t"}:
+            return True
+        try:
+            return float(value) != 0
+        except ValueError:
+            return False
+    return bool(x)
+
 def serialize(obj: Any) -> str:
     return json.dumps(obj, ensure_ascii=False)
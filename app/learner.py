@@ -1,17 +1,37 @@
+import difflib
 import json
 import re
+import threading
 from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Pattern, Tuple
 
-from .db import get_review_history
+from .review_store import get_store
 
 RULES_PATH = Path("data/rules.json")
+# A pattern must be seen this many times before it becomes a rule.
+MIN_SUPPORT = 3
+
+RuleKey = Tuple[str, str, str]
+
+
+def _rules_version() -> Optional[Tuple[int, int]]:
+    try:
+        st = RULES_PATH.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+TOKEN_RE = re.compile(r"\S+")
 
 
 class RuleMiner:
-    def __init__(self):
-        pass
+    def __init__(self, max_tokens: int = 3, context: int = 1):
+        # Longest token hunk considered a local rewrite, and the number of
+        # neighbouring tokens kept around unclassified rewrites.
+        self.max_tokens = max_tokens
+        self.context = context
 
     def extract_patterns(self, original: str, corrected: str) -> Optional[Dict]:
         if not original or not corrected or original == corrected:
@@ -25,21 +45,81 @@ class RuleMiner:
         if original.replace(" ", "") == corrected.replace(" ", "") and original != corrected:
             return {"type": "spacing", "pattern": original, "fix": corrected, "confidence": 0.5}
 
-        # Heuristic: hyphen standardization (e.g., SKU 123 -> SKU-123)
-        if re.sub(r"[-\s]", "", original) == re.sub(r"[-\s]", "", corrected) and original != corrected:
+        # Heuristic: hyphen standardization (e.g., sku 123 -> SKU-123); the rule
+        # is applied case-insensitively, so casing may change along with it.
+        if re.sub(r"[-\s]", "", original).lower() == re.sub(r"[-\s]", "", corrected).lower() and original != corrected:
             return {"type": "hyphenation", "pattern": original, "fix": corrected, "confidence": 0.5}
 
         return None
 
+    def extract_token_patterns(self, original: str, corrected: str) -> List[Dict]:
+        """Return local rewrite candidates from a token-level diff.
+
+        Both texts are aligned on whitespace tokens and every differing hunk
+        of at most ``max_tokens`` tokens is classified on its own; hunks that
+        are no casing/spacing/hyphenation fix become ``rewrite`` candidates
+        anchored by ``context`` unchanged tokens on each side.  When no hunk
+        qualifies, the whole-text heuristics of :meth:`extract_patterns` apply.
+        """
+        if not original or not corrected or original == corrected:
+            return []
+
+        a = list(TOKEN_RE.finditer(original))
+        b = list(TOKEN_RE.finditer(corrected))
+        matcher = difflib.SequenceMatcher(None, [m.group(0) for m in a], [m.group(0) for m in b], autojunk=False)
+        candidates: List[Dict] = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal" or i2 - i1 > self.max_tokens or j2 - j1 > self.max_tokens:
+                continue
+            if i1 < i2 and j1 < j2:
+                rule = self.extract_patterns(
+                    original[a[i1].start() : a[i2 - 1].end()],
+                    corrected[b[j1].start() : b[j2 - 1].end()],
+                )
+                if rule:
+                    candidates.append(rule)
+                    continue
+            # Unchanged neighbours are identical in both texts, so the same
+            # number of context tokens can be taken from each side.
+            left = min(self.context, i1, j1)
+            right = min(self.context, len(a) - i2, len(b) - j2)
+            if not left and not right:
+                continue
+            ai, aj = i1 - left, i2 + right
+            bi, bj = j1 - left, j2 + right
+            candidates.append(
+                {
+                    "type": "rewrite",
+                    "pattern": original[a[ai].start() : a[aj - 1].end()],
+                    "fix": corrected[b[bi].start() : b[bj - 1].end()],
+                    "confidence": 0.3,
+                }
+            )
+        if not candidates:
+            whole = self.extract_patterns(original, corrected)
+            if whole:
+                candidates.append(whole)
+        return candidates
+
+    def review_patterns(self, item: Dict) -> List[Dict]:
+        """Return the candidates of one review, each ``(pattern, fix, type)`` once."""
+        orig = item.get("text", "")
+        corr = item.get("correction", "")
+        if not corr or not orig:
+            return []
+        seen = set()
+        rules = []
+        for rule in self.extract_token_patterns(orig, corr):
+            key = (rule["pattern"], rule["fix"], rule["type"])
+            if key not in seen:
+                seen.add(key)
+                rules.append(rule)
+        return rules
+
     def mine_from_history(self, history: List[Dict]) -> List[Dict]:
         potential_rules = []
         for item in history:
-            orig = item.get("text", "")
-            corr = item.get("correction", "")
-            if not corr or not orig:
-                continue
-            rule = self.extract_patterns(orig, corr)
-            if rule:
+            for rule in self.review_patterns(item):
                 rule["source_id"] = item.get("id")
                 potential_rules.append(rule)
 
@@ -48,18 +128,38 @@ class RuleMiner:
         for r in potential_rules:
             key = (r["pattern"], r["fix"], r["type"])
             count = rule_counts[key]
-            if count >= 3:
+            if count >= MIN_SUPPORT:
                 r["confidence"] = min(1.0, count / 10.0)
                 refined_rules.append(r)
         return refined_rules
 
+    def count_patterns(self, history: List[Dict]) -> Counter:
+        """Count ``(pattern, fix, type)`` candidates in *history*, once per review."""
+        counts: Counter = Counter()
+        for item in history:
+            counts.update((r["pattern"], r["fix"], r["type"]) for r in self.review_patterns(item))
+        return counts
+
 
 class Learner:
     def __init__(self):
+        self._compiled: Optional[List[Tuple[Pattern, str]]] = None
         self.rules: List[Dict] = []
+        self.version: Optional[Tuple[int, int]] = None
+        self._learn_lock = threading.Lock()
         self.load_rules()
 
+    @property
+    def rules(self) -> List[Dict]:
+        return self._rules
+
+    @rules.setter
+    def rules(self, value: List[Dict]) -> None:
+        self._rules = value
+        self._compiled = None
+
     def load_rules(self):
+        self.version = _rules_version()
         if RULES_PATH.exists():
             try:
                 with RULES_PATH.open("r", encoding="utf-8") as f:
@@ -73,41 +173,90 @@ class Learner:
         RULES_PATH.parent.mkdir(parents=True, exist_ok=True)
         with RULES_PATH.open("w", encoding="utf-8") as f:
             json.dump(self.rules, f, ensure_ascii=False, indent=2)
+        self.version = _rules_version()
 
     def get_rules(self) -> List[Dict]:
         return self.rules
 
     def learn(self, limit: int = 1000):
-        history = get_review_history(limit=limit)
-        miner = RuleMiner()
-        new_rules = miner.mine_from_history(history)
-        if not new_rules:
-            return []
+        """Mine reviews decided since the last run and merge the resulting rules.
 
-        existing = {(r.get("pattern"), r.get("fix"), r.get("type")) for r in self.rules}
-        merged = list(self.rules)
-        for r in new_rules:
-            key = (r.get("pattern"), r.get("fix"), r.get("type"))
-            if key not in existing:
-                merged.append(r)
-        self.rules = merged
-        self.save_rules()
-        return new_rules
+        Reviews are read ``limit`` rows at a time above the stored ``seq``
+        high-water mark and folded into the persistent pattern counters, so
+        each review is mined once and older corrections keep counting.
+        Returns the rules that were added by this run.
+        """
+        with self._learn_lock:
+            miner = RuleMiner()
+            store = get_store()
+            watermark = store.get_learner_watermark()
+            totals: Dict[RuleKey, int] = {}
+            while True:
+                batch = store.get_reviews_since(watermark, limit=limit)
+                if not batch:
+                    break
+                watermark = batch[-1]["seq"]
+                totals.update(store.record_rule_patterns(miner.count_patterns(batch), watermark))
+            if not totals:
+                return []
 
-    def harmonize(self, text: str) -> str:
-        if not self.rules:
-            return text
-        sorted_rules = sorted(self.rules, key=lambda x: x.get("confidence", 0), reverse=True)
-        result_text = text
-        for rule in sorted_rules:
+            merged = list(self.rules)
+            index = {(r.get("pattern"), r.get("fix"), r.get("type")): r for r in merged}
+            new_rules: List[Dict] = []
+            for (pattern, fix, rtype), count in totals.items():
+                if count < MIN_SUPPORT:
+                    continue
+                confidence = min(1.0, count / 10.0)
+                existing = index.get((pattern, fix, rtype))
+                if existing is not None:
+                    existing["confidence"] = confidence
+                    existing["count"] = count
+                    continue
+                rule = {"type": rtype, "pattern": pattern, "fix": fix, "confidence": confidence, "count": count}
+                merged.append(rule)
+                new_rules.append(rule)
+            self.rules = merged
+            self.save_rules()
+            return new_rules
+
+    def _compile(self) -> List[Tuple[Pattern, str]]:
+        compiled: List[Tuple[Pattern, str]] = []
+        for rule in sorted(self.rules, key=lambda x: x.get("confidence", 0), reverse=True):
             pattern = rule.get("pattern")
             fix = rule.get("fix")
             rtype = rule.get("type")
             if not pattern or not fix:
                 continue
             flags = re.IGNORECASE if rtype in {"casing", "hyphenation"} else 0
+            # Rules are mined from whole tokens, so never match inside a word;
+            # punctuation next to the pattern is fine.
+            compiled.append((re.compile(r"(?<!\w)" + re.escape(pattern) + r"(?!\w)", flags), fix))
+        self._compiled = compiled
+        return compiled
+
+    def harmonize(self, text: str) -> str:
+        compiled = self._compiled if self._compiled is not None else self._compile()
+        if not compiled:
+            return text
+        result_text = text
+        for regex, fix in compiled:
             try:
-                result_text = re.sub(re.escape(pattern), fix, result_text, flags=flags)
+                result_text = regex.sub(fix, result_text)
             except re.error:
                 continue
         return result_text
+
+
+_LEARNER: Optional[Learner] = None
+_LEARNER_LOCK = threading.Lock()
+
+
+def get_learner() -> Learner:
+    """Return the process-wide learner, reloading rules when the file changes."""
+    global _LEARNER
+    with _LEARNER_LOCK:
+        if _LEARNER is None:
+            _LEARNER = Learner()
+        elif _LEARNER.version != _rules_version():
+            _LEARNER.load_rules()
+        return _LEARNER
@@ -1,15 +1,102 @@
+import itertools
+import os
+import random
 import sys
 import uuid
-from typing import Optional, Tuple
+import zlib
+from typing import Any, Dict, Optional, Tuple
 
 from loguru import logger
 
-# Configure a single JSON logger sink
+from .config import LOG_ENQUEUE, LOG_LEVEL, LOG_SAMPLE_RATES, RECORD_LOG_LEVEL
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse ``"event=rate,..."`` into a dict; malformed entries are ignored."""
+    rates: Dict[str, float] = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+def _level(name: str) -> str:
+    """Return *name* if loguru knows the level, else ``INFO``."""
+    try:
+        logger.level(name)
+    except ValueError:
+        return 'INFO'
+    return name
+
+
+# Configure a single JSON logger sink.  With LOG_ENQUEUE the sink write
+# happens on loguru's worker thread; anything still queued is written when
+# loguru removes the handler at exit.
 logger.remove()
-logger.add(sys.stdout, serialize=True, backtrace=False, diagnose=False)
+logger.add(
+    sys.stdout,
+    serialize=True,
+    level=_level(LOG_LEVEL),
+    enqueue=LOG_ENQUEUE,
+    backtrace=False,
+    diagnose=False,
+)
+
+SAMPLE_RATES = parse_sample_rates(LOG_SAMPLE_RATES)
+RECORD_LEVEL = _level(RECORD_LOG_LEVEL)
+_MIN_LEVEL = logger.level(_level(LOG_LEVEL)).no
+
+# Generated correlation ids are a per-process random prefix plus a counter:
+# unique across processes, but far cheaper than a uuid4 per record.
+_PREFIX = uuid.uuid4().hex[:12]
+_COUNTER = itertools.count(1)
+
+
+def _reset_ids() -> None:
+    global _PREFIX, _COUNTER
+    _PREFIX = uuid.uuid4().hex[:12]
+    _COUNTER = itertools.count(1)
+
+
+if hasattr(os, 'register_at_fork'):
+    # Forked workers (including forkserver children) must not repeat ids.
+    os.register_at_fork(after_in_child=_reset_ids)
+
+
+def new_correlation_id() -> str:
+    return f"{_PREFIX}-{next(_COUNTER):x}"
 
 
 def get_logger(correlation_id: Optional[str] = None) -> Tuple["logger", str]:
     """Return a logger bound with a correlation id."""
-    cid = correlation_id or str(uuid.uuid4())
+    cid = correlation_id or new_correlation_id()
     return logger.bind(correlation_id=cid), cid
+
+
+def sampled(event: str, key: Optional[str] = None) -> bool:
+    """Decide whether to emit *event*, given its rate in ``SAMPLE_RATES``.
+
+    With a *key* (the record id) the decision is a hash of the key, so all
+    events of a record sampled at the same rate are kept or dropped together.
+    """
+    rate = SAMPLE_RATES.get(event, 1.0)
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    if key is None:
+        return random.random() < rate
+    return zlib.crc32(key.encode('utf-8')) < rate * 2**32
+
+
+def log_record_event(log, event: str, key: Optional[str] = None, level: Optional[str] = None, **fields: Any) -> None:
+    """Log a per-record *event* at ``RECORD_LOG_LEVEL`` (or *level*), subject
+    to sampling.  Dropped events are rejected before loguru builds a record.
+    """
+    level = level or RECORD_LEVEL
+    if logger.level(level).no < _MIN_LEVEL or not sampled(event, key):
+        return
+    log.opt(depth=1).log(level, event, event=event, **fields)
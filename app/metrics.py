@@ -0,0 +1,79 @@
+"""Prometheus metrics for the pipeline.
+
+Metrics live in the default ``prometheus_client`` registry, which the API
+already exposes on ``/metrics``.  Without ``prometheus_client`` installed
+they are no-ops.
+"""
+
+try:  # optional dependency (pulled in by prometheus-fastapi-instrumentator)
+    from prometheus_client import Counter, Histogram
+except Exception:  # pragma: no cover - prometheus_client is optional
+    Counter = Histogram = None
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+def _counter(name: str, doc: str, labels):
+    return Counter(name, doc, labels) if Counter is not None else _NoopMetric()
+
+
+def _histogram(name: str, doc: str, labels, buckets):
+    return Histogram(name, doc, labels, buckets=buckets) if Histogram is not None else _NoopMetric()
+
+
+ROUTE_REQUESTS = _counter(
+    "cleanroom_route_requests_total", "Records sent to each model route", ["route"]
+)
+ROUTE_MODEL_SECONDS = _histogram(
+    "cleanroom_route_model_seconds",
+    "Model stage latency per route, queueing for the route's workers included",
+    ["route"],
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+ROUTE_SIMILARITY = _histogram(
+    "cleanroom_route_similarity",
+    "Similarity of model output to input per route (lower means heavier rewrites)",
+    ["route"],
+    (0.5, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0),
+)
+ROUTE_OUTCOMES = _counter(
+    "cleanroom_route_outcomes_total", "Review status of records per route", ["route", "review_status"]
+)
+
+DRAFT_PROPOSED = _counter(
+    "cleanroom_draft_proposed_tokens_total", "Tokens proposed by the speculative draft", ["mode"]
+)
+DRAFT_ACCEPTED = _counter(
+    "cleanroom_draft_accepted_tokens_total", "Draft tokens accepted by the main model", ["mode"]
+)
+GENERATED_TOKENS = _counter(
+    "cleanroom_generated_tokens_total", "Completion tokens generated by the model", ["mode"]
+)
+GENERATION_TPS = _histogram(
+    "cleanroom_generation_tokens_per_second",
+    "Completion tokens per second of model call time (prompt evaluation included)",
+    ["mode"],
+    (1, 2, 5, 10, 20, 40, 80, 160, 320),
+)
+
+REVIEW_DECISION_SECONDS = _histogram(
+    "cleanroom_review_decision_seconds",
+    "Time from enqueue to decision per review item, group members included",
+    ["status"],
+    (60, 300, 900, 3600, 4 * 3600, 12 * 3600, 86400, 3 * 86400, 7 * 86400, 30 * 86400),
+)
+REVIEW_CLAIMS = _counter(
+    "cleanroom_review_claims_total", "Review items handed out by claim requests", []
+)
+REVIEW_CONFLICTS = _counter(
+    "cleanroom_review_conflicts_total", "Decisions refused because another reviewer holds or decided the item", []
+)
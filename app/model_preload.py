@@ -0,0 +1,13 @@
+"""Preload module for the ``forkserver`` worker pool of ``cli/clean_table.py``.
+
+The fork server imports this module once, which loads the model of every
+route (``MODEL_ROUTES``, or the single default model), and then forks
+every worker from that state.  The memory-mapped weights and anything
+llama.cpp allocated while loading are shared copy-on-write with the
+workers instead of being rebuilt in each of them.
+"""
+
+from .routing import get_routes
+
+for _route in get_routes():
+    _route.llama()
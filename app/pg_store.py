@@ -0,0 +1,595 @@
+"""PostgreSQL backend of the review queue (``REVIEW_STORE_URL=postgresql://...``).
+
+Lets several API replicas share one queue.  It mirrors ``app.db``:
+
+- Identical pending items are grouped (``group_key``/``dup_of``).  A
+  transaction-level advisory lock per group key makes the leader lookup
+  and insert atomic across replicas.
+- ``pos`` orders the queue for keyset paging.
+- ``seq`` numbers decisions for the learner watermark.  Decisions take a
+  transaction-level advisory lock before drawing it, so ``seq`` order is
+  commit order and the learner cannot skip a decision still in flight.
+- The ``review_queue_stats`` trigger keeps ``review_counters``,
+  ``review_series``, ``review_flags`` and ``review_changes`` current, as
+  the SQLite triggers do, so the dashboard statistics never scan the
+  queue.  Each write updates its status's counter row, and that row stays
+  locked until the write commits.  The page filters use GIN indexes on
+  the ``jsonb`` columns.
+- Claims use ``FOR UPDATE SKIP LOCKED``, so concurrent reviewers never
+  wait on each other or receive the same item.
+
+The archival job (``app.archive``) is SQLite-only; the archive statistics
+here are always empty.
+
+Needs ``psycopg`` (3.x) and ``psycopg_pool``.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:  # optional dependency for the PostgreSQL backend
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.types.json import Jsonb
+    from psycopg_pool import ConnectionPool
+except Exception:  # pragma: no cover - psycopg is optional
+    psycopg = None
+
+from .config import REVIEW_DEDUP
+from .db import PREVIEW_CHARS, SERIES_BUCKET_S, review_group_key
+from .review_store import RuleCounts, ReviewStore
+
+# Key of the advisory lock serialising decisions (any constant bigint).
+_SEQ_LOCK = 0x5C1EA2
+# First key of the two-key advisory locks on group keys (any constant int).
+_GROUP_LOCK = 0x5C1E
+
+
+def _group_lock(group_key: str) -> int:
+    """Second advisory lock key of a group: its hash as a signed 32-bit int."""
+    return int(group_key[:8], 16) - 2**31
+
+
+def _bucket(column: str) -> str:
+    """SQL of the ``SERIES_BUCKET_S`` bucket start of the epoch *column*."""
+    return f"(floor({column} / {SERIES_BUCKET_S}) * {SERIES_BUCKET_S})::bigint"
+
+
+_SCHEMA = [
+    "SELECT pg_advisory_xact_lock(%d)" % (_SEQ_LOCK + 1),
+    "CREATE SEQUENCE IF NOT EXISTS review_seq",
+    """
+    CREATE TABLE IF NOT EXISTS review_queue (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'pending',
+        text TEXT,
+        clean_text TEXT,
+        flags JSONB,
+        changes JSONB,
+        correction TEXT,
+        created_at DOUBLE PRECISION,
+        updated_at DOUBLE PRECISION,
+        group_key TEXT,
+        dup_of TEXT,
+        claimed_by TEXT,
+        claim_expires DOUBLE PRECISION,
+        pos BIGSERIAL,
+        seq BIGINT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_review_pending ON review_queue(pos) WHERE status = 'pending' AND dup_of IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_review_group ON review_queue(group_key) WHERE status = 'pending' AND dup_of IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_review_dup ON review_queue(dup_of) WHERE dup_of IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_review_seq ON review_queue(seq) WHERE seq IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_review_status_updated ON review_queue(status, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_review_created ON review_queue(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_review_claimed ON review_queue(claimed_by) WHERE claimed_by IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_review_flags ON review_queue USING GIN (flags jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_review_changes ON review_queue USING GIN (changes jsonb_path_ops)",
+    """
+    CREATE TABLE IF NOT EXISTS rule_patterns (
+        pattern TEXT,
+        fix TEXT,
+        type TEXT,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (pattern, fix, type)
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS learner_state (key TEXT PRIMARY KEY, value BIGINT)",
+    # Statistics kept by the review_queue_stats trigger, as in app.db.
+    """
+    CREATE TABLE IF NOT EXISTS review_counters (
+        status TEXT PRIMARY KEY,
+        n BIGINT NOT NULL DEFAULT 0,
+        len_n BIGINT NOT NULL DEFAULT 0,
+        text_len BIGINT NOT NULL DEFAULT 0,
+        clean_len BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS review_series (
+        bucket BIGINT,
+        status TEXT,
+        n BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, status)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS review_flags (
+        review_id TEXT,
+        type TEXT,
+        status TEXT,
+        PRIMARY KEY (review_id, type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS review_changes (
+        review_id TEXT,
+        source TEXT,
+        type TEXT,
+        n INTEGER NOT NULL DEFAULT 1,
+        status TEXT,
+        PRIMARY KEY (review_id, source, type)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_flags_status ON review_flags(status, type)",
+    "CREATE INDEX IF NOT EXISTS idx_changes_status ON review_changes(status, source, type)",
+    f"""
+    CREATE OR REPLACE FUNCTION review_queue_stats() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        content_changed BOOLEAN := TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND
+            (OLD.flags, OLD.changes, OLD.dup_of) IS DISTINCT FROM (NEW.flags, NEW.changes, NEW.dup_of));
+        new_flags JSONB;
+        new_changes JSONB;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO review_counters AS c (status, n, len_n, text_len, clean_len)
+            SELECT OLD.status, -1, -has_len, -has_len * COALESCE(length(OLD.text), 0),
+                   -has_len * COALESCE(length(OLD.clean_text), 0)
+            FROM (SELECT (OLD.text IS NOT NULL AND OLD.clean_text IS NOT NULL)::int AS has_len) h
+            ON CONFLICT (status) DO UPDATE SET n = c.n + EXCLUDED.n, len_n = c.len_n + EXCLUDED.len_n,
+                text_len = c.text_len + EXCLUDED.text_len, clean_len = c.clean_len + EXCLUDED.clean_len;
+        END IF;
+        IF TG_OP = 'DELETE' OR content_changed THEN
+            DELETE FROM review_flags WHERE review_id = OLD.id;
+            DELETE FROM review_changes WHERE review_id = OLD.id;
+        ELSIF OLD.status IS DISTINCT FROM NEW.status THEN
+            UPDATE review_flags SET status = NEW.status WHERE review_id = NEW.id;
+            UPDATE review_changes SET status = NEW.status WHERE review_id = NEW.id;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            RETURN NULL;
+        END IF;
+
+        INSERT INTO review_counters AS c (status, n, len_n, text_len, clean_len)
+        SELECT NEW.status, 1, has_len, has_len * COALESCE(length(NEW.text), 0),
+               has_len * COALESCE(length(NEW.clean_text), 0)
+        FROM (SELECT (NEW.text IS NOT NULL AND NEW.clean_text IS NOT NULL)::int AS has_len) h
+        ON CONFLICT (status) DO UPDATE SET n = c.n + EXCLUDED.n, len_n = c.len_n + EXCLUDED.len_n,
+            text_len = c.text_len + EXCLUDED.text_len, clean_len = c.clean_len + EXCLUDED.clean_len;
+        IF TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM NEW.status THEN
+            INSERT INTO review_series AS s (bucket, status, n)
+            VALUES ({_bucket("COALESCE(NEW.updated_at, extract(epoch FROM now()))")}, NEW.status, 1)
+            ON CONFLICT (bucket, status) DO UPDATE SET n = s.n + 1;
+        END IF;
+        IF content_changed THEN
+            -- Group members show their leader's flags and changes.
+            new_flags := COALESCE(NEW.flags, (SELECT l.flags FROM review_queue l WHERE l.id = NEW.dup_of));
+            new_changes := COALESCE(NEW.changes, (SELECT l.changes FROM review_queue l WHERE l.id = NEW.dup_of));
+            INSERT INTO review_flags (review_id, type, status)
+            SELECT DISTINCT NEW.id, t.type, NEW.status FROM (
+                SELECT CASE jsonb_typeof(f) WHEN 'object' THEN f->>'type' WHEN 'string' THEN f #>> '{{}}' END AS type
+                FROM jsonb_array_elements(CASE WHEN jsonb_typeof(new_flags) = 'array' THEN new_flags ELSE '[]' END) AS f
+            ) t
+            WHERE t.type IS NOT NULL;
+            INSERT INTO review_changes (review_id, source, type, n, status)
+            SELECT NEW.id, COALESCE(c->>'source', ''), COALESCE(c->>'type', ''), COUNT(*), NEW.status
+            FROM jsonb_array_elements(CASE WHEN jsonb_typeof(new_changes) = 'array' THEN new_changes ELSE '[]' END) AS c
+            WHERE jsonb_typeof(c) = 'object'
+            GROUP BY 2, 3;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    # First start with the trigger: count the rows already queued, with the
+    # table locked against writes until the trigger exists.
+    f"""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'review_queue_stats') THEN
+            RETURN;
+        END IF;
+        LOCK TABLE review_queue IN SHARE ROW EXCLUSIVE MODE;
+        DELETE FROM review_counters;
+        INSERT INTO review_counters (status, n, len_n, text_len, clean_len)
+        SELECT status, COUNT(*), COUNT(*) FILTER (WHERE text IS NOT NULL AND clean_text IS NOT NULL),
+               COALESCE(SUM(length(text)) FILTER (WHERE text IS NOT NULL AND clean_text IS NOT NULL), 0),
+               COALESCE(SUM(length(clean_text)) FILTER (WHERE text IS NOT NULL AND clean_text IS NOT NULL), 0)
+        FROM review_queue GROUP BY status;
+        DELETE FROM review_series;
+        INSERT INTO review_series (bucket, status, n)
+        SELECT bucket, status, COUNT(*) FROM (
+            SELECT {_bucket("created_at")} AS bucket, 'pending' AS status FROM review_queue WHERE created_at IS NOT NULL
+            UNION ALL
+            SELECT {_bucket("updated_at")}, status FROM review_queue
+            WHERE status <> 'pending' AND updated_at IS NOT NULL
+        ) w
+        GROUP BY bucket, status;
+        DELETE FROM review_flags;
+        INSERT INTO review_flags (review_id, type, status)
+        SELECT DISTINCT q.id, t.type, q.status
+        FROM review_queue q LEFT JOIN review_queue l ON l.id = q.dup_of,
+             jsonb_array_elements(CASE WHEN jsonb_typeof(COALESCE(q.flags, l.flags)) = 'array'
+                                       THEN COALESCE(q.flags, l.flags) ELSE '[]'::jsonb END) AS f,
+             LATERAL (SELECT CASE jsonb_typeof(f) WHEN 'object' THEN f->>'type'
+                                                  WHEN 'string' THEN f #>> '{{}}' END AS type) t
+        WHERE t.type IS NOT NULL;
+        DELETE FROM review_changes;
+        INSERT INTO review_changes (review_id, source, type, n, status)
+        SELECT q.id, COALESCE(c->>'source', ''), COALESCE(c->>'type', ''), COUNT(*), q.status
+        FROM review_queue q LEFT JOIN review_queue l ON l.id = q.dup_of,
+             jsonb_array_elements(CASE WHEN jsonb_typeof(COALESCE(q.changes, l.changes)) = 'array'
+                                       THEN COALESCE(q.changes, l.changes) ELSE '[]'::jsonb END) AS c
+        WHERE jsonb_typeof(c) = 'object'
+        GROUP BY 1, 2, 3, 5;
+        CREATE TRIGGER review_queue_stats AFTER INSERT OR UPDATE OR DELETE ON review_queue
+            FOR EACH ROW EXECUTE FUNCTION review_queue_stats();
+    END
+    $$
+    """,
+]
+
+# Group members carry no content of their own; they show their leader's.
+_MERGED_SELECT = """
+    SELECT q.id, q.status,
+           COALESCE(q.text, l.text) AS text, COALESCE(q.clean_text, l.clean_text) AS clean_text,
+           COALESCE(q.flags, l.flags) AS flags, COALESCE(q.changes, l.changes) AS changes,
+           q.correction, q.created_at, q.updated_at, q.group_key, q.dup_of, q.claimed_by, q.claim_expires,
+           1 + (SELECT COUNT(*) FROM review_queue m WHERE m.dup_of = q.id AND m.status = q.status) AS group_size
+    FROM review_queue q LEFT JOIN review_queue l ON l.id = q.dup_of
+"""
+
+
+class PostgresReviewStore(ReviewStore):
+    """Review queue in PostgreSQL, over a ``psycopg_pool.ConnectionPool``."""
+
+    def __init__(self, url: str, min_size: int = 1, max_size: int = 10):
+        if psycopg is None:
+            raise RuntimeError("the PostgreSQL review store needs psycopg and psycopg_pool installed")
+        self.key = url
+        self.pool = ConnectionPool(
+            url, min_size=min_size, max_size=max(min_size, max_size), kwargs={"row_factory": dict_row}, open=True
+        )
+        with self.pool.connection() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def upsert_reviews(self, items: Sequence[Tuple[str, Dict[str, Any]]], dedup: Optional[bool] = None) -> None:
+        dedup = REVIEW_DEDUP if dedup is None else dedup
+        now = time.time()
+        keyed = [
+            (item_id, payload, review_group_key(payload.get("text"), payload.get("clean_text"), payload.get("flags")))
+            for item_id, payload in items
+        ]
+        with self.pool.connection() as conn:
+            leaders: Dict[str, str] = {}
+            if dedup:
+                keys = list({key for _, payload, key in keyed if payload.get("status", "pending") == "pending"})
+                if keys:
+                    # Lock the groups before looking up their leaders, so two
+                    # replicas enqueueing the same item cannot both become
+                    # leader.  Sorted, so concurrent batches cannot deadlock.
+                    conn.execute(
+                        "SELECT pg_advisory_xact_lock(%s::int, k) FROM unnest(%s::int[]) AS k",
+                        (_GROUP_LOCK, sorted({_group_lock(key) for key in keys})),
+                    )
+                    leaders.update(
+                        (r["group_key"], r["id"])
+                        for r in conn.execute(
+                            """
+                            SELECT group_key, id FROM review_queue
+                            WHERE status = 'pending' AND dup_of IS NULL AND group_key = ANY(%s)
+                            """,
+                            (keys,),
+                        )
+                    )
+            if any(payload.get("status", "pending") != "pending" for _, payload, _ in keyed):
+                conn.execute("SELECT pg_advisory_xact_lock(%s)", (_SEQ_LOCK,))
+            rows = []
+            for item_id, payload, key in keyed:
+                status = payload.get("status", "pending")
+                dup_of = payload.get("dup_of")
+                if dedup and status == "pending":
+                    leader = leaders.setdefault(key, item_id)
+                    dup_of = leader if leader != item_id else None
+                if dup_of is None:
+                    content = (
+                        payload.get("text"),
+                        payload.get("clean_text"),
+                        Jsonb(payload.get("flags", [])),
+                        Jsonb(payload.get("changes", [])),
+                    )
+                else:
+                    content = (None, None, None, None)
+                rows.append(
+                    (item_id, status, *content, payload.get("correction"), now, now, key, dup_of, status != "pending")
+                )
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO review_queue
+                    (id, status, text, clean_text, flags, changes, correction, created_at, updated_at, group_key, dup_of, seq)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CASE WHEN %s THEN nextval('review_seq') END)
+                    ON CONFLICT (id) DO UPDATE SET
+                        status = EXCLUDED.status, text = EXCLUDED.text, clean_text = EXCLUDED.clean_text,
+                        flags = EXCLUDED.flags, changes = EXCLUDED.changes, correction = EXCLUDED.correction,
+                        updated_at = EXCLUDED.updated_at, group_key = EXCLUDED.group_key, dup_of = EXCLUDED.dup_of,
+                        seq = EXCLUDED.seq, claimed_by = NULL, claim_expires = NULL
+                    """,
+                    rows,
+                )
+
+    def decide_group(
+        self, leader_id: str, status: str, correction: Optional[str] = None, reviewer: Optional[str] = None
+    ) -> Optional[List[Optional[float]]]:
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute("SELECT pg_advisory_xact_lock(%s)", (_SEQ_LOCK,))
+            # A concurrent decision or claim on the leader blocks on its row
+            # lock; once it commits, the condition is checked again.
+            leader = conn.execute(
+                """
+                UPDATE review_queue SET status = %s, correction = COALESCE(%s, correction), updated_at = %s,
+                    seq = nextval('review_seq'), claimed_by = NULL, claim_expires = NULL
+                WHERE id = %s AND status = 'pending' AND dup_of IS NULL
+                  AND (claim_expires IS NULL OR claim_expires < %s OR claimed_by = %s)
+                RETURNING created_at
+                """,
+                (status, correction, now, leader_id, now, reviewer),
+            ).fetchone()
+            if leader is None:
+                return None
+            members = conn.execute(
+                """
+                UPDATE review_queue SET status = %s, correction = COALESCE(%s, correction), updated_at = %s
+                WHERE dup_of = %s AND status = 'pending'
+                RETURNING created_at
+                """,
+                (status, correction, now, leader_id),
+            ).fetchall()
+        return [leader["created_at"]] + [r["created_at"] for r in members]
+
+    def get_review(self, item_id: str) -> Optional[Dict]:
+        with self.pool.connection() as conn:
+            return conn.execute(f"{_MERGED_SELECT} WHERE q.id = %s", (item_id,)).fetchone()
+
+    def get_pending_reviews(self) -> List[Dict]:
+        with self.pool.connection() as conn:
+            return conn.execute(f"{_MERGED_SELECT} WHERE q.status = 'pending'").fetchall()
+
+    def get_pending_page(
+        self,
+        limit: int = 50,
+        after: Optional[int] = None,
+        flag_type: Optional[str] = None,
+        summary: bool = True,
+        change_source: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if summary:
+            columns = (
+                "pos AS cursor, id, status, left(text, %s) AS preview, length(text) AS text_length, flags, "
+                "jsonb_array_length(changes) AS change_count"
+            )
+            params: List[Any] = [PREVIEW_CHARS]
+        else:
+            columns = "pos AS cursor, id, status, text, clean_text, flags, changes, correction, created_at, updated_at"
+            params = []
+        columns += ", 1 + (SELECT COUNT(*) FROM review_queue m WHERE m.dup_of = q.id AND m.status = q.status) AS group_size"
+        where = ["status = 'pending'", "dup_of IS NULL"]
+        if after is not None:
+            where.append("pos > %s")
+            params.append(after)
+        if flag_type:
+            where.append("flags @> %s")
+            params.append(Jsonb([{"type": flag_type}]))
+        if change_source:
+            where.append("changes @> %s")
+            params.append(Jsonb([{"source": change_source}]))
+        params.append(limit + 1)
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM review_queue q WHERE {' AND '.join(where)} ORDER BY pos LIMIT %s",
+                params,
+            ).fetchall()
+        items = rows[:limit]
+        next_cursor = items[-1]["cursor"] if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def claim_pending(self, reviewer: str, limit: int = 10, lease_s: float = 300.0) -> List[Dict]:
+        now = time.time()
+        with self.pool.connection() as conn:
+            ids = [
+                r["id"]
+                for r in conn.execute(
+                    """
+                    UPDATE review_queue SET claimed_by = %s, claim_expires = %s
+                    WHERE id IN (
+                        SELECT id FROM review_queue
+                        WHERE status = 'pending' AND dup_of IS NULL
+                          AND (claim_expires IS NULL OR claim_expires < %s OR claimed_by = %s)
+                        ORDER BY pos LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, pos
+                    """,
+                    (reviewer, now + lease_s, now, reviewer, limit),
+                ).fetchall()
+            ]
+            if not ids:
+                return []
+            return conn.execute(
+                f"{_MERGED_SELECT} WHERE q.id = ANY(%s) ORDER BY q.pos", (ids,)
+            ).fetchall()
+
+    def claim_items(self, reviewer: str, ids: Sequence[str], lease_s: float = 300.0) -> List[str]:
+        if not ids:
+            return []
+        now = time.time()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                UPDATE review_queue SET claimed_by = %s, claim_expires = %s
+                WHERE id = ANY(%s) AND status = 'pending' AND dup_of IS NULL
+                  AND (claim_expires IS NULL OR claim_expires < %s OR claimed_by = %s)
+                RETURNING id
+                """,
+                (reviewer, now + lease_s, list(ids), now, reviewer),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def heartbeat_claims(
+        self, reviewer: str, ids: Optional[Sequence[str]] = None, lease_s: float = 300.0
+    ) -> List[str]:
+        if ids is not None and not ids:
+            return []
+        now = time.time()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                UPDATE review_queue SET claim_expires = %s
+                WHERE claimed_by = %s AND claim_expires >= %s AND status = 'pending'
+                  AND (%s::text[] IS NULL OR id = ANY(%s::text[]))
+                RETURNING id
+                """,
+                (now + lease_s, reviewer, now, ids and list(ids), ids and list(ids)),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def release_claims(self, reviewer: str, ids: Optional[Sequence[str]] = None) -> int:
+        if ids is not None and not ids:
+            return 0
+        with self.pool.connection() as conn:
+            cur = conn.execute(
+                """
+                UPDATE review_queue SET claimed_by = NULL, claim_expires = NULL
+                WHERE claimed_by = %s AND (%s::text[] IS NULL OR id = ANY(%s::text[]))
+                """,
+                (reviewer, ids and list(ids), ids and list(ids)),
+            )
+            return cur.rowcount
+
+    def get_review_history(self, limit: int = 1000) -> List[Dict]:
+        with self.pool.connection() as conn:
+            return conn.execute(
+                """
+                SELECT id, status, text, correction, updated_at AS decided_at FROM review_queue
+                WHERE status IN ('approved', 'rejected') AND correction IS NOT NULL AND dup_of IS NULL
+                ORDER BY updated_at DESC LIMIT %s
+                """,
+                (limit,),
+            ).fetchall()
+
+    def get_reviews_since(self, after: int, limit: int = 1000) -> List[Dict]:
+        with self.pool.connection() as conn:
+            return conn.execute(
+                """
+                SELECT seq, id, status, text, correction FROM review_queue
+                WHERE seq > %s AND status IN ('approved', 'rejected') AND correction IS NOT NULL
+                  AND dup_of IS NULL
+                ORDER BY seq LIMIT %s
+                """,
+                (after, limit),
+            ).fetchall()
+
+    def get_learner_watermark(self) -> int:
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT value FROM learner_state WHERE key = 'watermark'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def record_rule_patterns(self, counts: RuleCounts, watermark: int) -> RuleCounts:
+        totals: RuleCounts = {}
+        with self.pool.connection() as conn:
+            for (pattern, fix, rtype), n in counts.items():
+                row = conn.execute(
+                    """
+                    INSERT INTO rule_patterns (pattern, fix, type, count) VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (pattern, fix, type) DO UPDATE SET count = rule_patterns.count + EXCLUDED.count
+                    RETURNING count
+                    """,
+                    (pattern, fix, rtype, n),
+                ).fetchone()
+                totals[(pattern, fix, rtype)] = row["count"]
+            conn.execute(
+                """
+                INSERT INTO learner_state (key, value) VALUES ('watermark', %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+                """,
+                (watermark,),
+            )
+        return totals
+
+    def get_rule_patterns(self, min_count: int = 1) -> List[Dict]:
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT pattern, fix, type, count FROM rule_patterns WHERE count >= %s ORDER BY count DESC",
+                (min_count,),
+            ).fetchall()
+
+    def get_queue_stats(self) -> Dict[str, int]:
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT status, n FROM review_counters WHERE n > 0").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def get_archive_stats(self) -> Dict[str, int]:
+        return {}
+
+    def get_length_stats(self) -> Dict[str, float]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT SUM(len_n)::bigint AS n, SUM(text_len)::bigint AS text_len, SUM(clean_len)::bigint AS clean_len "
+                "FROM review_counters"
+            ).fetchone()
+        if not row or not row["n"]:
+            return {"count": 0, "avg_input": 0.0, "avg_clean": 0.0, "avg_delta": 0.0}
+        avg_input, avg_clean = float(row["text_len"]) / row["n"], float(row["clean_len"]) / row["n"]
+        return {"count": int(row["n"]), "avg_input": avg_input, "avg_clean": avg_clean, "avg_delta": avg_clean - avg_input}
+
+    def get_review_series(self, since: float, status: Optional[str] = None) -> List[Dict]:
+        start = int(since // SERIES_BUCKET_S) * SERIES_BUCKET_S
+        with self.pool.connection() as conn:
+            return conn.execute(
+                """
+                SELECT bucket, status, n FROM review_series
+                WHERE bucket >= %s AND (%s::text IS NULL OR status = %s)
+                ORDER BY bucket, status
+                """,
+                (start, status, status),
+            ).fetchall()
+
+    def get_flag_distribution(self, status: Optional[str] = "pending") -> Dict[str, int]:
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT type, COUNT(*) AS n FROM review_flags WHERE %s::text IS NULL OR status = %s
+                GROUP BY type ORDER BY n DESC, type
+                """,
+                (status, status),
+            ).fetchall()
+        return {r["type"]: r["n"] for r in rows}
+
+    def get_change_distribution(self, status: Optional[str] = "pending") -> List[Dict]:
+        with self.pool.connection() as conn:
+            return conn.execute(
+                """
+                SELECT source, type, COUNT(*) AS items, SUM(n)::bigint AS changes FROM review_changes
+                WHERE %s::text IS NULL OR status = %s
+                GROUP BY source, type ORDER BY items DESC, source, type
+                """,
+                (status, status),
+            ).fetchall()
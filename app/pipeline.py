@@ -1,11 +1,16 @@
-from typing import List, Dict, Optional
+import asyncio
+import time
+from bisect import bisect_right
+from typing import Callable, List, Dict, Optional, Sequence, Tuple
 import difflib
 import json
 import re
 import os
 
+import numpy as np
+
 from .lang_utils import mask_terms, lang_spans
-from .slm_llamacpp import slm_cleanup as _slm_cleanup
+from .slm_llamacpp import build_draft_model, slm_cleanup as _slm_cleanup
 
 from .guardrails import (
     validate_json_schema,
@@ -14,10 +19,23 @@ from .guardrails import (
     extract_json,
 )
 from .entity_lock import extract_entities, enforce_entity_lock
-from .logging_utils import get_logger
-from .learner import Learner
-
-from .config import MODEL_PATH, N_THREADS, CTX, TEMP, MAX_TOKENS
+from .logging_utils import get_logger, log_record_event
+from .profiling import profile_record
+from .learner import get_learner
+from .metrics import ROUTE_MODEL_SECONDS, ROUTE_OUTCOMES, ROUTE_REQUESTS, ROUTE_SIMILARITY
+from .routing import Route, choose_route, text_features
+
+from .config import (
+    MODEL_PATH,
+    N_THREADS,
+    CTX,
+    TEMP,
+    MAX_TOKENS,
+    FAKE_LLM,
+    USE_MMAP,
+    USE_MLOCK,
+)
+from .fake_llama import FakeLlama
 
 try:  # optional dependency
     from llama_cpp import Llama  # type: ignore
@@ -28,14 +46,25 @@ _LLAMA = None
 
 
 def _load_llama():
-    """Lazily load llama-cpp model using environment configuration."""
+    """Lazily load llama-cpp model using environment configuration.
+
+    With ``FAKE_LLM`` set, a :class:`FakeLlama` with the configured latency
+    model is used instead of a GGUF file.  Weights are memory-mapped by
+    default (``USE_MMAP``), so every process loading the same file shares
+    one copy in the page cache.
+    """
     global _LLAMA
+    if _LLAMA is None and FAKE_LLM:
+        _LLAMA = FakeLlama()
     if _LLAMA is None and Llama is not None and MODEL_PATH:
         try:  # pragma: no cover - exercised only when llama_cpp is installed
             _LLAMA = Llama(
                 model_path=MODEL_PATH,
                 n_threads=N_THREADS,
                 n_ctx=CTX,
+                use_mmap=USE_MMAP,
+                use_mlock=USE_MLOCK,
+                draft_model=build_draft_model(n_ctx=CTX),
             )
         except Exception:
             _LLAMA = None
@@ -72,6 +101,11 @@ try:
 except Exception:
     fuzz = None
 
+try:  # rapidfuzz >= 3.6
+    from rapidfuzz.process import cpdist
+except Exception:
+    cpdist = None
+
 def en_misspellings(text: str):
     if SP_EN is None:
         return []
@@ -98,6 +132,7 @@ def fi_misspellings_voikko(text: str):
 
 NUMERIC_RE = re.compile(
     r"""
+    (?=[-+]?\d)                            # cheap rejection of non-number positions
     [-+]?
     (?:
         \d{1,3}(?:\.\d{3})+(?:,\d+)? |  # thousand separators with optional decimal comma
@@ -120,15 +155,19 @@ def slm_cleanup(text: str, translate_embedded: bool, **kwargs) -> Dict:
     The wrapper forwards any additional keyword arguments to the underlying
     implementation and ensures that a JSON object with the expected schema is
     always returned.  If the model fails to produce valid JSON, the input text
-    is split into sentence-like parts and processed piece by piece.
+    is split into sentence-like parts and processed piece by piece.  A
+    ``stats`` dict is passed down and records which fallback was used.
     """
 
     llama = kwargs.get("llama", _load_llama())
+    stats = kwargs.get("stats")
     gen = {
         "llama": llama,
         "temp": kwargs.get("temp", TEMP),
         "max_tokens": kwargs.get("max_tokens", MAX_TOKENS),
     }
+    if stats is not None:
+        gen["stats"] = stats
 
     def _call(t: str) -> Dict:
         try:
@@ -143,6 +182,8 @@ def slm_cleanup(text: str, translate_embedded: bool, **kwargs) -> Dict:
     try:
         return _call(text)
     except Exception:
+        if stats is not None:
+            stats["fallback_used"] = "sentence_split"
         parts = [m.group(0) for m in re.finditer(r"[^.!?]+[.!?]?\s*", text)]
         clean_parts: List[str] = []
         flags: List = []
@@ -154,6 +195,8 @@ def slm_cleanup(text: str, translate_embedded: bool, **kwargs) -> Dict:
             except Exception:
                 # If even individual parts cannot be parsed, fall back to
                 # returning the original input verbatim.
+                if stats is not None:
+                    stats["fallback_used"] = "verbatim"
                 return {"clean_text": text, "flags": [], "changes": []}
             ct = res.get("clean_text", "")
             clean_parts.append(ct)
@@ -211,17 +254,60 @@ def _similarity(a: str, b: str) -> float:
     return 1.0
 
 
-def run_pipeline(
-    text: str,
-    translate_embedded: bool = False,
-    protected_terms: Optional[List[str]] = None,
-    record_id: Optional[str] = None,
-    correlation_id: Optional[str] = None,
-) -> Dict:
-    log, cid = get_logger(correlation_id or record_id)
-    log = log.bind(record_id=record_id or cid)
-    log.info("pipeline_start", event="pipeline_start", input_length=len(text))
+def batch_similarity(pairs: Sequence[Tuple[str, str]]) -> List[float]:
+    """``_similarity`` for many pairs in one ``rapidfuzz.process.cpdist`` call."""
+    if not pairs:
+        return []
+    if fuzz is None:
+        return [1.0] * len(pairs)
+    if cpdist is None:
+        return [_similarity(a, b) for a, b in pairs]
+    # float64: the float32 default would not match fuzz.ratio exactly.
+    scores = cpdist([a for a, _ in pairs], [b for _, b in pairs], scorer=fuzz.ratio, dtype=np.float64)
+    return (scores / 100.0).tolist()
+
+
+# Joins texts for bulk number extraction; not a digit, sign, dash or space,
+# so no match can run across two texts.
+_BATCH_SEP = "\x00"
+
+
+def batch_extract_numbers(texts: Sequence[str]) -> List[List[str]]:
+    """``_extract_numbers`` for many texts with a single regex scan."""
+    if any(_BATCH_SEP in t for t in texts):
+        return [_extract_numbers(t) for t in texts]
+    out: List[List[str]] = [[] for _ in texts]
+    starts = []
+    pos = 0
+    for t in texts:
+        starts.append(pos)
+        pos += len(t) + len(_BATCH_SEP)
+    for m in NUMERIC_RE.finditer(_BATCH_SEP.join(texts)):
+        out[bisect_right(starts, m.start()) - 1].append(m.group(0))
+    return out
+
 
+def batch_post_checks(pairs: Sequence[Tuple[str, str]]) -> List[Dict]:
+    """Score a batch of ``(masked, clean)`` pairs.
+
+    Returns one ``{"risk_score", "numeric_change"}`` dict per pair, equal to
+    what ``run_pipeline`` computes per record, but with the similarity and
+    number extraction done in bulk.  Unchanged pairs are answered without
+    scoring them.
+    """
+    out = [{"risk_score": 1.0, "numeric_change": False} for _ in pairs]
+    changed = [i for i, (a, b) in enumerate(pairs) if a != b]
+    if not changed:
+        return out
+    scores = batch_similarity([pairs[i] for i in changed])
+    numbers = batch_extract_numbers([t for i in changed for t in pairs[i]])
+    for k, i in enumerate(changed):
+        out[i] = {"risk_score": scores[k], "numeric_change": numbers[2 * k] != numbers[2 * k + 1]}
+    return out
+
+
+def _analyze(text: str, protected_terms: Optional[List[str]]) -> Dict:
+    """Mask terms, lock entities and run language detection and spelling."""
     locks = extract_entities(text)
     masked = mask_terms(text, protected_terms or [])
 
@@ -253,23 +339,54 @@ def run_pipeline(
                     "after": (m["suggest"][0] if m["suggest"] else m["word"])
                 })
 
-    llama = _load_llama()
-    # The stubbed slm_cleanup ignores the llama and generation parameters,
-    # but the real implementation will use them.
+    return {
+        'locks': locks,
+        'masked': masked,
+        'features': text_features(masked, spans),
+        'flags': flags,
+        'mixed_languages': mixed_languages,
+        'spell_changes': spell_changes,
+    }
+
 
-    try:
-        result = slm_cleanup(
-            masked,
-            translate_embedded,
-            llama=llama,
-            temp=TEMP,
-            max_tokens=MAX_TOKENS,
-        )
-    except TypeError:
-        # Allow monkeypatched or legacy implementations that don't accept kwargs
-        result = slm_cleanup(masked, translate_embedded)
+def _call_model(masked: str, translate_embedded: bool, route: Route, stats: Optional[Dict] = None) -> Dict:
+    """The model stage on *route*'s model: ``slm_cleanup`` plus schema validation.
+
+    *stats*, if given, receives token usage and the fallback used.
+    """
+    start = time.perf_counter()
+    # A model instance serves one call at a time (see ``Route.model``).
+    with route.model() as llama:
+        # The stubbed slm_cleanup ignores the llama and generation parameters,
+        # but the real implementation will use them.
+        try:
+            result = slm_cleanup(
+                masked,
+                translate_embedded,
+                llama=llama,
+                temp=TEMP,
+                max_tokens=MAX_TOKENS,
+                **({'stats': stats} if stats is not None else {}),
+            )
+        except TypeError:
+            # Allow monkeypatched or legacy implementations that don't accept kwargs
+            result = slm_cleanup(masked, translate_embedded)
+    ROUTE_MODEL_SECONDS.labels(route.name).observe(time.perf_counter() - start)
     validate_json_schema(result)
+    return result
+
+
+def _route(analysis: Dict) -> Route:
+    route = choose_route(analysis['features'])
+    ROUTE_REQUESTS.labels(route.name).inc()
+    return route
 
+
+def _reconcile(analysis: Dict, result: Dict, log, record_id: Optional[str]) -> Dict:
+    """Apply the guardrails to the model *result* and diff it against the input."""
+    masked = analysis['masked']
+    locks = analysis['locks']
+    flags = analysis['flags']
     try:
         forbid_changes_in_terms(masked, result['clean_text'])
     except ValueError:
@@ -278,7 +395,7 @@ def run_pipeline(
 
     enforced_clean, entity_flags = enforce_entity_lock(masked, result['clean_text'], locks)
     if enforced_clean != result['clean_text']:
-        log.warning("entity_lock_enforced", event="entity_lock_enforced", record_id=record_id or cid)
+        log_record_event(log, "entity_lock_enforced", key=record_id, level="WARNING", record_id=record_id)
     result['clean_text'] = enforced_clean
 
     flags.extend(result.get('flags', []))
@@ -295,12 +412,9 @@ def run_pipeline(
             if f.get('type') == 'numeric_change':
                 continue
             normalised.append(f)
-    flags = normalised
-    if _extract_numbers(masked) != _extract_numbers(result.get('clean_text', '')):
-        flags.append({'type': 'numeric_change'})
 
     changes = result.get('changes', [])
-    changes.extend(spell_changes)
+    changes.extend(analysis['spell_changes'])
     if result['clean_text'] != masked:
         matcher = difflib.SequenceMatcher(a=masked, b=result['clean_text'])
         for tag, i1, i2, j1, j2 in matcher.get_opcodes():
@@ -314,7 +428,54 @@ def run_pipeline(
                 'after': result['clean_text'][j1:j2],
             })
 
-    risk_score = _similarity(masked, result['clean_text'])
+    return {
+        'masked': masked,
+        'clean_text': result['clean_text'],
+        'flags': normalised,
+        'changes': changes,
+        'mixed_languages': analysis['mixed_languages'],
+        'route': analysis.get('route', 'default'),
+    }
+
+
+def _prepare(
+    text: str,
+    translate_embedded: bool,
+    protected_terms: Optional[List[str]],
+    log,
+    record_id: Optional[str],
+) -> Dict:
+    """Run everything up to the post-checks: masking, spelling, the model,
+    guardrails and the diff.  Returns the intermediate state for ``_finish``,
+    with per-record resource use under ``stats``.
+    """
+    log_record_event(log, "pipeline_start", key=record_id, input_length=len(text))
+    stats: Dict = {'prompt_tokens': 0, 'completion_tokens': 0, 'fallback_used': None}
+    t0 = time.perf_counter()
+    analysis = _analyze(text, protected_terms)
+    route = _route(analysis)
+    analysis['route'] = route.name
+    t1 = time.perf_counter()
+    result = _call_model(analysis['masked'], translate_embedded, route, stats)
+    t2 = time.perf_counter()
+    stage = _reconcile(analysis, result, log, record_id)
+    stats['stage_ms'] = {
+        'analysis': (t1 - t0) * 1000,
+        'model': (t2 - t1) * 1000,
+        'guardrails': (time.perf_counter() - t2) * 1000,
+    }
+    stage['stats'] = stats
+    return stage
+
+
+def _assess(stage: Dict, check: Dict) -> Dict:
+    """Apply the post-check results to a prepared record."""
+    flags = stage['flags']
+    if check['numeric_change']:
+        flags.append({'type': 'numeric_change'})
+
+    risk_score = check['risk_score']
+    ROUTE_SIMILARITY.labels(stage['route']).observe(risk_score)
     if risk_score < 0.85:
         flags.append({'type': 'high_risk_rewrite', 'score': round(risk_score, 3)})
 
@@ -322,29 +483,175 @@ def run_pipeline(
     if any(f.get('type') in {'high_risk_rewrite', 'numeric_change', 'locked_entity_changed'} for f in flags if isinstance(f, dict)):
         review_status = "pending"
 
-    final = {
-        'clean_text': result['clean_text'],
+    return {
+        'clean_text': stage['clean_text'],
         'flags': flags,
-        'changes': changes,
-        'mixed_languages': mixed_languages,
+        'changes': stage['changes'],
+        'mixed_languages': stage['mixed_languages'],
         'risk_score': float(risk_score),
         'review_status': review_status,
     }
 
-    learner = Learner()
-    harmonized = learner.harmonize(final['clean_text'])
+
+def _finish(
+    final: Dict,
+    masked: str,
+    harmonized: str,
+    harmonized_score: Optional[float],
+    log,
+    record_id: Optional[str],
+    route: str = 'default',
+) -> Dict:
     if harmonized != final['clean_text']:
         final['clean_text'] = harmonized
         final['flags'].append({'type': 'harmonized', 'source': 'learner'})
         # Recompute risk score and escalate review if changed
-        risk_score = _similarity(masked, harmonized)
-        final['risk_score'] = float(risk_score)
+        final['risk_score'] = float(harmonized_score)
         if final['review_status'] == "auto_approved":
             final['review_status'] = "pending"
     out = normalize_flags_and_changes(final, masked)
-    log.info("pipeline_end", event="pipeline_end", record_id=record_id or cid, risk_score=out.get('risk_score'), review_status=out.get('review_status'))
+    ROUTE_OUTCOMES.labels(route, out.get('review_status')).inc()
+    log_record_event(
+        log, "pipeline_end", key=record_id,
+        record_id=record_id, route=route, risk_score=out.get('risk_score'), review_status=out.get('review_status'),
+    )
     return out
 
+
+def run_pipeline(
+    text: str,
+    translate_embedded: bool = False,
+    protected_terms: Optional[List[str]] = None,
+    record_id: Optional[str] = None,
+    correlation_id: Optional[str] = None,
+) -> Dict:
+    log, cid = get_logger(correlation_id or record_id)
+    log = log.bind(record_id=record_id or cid)
+    with profile_record(record_id or cid):
+        stage = _prepare(text, translate_embedded, protected_terms, log, record_id or cid)
+        masked = stage['masked']
+        final = _assess(stage, {
+            'risk_score': _similarity(masked, stage['clean_text']),
+            'numeric_change': _extract_numbers(masked) != _extract_numbers(stage['clean_text']),
+        })
+
+        harmonized = get_learner().harmonize(final['clean_text'])
+        score = _similarity(masked, harmonized) if harmonized != final['clean_text'] else None
+        return _finish(final, masked, harmonized, score, log, record_id or cid, stage['route'])
+
+
+def _profiled(record_id: str, stage: str, fn: Callable, *args):
+    """Run ``fn(*args)`` under ``profile_record``; used for executor hops."""
+    with profile_record(record_id, stage):
+        return fn(*args)
+
+
+async def run_pipeline_async(
+    text: str,
+    translate_embedded: bool = False,
+    protected_terms: Optional[List[str]] = None,
+    record_id: Optional[str] = None,
+    correlation_id: Optional[str] = None,
+) -> Dict:
+    """Async ``run_pipeline`` for the API.
+
+    Nothing CPU-bound runs on the event loop.  Analysis (language detection
+    and spelling) runs on the loop's default executor.  The model stage waits
+    its turn on the worker pool of its route (see ``app.routing``).  The
+    guardrails, diff, post-checks and harmonization then go back to the
+    default executor, so a slow diff cannot hold up other requests.  Each
+    hop is profiled as its own stage.
+    """
+    loop = asyncio.get_running_loop()
+    log, cid = get_logger(correlation_id or record_id)
+    log = log.bind(record_id=record_id or cid)
+    log_record_event(log, "pipeline_start", key=record_id or cid, input_length=len(text))
+
+    analysis = await loop.run_in_executor(None, _profiled, record_id or cid, 'analysis', _analyze, text, protected_terms)
+    route = _route(analysis)
+    analysis['route'] = route.name
+    result = await loop.run_in_executor(
+        route.executor(), _profiled, record_id or cid, 'model', _call_model, analysis['masked'], translate_embedded, route
+    )
+    return await loop.run_in_executor(
+        None, _profiled, record_id or cid, 'post', _complete, analysis, result, log, record_id or cid
+    )
+
+
+def _complete(analysis: Dict, result: Dict, log, record_id: str) -> Dict:
+    """Everything after the model call for one record, as one executor hop."""
+    stage = _reconcile(analysis, result, log, record_id)
+    masked = stage['masked']
+    final = _assess(stage, batch_post_checks([(masked, stage['clean_text'])])[0])
+
+    harmonized = get_learner().harmonize(final['clean_text'])
+    score = _similarity(masked, harmonized) if harmonized != final['clean_text'] else None
+    return _finish(final, masked, harmonized, score, log, record_id, stage['route'])
+
+
+def prepare_record(record: Dict) -> Tuple[str, Dict]:
+    """Run the per-record stages of a batch record; returns ``(record_id, stage)``.
+
+    Module-level so that process pools can pickle it.
+    """
+    record_id = record.get('record_id')
+    log, cid = get_logger(record_id)
+    rid = record_id or cid
+    log = log.bind(record_id=rid)
+    with profile_record(rid):
+        return rid, _prepare(
+            str(record['text']),
+            bool(record.get('translate_embedded', False)),
+            record.get('protected_terms'),
+            log,
+            rid,
+        )
+
+
+def run_pipeline_batch(records: Sequence[Dict], map_fn: Callable = map, stats: Optional[List[Dict]] = None) -> List[Dict]:
+    """Run the pipeline over *records* with batched post-checks.
+
+    Each record is a dict with ``text`` and optionally ``translate_embedded``,
+    ``protected_terms`` and ``record_id``.  The per-record stages (model call
+    included) go through *map_fn*, e.g. ``ThreadPoolExecutor.map`` or
+    ``ProcessPoolExecutor.map``; the similarity and numeric-invariance checks
+    and harmonization then run in the calling process, once for the whole
+    batch.  Results equal ``run_pipeline`` on each record.
+
+    If *stats* is a list, one dict per record is appended to it with
+    ``prompt_tokens``, ``completion_tokens``, ``fallback_used``, per-stage
+    times in ``stage_ms`` (batched post-checks split evenly) and their sum
+    as ``row_ms``.
+    """
+    prepared = [(get_logger(rid)[0].bind(record_id=rid), rid, stage) for rid, stage in map_fn(prepare_record, records)]
+    start = time.perf_counter()
+    checks = batch_post_checks([(stage['masked'], stage['clean_text']) for _, _, stage in prepared])
+    post_ms = (time.perf_counter() - start) * 1000 / max(1, len(prepared))
+    finals = [_assess(stage, check) for (_, _, stage), check in zip(prepared, checks)]
+
+    learner = get_learner()
+    harmonized = []
+    harmonize_ms = []
+    for final in finals:
+        start = time.perf_counter()
+        harmonized.append(learner.harmonize(final['clean_text']))
+        harmonize_ms.append((time.perf_counter() - start) * 1000)
+    redo = [i for i, final in enumerate(finals) if harmonized[i] != final['clean_text']]
+    scores: List[Optional[float]] = [None] * len(finals)
+    for i, score in zip(redo, batch_similarity([(prepared[i][2]['masked'], harmonized[i]) for i in redo])):
+        scores[i] = score
+
+    if stats is not None:
+        for i, (_, _, stage) in enumerate(prepared):
+            row = stage['stats']
+            row['stage_ms'].update(post_checks=post_ms, harmonize=harmonize_ms[i])
+            row['row_ms'] = sum(row['stage_ms'].values())
+            stats.append(row)
+    return [
+        _finish(final, stage['masked'], harmonized[i], scores[i], log, rid, stage['route'])
+        for i, ((log, rid, stage), final) in enumerate(zip(prepared, finals))
+    ]
+
 def run_pipeline_like_this():
     example = "Tämä takki on super warm for winter commutes kaupungilla."
     return run_pipeline(example)
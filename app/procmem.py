@@ -0,0 +1,45 @@
+"""Shared vs private memory of a process, from ``/proc/<pid>/smaps_rollup``."""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+}
+
+
+def rss_breakdown(pid: Optional[int] = None) -> Dict[str, int]:
+    """Return RSS split into shared and private pages for *pid* (default: self).
+
+    ``shared_kb`` counts pages also mapped by another process, such as
+    memory-mapped model weights used by several workers; ``pss_kb`` charges
+    each shared page proportionally, so summing it over workers gives their
+    real footprint.  Returns ``{}`` where ``smaps_rollup`` is unavailable
+    (non-Linux, kernels before 4.14, or the process has exited).
+    """
+    path = Path("/proc") / (str(pid) if pid else "self") / "smaps_rollup"
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return {}
+    out: Dict[str, int] = {}
+    for line in lines:
+        key, _, rest = line.partition(":")
+        if key in _FIELDS:
+            out[_FIELDS[key]] = int(rest.split()[0])
+    if not out:
+        return {}
+    out["shared_kb"] = out.get("shared_clean_kb", 0) + out.get("shared_dirty_kb", 0)
+    out["private_kb"] = out.get("private_clean_kb", 0) + out.get("private_dirty_kb", 0)
+    return out
+
+
+def report_pid(pids) -> None:
+    """Process-pool initializer: put the worker's pid on *pids*, a multiprocessing queue."""
+    pids.put(os.getpid())
@@ -0,0 +1,148 @@
+"""Opt-in CPU profiling of pipeline records.
+
+With ``CLEANROOM_PROFILE=cprofile`` or ``sampling``, :func:`profile_record`
+profiles a ``PROFILE_RATE`` share of records and writes one file per record
+into ``PROFILE_DIR``:
+
+- ``<record_id>.<pid>[.<stage>].pstats``: cProfile output, for
+  ``python -m pstats`` or snakeviz.
+- ``<record_id>.<pid>[.<stage>].collapsed``: sampled stacks in the
+  ``frame;frame;frame count`` format read by flamegraph.pl and speedscope.
+
+The decision hashes the record id, so a record is profiled in every stage
+and every process.  When profiling is off, :func:`profile_record` returns a
+shared no-op context.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from . import config
+
+_OFF = nullcontext()
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame) -> str:
+    """Return the stack ending in *frame* as ``outer;...;inner``."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Sample the stacks of other threads from a background thread.
+
+    Samples every *interval_s* seconds, either the threads in *thread_ids*
+    or every thread except the sampler itself.  Counts stay in
+    :attr:`counts`, keyed by collapsed stack.
+    """
+
+    def __init__(self, interval_s: Optional[float] = None, thread_ids: Optional[Iterable[int]] = None):
+        self.interval_s = interval_s if interval_s is not None else config.PROFILE_INTERVAL_MS / 1000.0
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            for tid, frame in sys._current_frames().items():
+                if tid == own or (self.thread_ids is not None and tid not in self.thread_ids):
+                    continue
+                self.counts[collapse(frame)] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+
+def should_profile(record_id: Optional[str], rate: Optional[float] = None) -> bool:
+    rate = config.PROFILE_RATE if rate is None else rate
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    if record_id is None:
+        return random.random() < rate
+    return zlib.crc32(record_id.encode("utf-8")) < rate * 2**32
+
+
+def _output_path(record_id: Optional[str], stage: Optional[str], suffix: str) -> Path:
+    name = _UNSAFE.sub("_", record_id or "anon")[:80]
+    parts = [name, str(os.getpid())] + ([stage] if stage else [])
+    path = Path(config.PROFILE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path / (".".join(parts) + suffix)
+
+
+@contextmanager
+def _profiled(record_id: Optional[str], stage: Optional[str], mode: str) -> Iterator[None]:
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active (Python 3.12+ allows only one).
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(str(_output_path(record_id, stage, ".pstats")))
+    else:
+        sampler = StackSampler(thread_ids=[threading.get_ident()]).start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            _output_path(record_id, stage, ".collapsed").write_text(sampler.collapsed(), encoding="utf-8")
+
+
+def profile_record(record_id: Optional[str], stage: Optional[str] = None, mode: Optional[str] = None):
+    """Context manager profiling the current thread for a sampled record.
+
+    *stage* tags the file when one record's work is split across threads
+    (as in the async API).  *mode* defaults to ``CLEANROOM_PROFILE``.
+    """
+    mode = mode or config.CLEANROOM_PROFILE
+    if mode == "off" or not should_profile(record_id):
+        return _OFF
+    return _profiled(record_id, stage, mode)
+
+
+def capture(seconds: float, interval_s: Optional[float] = None) -> str:
+    """Sample every thread of the process for *seconds*; return collapsed stacks."""
+    sampler = StackSampler(interval_s=interval_s).start()
+    try:
+        threading.Event().wait(seconds)
+    finally:
+        sampler.stop()
+    return sampler.collapsed()
@@ -1,21 +1,240 @@
-from typing import Any, Dict, Optional
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
 
-from .db import upsert_review, get_review, get_pending_reviews
+from .config import REVIEW_BATCH_SIZE, REVIEW_DURABILITY, REVIEW_FLUSH_MS, REVIEW_LEASE_S
+from .logging_utils import get_logger
+from .metrics import REVIEW_CLAIMS, REVIEW_CONFLICTS, REVIEW_DECISION_SECONDS
+from .review_store import get_store
 
 
-def enqueue(item_id: str, payload: Dict[str, Any]) -> None:
+# Module-level entry points over the configured store (``REVIEW_STORE_URL``).
+def upsert_reviews(items: List[Tuple[str, Dict[str, Any]]]) -> None:
+    get_store().upsert_reviews(items)
+
+
+def get_review(item_id: str) -> Optional[Dict[str, Any]]:
+    return get_store().get_review(item_id)
+
+
+def get_pending_reviews() -> List[Dict[str, Any]]:
+    return get_store().get_pending_reviews()
+
+
+def get_pending_page(**kwargs) -> Dict[str, Any]:
+    return get_store().get_pending_page(**kwargs)
+
+
+def _pending(item_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     payload["id"] = item_id
     payload["status"] = "pending"
-    upsert_review(item_id, payload)
+    return payload
 
 
-def update(item_id: str, approved: bool, correction: Optional[str] = None) -> Dict[str, Any]:
+def enqueue(item_id: str, payload: Dict[str, Any]) -> None:
+    get_store().upsert_review(item_id, _pending(item_id, payload))
+
+
+class ReviewConflict(RuntimeError):
+    """A decision on an item that another reviewer holds or that is no longer pending."""
+
+
+def update(
+    item_id: str, approved: bool, correction: Optional[str] = None, reviewer: Optional[str] = None
+) -> Dict[str, Any]:
+    """Decide *item_id* and every pending item of its group.
+
+    A decision on a group member is a decision on its leader.  The leader
+    must be pending and free of other reviewers' live claims; *reviewer*
+    may decide what it holds itself.  The check and the writes are one
+    transaction, so of two racing decisions only one applies, and the
+    other raises :class:`ReviewConflict` with nothing written.  The result
+    carries ``applied``, the number of items the decision resolved.
+    """
     existing = get_review(item_id) or {"id": item_id}
-    existing["status"] = "approved" if approved else "rejected"
-    if correction:
-        existing["correction"] = correction
-    upsert_review(item_id, existing)
-    return existing
+    leader_id = existing.get("dup_of") or item_id
+    status = "approved" if approved else "rejected"
+    times = get_store().decide_group(leader_id, status, correction or None, reviewer)
+    if times is None:
+        REVIEW_CONFLICTS.inc()
+        raise ReviewConflict(f"review {leader_id} is missing, decided or claimed by another reviewer")
+    now = time.time()
+    for created_at in times:
+        if created_at is not None:
+            REVIEW_DECISION_SECONDS.labels(status).observe(max(0.0, now - created_at))
+    decided = get_review(leader_id) or existing
+    decided["applied"] = len(times)
+    return decided
+
+
+def claim(reviewer: str, limit: int = 10, lease_s: float = REVIEW_LEASE_S) -> List[Dict[str, Any]]:
+    """Claim the next *limit* pending groups for *reviewer* for *lease_s* seconds.
+
+    Concurrent reviewers receive disjoint items.  Items the reviewer already
+    holds are renewed and count towards *limit*, so repeating a claim is safe.
+    """
+    items = get_store().claim_pending(reviewer, limit=limit, lease_s=lease_s)
+    REVIEW_CLAIMS.inc(len(items))
+    return items
+
+
+def heartbeat(reviewer: str, ids: Optional[List[str]] = None, lease_s: float = REVIEW_LEASE_S) -> List[str]:
+    """Extend *reviewer*'s live claims (all, or *ids*); returns the ids still held."""
+    return get_store().heartbeat_claims(reviewer, ids, lease_s=lease_s)
+
+
+def release(reviewer: str, ids: Optional[List[str]] = None) -> int:
+    """Hand *reviewer*'s claimed items (all, or *ids*) back to the queue."""
+    return get_store().release_claims(reviewer, ids)
+
+
+# Queue entries are (item_id, payload, future); these ids mark control entries.
+_FLUSH = object()
+_STOP = object()
+
+
+class ReviewWriter:
+    """Write-behind queue for pending reviews, drained by one writer thread.
+
+    Each batch is one transaction (``ReviewStore.upsert_reviews``).  *durability*
+    decides what a caller waits for:
+
+    - ``sync``: ``enqueue`` returns once the item is committed.  Concurrent
+      callers still share commits, since the writer takes everything queued.
+    - ``batched``: ``enqueue`` returns at once; the writer lingers up to
+      *flush_ms* to fill a batch of *batch_size*, so a crash can lose up to
+      *flush_ms* worth of reviews.
+    - ``async``: ``enqueue`` returns at once and the writer commits whatever
+      is queued as soon as it is free; a crash loses at most the items not
+      yet committed.
+
+    Synchronous callers use :meth:`enqueue` and the API awaits
+    :meth:`enqueue_async`.  Both feed the same thread, so each process has
+    one writer whatever the caller.  :meth:`close` (also registered with
+    ``atexit``) flushes the queue.
+    """
+
+    def __init__(
+        self,
+        durability: str = REVIEW_DURABILITY,
+        batch_size: int = REVIEW_BATCH_SIZE,
+        flush_ms: float = REVIEW_FLUSH_MS,
+    ):
+        if durability not in {"sync", "batched", "async"}:
+            raise ValueError(f"unknown durability mode {durability!r}")
+        self.durability = durability
+        self.batch_size = max(1, batch_size)
+        self.flush_s = flush_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[Any, Any, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def submit(self, item_id: str, payload: Dict[str, Any]) -> Future:
+        """Queue one pending review; the future resolves when it is committed."""
+        done: Future = Future()
+        self._ensure_started()
+        self._queue.put((item_id, _pending(item_id, payload), done))
+        return done
+
+    def enqueue(self, item_id: str, payload: Dict[str, Any]) -> None:
+        done = self.submit(item_id, payload)
+        if self.durability == "sync":
+            done.result()
+
+    async def enqueue_async(self, item_id: str, payload: Dict[str, Any]) -> None:
+        done = self.submit(item_id, payload)
+        if self.durability == "sync":
+            await asyncio.wrap_future(done)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until everything queued so far is committed."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done: Future = Future()
+        self._queue.put((_FLUSH, None, done))
+        done.result(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush the queue and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        atexit.unregister(self.close)
+        done: Future = Future()
+        self._queue.put((_STOP, None, done))
+        done.result(timeout)
+        thread.join(timeout)
+
+    def _collect(self) -> List[Tuple[Any, Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_s if self.durability == "batched" else None
+        while len(batch) < self.batch_size and batch[-1][0] not in (_FLUSH, _STOP):
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        log, _ = get_logger()
+        while True:
+            batch = self._collect()
+            # A waiter that gave up (e.g. a cancelled request awaiting
+            # ``enqueue_async``) cancels its future; drop those entries.  Once
+            # running, a future can no longer be cancelled, so resolving the
+            # rest below cannot fail.
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel() or entry[0] is _STOP]
+            items = [(item_id, payload) for item_id, payload, _ in batch if item_id not in (_FLUSH, _STOP)]
+            error: Optional[BaseException] = None
+            if items:
+                try:
+                    upsert_reviews(items)
+                except Exception as exc:
+                    error = exc
+                    if self.durability != "sync":
+                        # Nobody waits on these futures; make the loss visible.
+                        log.error(
+                            "review_write_failed",
+                            event="review_write_failed",
+                            error=str(exc),
+                            ids=[item_id for item_id, _ in items],
+                        )
+            for item_id, _, done in batch:
+                if done.done():
+                    continue
+                if item_id in (_FLUSH, _STOP) or error is None:
+                    done.set_result(None)
+                else:
+                    done.set_exception(error)
+            if batch and batch[-1][0] is _STOP:
+                return
 
 
-__all__ = ["enqueue", "update", "get_review", "get_pending_reviews"]
+__all__ = [
+    "enqueue",
+    "update",
+    "claim",
+    "heartbeat",
+    "release",
+    "ReviewConflict",
+    "get_review",
+    "get_pending_reviews",
+    "get_pending_page",
+    "ReviewWriter",
+]
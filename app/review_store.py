@@ -0,0 +1,245 @@
+"""Storage backends of the review queue.
+
+:class:`ReviewStore` is the interface behind the review queue, the
+dashboard statistics and the learner.  :func:`get_store` picks the backend
+from ``REVIEW_STORE_URL``:
+
+- empty or ``sqlite:///<path>``: :class:`SQLiteReviewStore`, the local file
+  of ``app.db`` (one queue per process or container).
+- ``postgresql://...``: ``app.pg_store.PostgresReviewStore``, one queue
+  shared by any number of API replicas.
+
+Items are plain dicts with the keys of ``app.db.get_review``; ``flags`` and
+``changes`` are decoded lists.
+"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import config, db
+
+RuleCounts = Dict[Tuple[str, str, str], int]
+
+
+class ReviewStore(ABC):
+    """Review queue storage; see ``app.db`` for the semantics of each method."""
+
+    # Identifies the underlying database, e.g. for cache keys.
+    key: str = ""
+
+    @abstractmethod
+    def upsert_reviews(self, items: Sequence[Tuple[str, Dict[str, Any]]], dedup: Optional[bool] = None) -> None:
+        """Write several items in one transaction, grouping identical pending ones."""
+
+    def upsert_review(self, item_id: str, payload: Dict[str, Any]) -> None:
+        self.upsert_reviews([(item_id, payload)])
+
+    @abstractmethod
+    def decide_group(
+        self, leader_id: str, status: str, correction: Optional[str] = None, reviewer: Optional[str] = None
+    ) -> Optional[List[Optional[float]]]:
+        """Decide a pending, unclaimed (or *reviewer*'s) leader and its members atomically.
+
+        Returns their enqueue times, leader first, or None if nothing was decided.
+        """
+
+    @abstractmethod
+    def get_review(self, item_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def get_pending_reviews(self) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_pending_page(
+        self,
+        limit: int = 50,
+        after: Optional[int] = None,
+        flag_type: Optional[str] = None,
+        summary: bool = True,
+        change_source: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        ...
+
+    # Reviewer claims (leases); see ``app.db.claim_pending`` and neighbours.
+    @abstractmethod
+    def claim_pending(self, reviewer: str, limit: int = 10, lease_s: float = 300.0) -> List[Dict]:
+        """Claim up to *limit* pending groups; concurrent callers get disjoint items."""
+
+    @abstractmethod
+    def claim_items(self, reviewer: str, ids: Sequence[str], lease_s: float = 300.0) -> List[str]:
+        """Claim the given pending leaders unless another reviewer holds them."""
+
+    @abstractmethod
+    def heartbeat_claims(
+        self, reviewer: str, ids: Optional[Sequence[str]] = None, lease_s: float = 300.0
+    ) -> List[str]:
+        """Extend the reviewer's live claims."""
+
+    @abstractmethod
+    def release_claims(self, reviewer: str, ids: Optional[Sequence[str]] = None) -> int:
+        """Drop the reviewer's claims."""
+
+    @abstractmethod
+    def get_review_history(self, limit: int = 1000) -> List[Dict]:
+        ...
+
+    # Learner state: decided reviews are read above a watermark that only
+    # grows, and pattern counters are stored together with it.
+    @abstractmethod
+    def get_reviews_since(self, after: int, limit: int = 1000) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_learner_watermark(self) -> int:
+        ...
+
+    @abstractmethod
+    def record_rule_patterns(self, counts: RuleCounts, watermark: int) -> RuleCounts:
+        ...
+
+    @abstractmethod
+    def get_rule_patterns(self, min_count: int = 1) -> List[Dict]:
+        ...
+
+    # Statistics.
+    @abstractmethod
+    def get_queue_stats(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def get_archive_stats(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def get_length_stats(self) -> Dict[str, float]:
+        ...
+
+    @abstractmethod
+    def get_review_series(self, since: float, status: Optional[str] = None) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_flag_distribution(self, status: Optional[str] = "pending") -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def get_change_distribution(self, status: Optional[str] = "pending") -> List[Dict]:
+        ...
+
+    def close(self) -> None:
+        """Release connections held by the store."""
+
+
+class SQLiteReviewStore(ReviewStore):
+    """The SQLite queue of ``app.db``.
+
+    The file is *path*, or ``app.db.DB_PATH`` (read at each call) without one.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+
+    @property
+    def key(self) -> str:  # type: ignore[override]
+        return f"sqlite:///{self.path or db.DB_PATH}"
+
+    def upsert_reviews(self, items, dedup=None):
+        db.upsert_reviews(items, dedup=dedup, path=self.path)
+
+    def decide_group(self, leader_id, status, correction=None, reviewer=None):
+        return db.decide_group(leader_id, status, correction, reviewer, path=self.path)
+
+    def get_review(self, item_id):
+        return db.get_review(item_id, path=self.path)
+
+    def get_pending_reviews(self):
+        return db.get_pending_reviews(path=self.path)
+
+    def get_pending_page(self, limit=50, after=None, flag_type=None, summary=True, change_source=None):
+        return db.get_pending_page(
+            limit=limit, after=after, flag_type=flag_type, summary=summary, change_source=change_source, path=self.path
+        )
+
+    def claim_pending(self, reviewer, limit=10, lease_s=300.0):
+        return db.claim_pending(reviewer, limit=limit, lease_s=lease_s, path=self.path)
+
+    def claim_items(self, reviewer, ids, lease_s=300.0):
+        return db.claim_items(reviewer, ids, lease_s=lease_s, path=self.path)
+
+    def heartbeat_claims(self, reviewer, ids=None, lease_s=300.0):
+        return db.heartbeat_claims(reviewer, ids, lease_s=lease_s, path=self.path)
+
+    def release_claims(self, reviewer, ids=None):
+        return db.release_claims(reviewer, ids, path=self.path)
+
+    def get_review_history(self, limit=1000):
+        return db.get_review_history(limit, path=self.path)
+
+    def get_reviews_since(self, after, limit=1000):
+        return db.get_reviews_since(after, limit=limit, path=self.path)
+
+    def get_learner_watermark(self):
+        return db.get_learner_watermark(path=self.path)
+
+    def record_rule_patterns(self, counts, watermark):
+        return db.record_rule_patterns(counts, watermark, path=self.path)
+
+    def get_rule_patterns(self, min_count=1):
+        return db.get_rule_patterns(min_count, path=self.path)
+
+    def get_queue_stats(self):
+        return db.get_queue_stats(path=self.path)
+
+    def get_archive_stats(self):
+        return db.get_archive_stats(path=self.path)
+
+    def get_length_stats(self):
+        return db.get_length_stats(path=self.path)
+
+    def get_review_series(self, since, status=None):
+        return db.get_review_series(since, status=status, path=self.path)
+
+    def get_flag_distribution(self, status="pending"):
+        return db.get_flag_distribution(status, path=self.path)
+
+    def get_change_distribution(self, status="pending"):
+        return db.get_change_distribution(status, path=self.path)
+
+
+def open_store(url: str) -> ReviewStore:
+    """Create the store for *url* (see the module docstring)."""
+    if not url or url.startswith("sqlite:"):
+        path = url.split("sqlite:///", 1)[1] if url.startswith("sqlite:///") else None
+        return SQLiteReviewStore(path)
+    if url.startswith(("postgresql://", "postgres://")):
+        from .pg_store import PostgresReviewStore
+
+        return PostgresReviewStore(url, min_size=config.PG_POOL_MIN, max_size=config.PG_POOL_MAX)
+    raise ValueError(f"unsupported REVIEW_STORE_URL scheme: {url.split(':', 1)[0]!r}")
+
+
+_STORE: Optional[ReviewStore] = None
+_STORE_URL: Optional[str] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> ReviewStore:
+    """Return the process-wide store for ``REVIEW_STORE_URL``, opening it on first use."""
+    global _STORE, _STORE_URL
+    url = config.REVIEW_STORE_URL
+    store = _STORE
+    if store is not None and _STORE_URL == url:
+        return store
+    with _STORE_LOCK:
+        if _STORE is None or _STORE_URL != url:
+            if _STORE is not None:
+                _STORE.close()
+            _STORE = open_store(url)
+            _STORE_URL = url
+        return _STORE
@@ -0,0 +1,203 @@
+"""Route records to one of several GGUF models by measured text features.
+
+Routes come from ``MODEL_ROUTES``: a JSON list (inline, or a path to a JSON
+file) of objects such as::
+
+    [{"name": "small", "model_path": "models/tiny.gguf", "max_chars": 300, "langs": ["fi", "en"]},
+     {"name": "large", "model_path": "models/large.gguf", "concurrency": 1}]
+
+A record takes the first route whose conditions all hold: ``max_chars``
+bounds the masked text length and ``langs`` lists the accepted languages
+(``fi``, ``en``, ``mixed`` for FI text with EN in it, or ``other``).  The
+last route is the fallback whatever its conditions.
+
+A llama.cpp context is not thread-safe, so each call checks out one of the
+route's model instances (see :meth:`Route.model`).  A route loads up to
+``concurrency`` instances; with ``USE_MMAP`` they share the weights and
+each adds only its own context.  In the API a route also has a worker pool
+of ``concurrency`` threads, so a long queue for one model does not hold up
+the others.  Batch ``--workers`` beyond a route's ``concurrency`` wait for a
+free instance; ``--processes`` load their own.  Without ``MODEL_ROUTES``
+there is a single ``default`` route using ``MODEL_PATH``.
+"""
+
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import CTX, FAKE_LLM, MODEL_CONCURRENCY, MODEL_PATH, MODEL_ROUTES, N_THREADS, USE_MLOCK, USE_MMAP
+from .fake_llama import FakeLlama
+from .slm_llamacpp import build_draft_model
+
+try:  # optional dependency
+    from llama_cpp import Llama  # type: ignore
+except Exception:  # pragma: no cover - llama_cpp is optional
+    Llama = None  # type: ignore
+
+
+# Tokens of the minority language (FI or EN) that make a text "mixed".
+MIXED_MIN_TOKENS = 2
+
+# Pool slot of a route's first model instance, resolved by ``Route.llama``.
+_FIRST = object()
+
+
+class Route:
+    def __init__(
+        self,
+        name: str,
+        model_path: Optional[str] = None,
+        max_chars: Optional[int] = None,
+        langs: Optional[List[str]] = None,
+        concurrency: int = 1,
+        n_threads: int = N_THREADS,
+        ctx: int = CTX,
+        loader: Optional[Callable[[], Any]] = None,
+    ):
+        self.name = name
+        self.model_path = model_path
+        self.max_chars = max_chars
+        self.langs = set(langs) if langs else None
+        self.concurrency = max(1, concurrency)
+        self.n_threads = n_threads
+        self.ctx = ctx
+        self._loader = loader
+        self._llama = None
+        self._loaded = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Idle model instances; a loader without a model path yields only one.
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        self._instances = 0
+        self._max_instances = self.concurrency if loader is None or model_path else 1
+
+    def matches(self, features: Dict[str, Any]) -> bool:
+        if self.max_chars is not None and features["length"] > self.max_chars:
+            return False
+        if self.langs is not None and features["lang"] not in self.langs:
+            return False
+        return True
+
+    def _new_llama(self):
+        """A fresh model instance for this route; ``None`` means the stub."""
+        if FAKE_LLM:
+            return FakeLlama()
+        if Llama is not None and self.model_path:
+            try:  # pragma: no cover - exercised only when llama_cpp is installed
+                return Llama(
+                    model_path=self.model_path,
+                    n_threads=self.n_threads,
+                    n_ctx=self.ctx,
+                    use_mmap=USE_MMAP,
+                    use_mlock=USE_MLOCK,
+                    draft_model=build_draft_model(n_ctx=self.ctx),
+                )
+            except Exception:
+                return None
+        return None
+
+    def llama(self):
+        """Load this route's first model instance on first use; ``None`` means the stub."""
+        if self._loader is not None:
+            return self._loader()
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                self._llama = self._new_llama()
+            return self._llama
+
+    @contextmanager
+    def model(self) -> Iterator[Any]:
+        """Hold one of this route's model instances for the duration of a call.
+
+        An idle instance is reused; otherwise another is loaded while fewer
+        than ``concurrency`` exist, and past that the caller waits.  The
+        first instance is whatever :meth:`llama` returns at the time.
+        """
+        index = 0
+        with self._lock:
+            if self._idle.empty() and self._instances < self._max_instances:
+                self._instances += 1
+                index = self._instances
+        if index:
+            # Loaded outside the lock, so other calls can use idle instances.
+            self._idle.put(_FIRST if index == 1 else self._new_llama())
+        slot = self._idle.get()
+        try:
+            yield self.llama() if slot is _FIRST else slot
+        finally:
+            self._idle.put(slot)
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix=f"model-{self.name}"
+                )
+            return self._executor
+
+
+def text_features(masked: str, spans: List[Dict]) -> Dict[str, Any]:
+    """Features routing decides on, from the masked text and its language spans.
+
+    Per-token language ids are noisy (short Finnish words often come back as
+    ``en``), so a text only counts as ``mixed`` once the minority language
+    has ``MIXED_MIN_TOKENS`` tokens.
+    """
+    fi = sum(1 for s in spans if s["lang"] == "fi")
+    en = sum(1 for s in spans if s["lang"] == "en")
+    if min(fi, en) >= MIXED_MIN_TOKENS:
+        lang = "mixed"
+    elif fi or en:
+        lang = "fi" if fi >= en else "en"
+    else:
+        lang = "other"
+    return {"length": len(masked), "lang": lang, "en_share": en / (fi + en) if fi + en else 0.0}
+
+
+def parse_routes(spec: str) -> List[Route]:
+    """Build routes from a JSON list or the path of a JSON file holding one."""
+    text = spec.strip()
+    if not text.startswith("["):
+        text = Path(text).read_text(encoding="utf-8")
+    routes = []
+    for i, item in enumerate(json.loads(text)):
+        item = dict(item)
+        routes.append(Route(name=str(item.pop("name", f"route{i}")), **item))
+    if not routes:
+        raise ValueError("MODEL_ROUTES defines no routes")
+    return routes
+
+
+_ROUTES: Optional[List[Route]] = None
+_ROUTES_LOCK = threading.Lock()
+
+
+def get_routes() -> List[Route]:
+    """Return the configured routes, building them on first use."""
+    global _ROUTES
+    with _ROUTES_LOCK:
+        if _ROUTES is None:
+            if MODEL_ROUTES:
+                _ROUTES = parse_routes(MODEL_ROUTES)
+            else:
+                from .pipeline import _load_llama
+
+                # The first instance is the pipeline's shared one; further
+                # ones (MODEL_CONCURRENCY > 1) are loaded from MODEL_PATH.
+                _ROUTES = [
+                    Route("default", model_path=MODEL_PATH or None, concurrency=MODEL_CONCURRENCY, loader=_load_llama)
+                ]
+        return _ROUTES
+
+
+def choose_route(features: Dict[str, Any], routes: Optional[List[Route]] = None) -> Route:
+    routes = routes if routes is not None else get_routes()
+    for route in routes[:-1]:
+        if route.matches(features):
+            return route
+    return routes[-1]
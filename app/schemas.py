@@ -1,5 +1,5 @@
 from typing import Any, List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CleanRequest(BaseModel):
@@ -27,3 +27,16 @@ class CleanResponse(BaseModel):
 class ReviewRequest(BaseModel):
     approved: bool
     correction: Optional[str] = None
+    reviewer: Optional[str] = None
+
+
+class ClaimRequest(BaseModel):
+    reviewer: str
+    limit: int = Field(10, ge=1, le=500)
+    lease_s: Optional[float] = Field(None, gt=0, le=86400)
+
+
+class ClaimUpdate(BaseModel):
+    reviewer: str
+    ids: Optional[List[str]] = None
+    lease_s: Optional[float] = Field(None, gt=0, le=86400)
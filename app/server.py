@@ -1,13 +1,72 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
 from prometheus_fastapi_instrumentator import Instrumentator
-from .schemas import CleanRequest, CleanResponse, ReviewRequest
-from .pipeline import run_pipeline
-from .review_queue import update as update_review, enqueue as enqueue_review, get_pending_reviews
+from .schemas import ClaimRequest, ClaimUpdate, CleanRequest, CleanResponse, ReviewRequest
+from .pipeline import run_pipeline_async
+from .review_queue import (
+    ReviewConflict,
+    ReviewWriter,
+    claim as claim_reviews,
+    get_pending_page,
+    get_review,
+    heartbeat as heartbeat_reviews,
+    release as release_reviews,
+    update as update_review,
+)
 from .dashboard import router as dashboard_router
+from .learner import get_learner
+from .logging_utils import get_logger
+from .archive import archive_reviews
+from .config import ARCHIVE_INTERVAL_S, DEBUG_PROFILE, LEARN_INTERVAL_S, REVIEW_LEASE_S
+from .profiling import capture
+
+
+async def _learn_periodically(interval: float) -> None:
+    log, _ = get_logger()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            new_rules = await run_in_threadpool(get_learner().learn)
+            log.info("learn_complete", event="learn_complete", new_rules=len(new_rules))
+        except Exception as exc:
+            log.warning("learn_failed", event="learn_failed", error=str(exc))
+
+
+async def _archive_periodically(interval: float) -> None:
+    log, _ = get_logger()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await run_in_threadpool(archive_reviews)
+            log.info("archive_complete", event="archive_complete", **result)
+        except Exception as exc:
+            log.warning("archive_failed", event="archive_failed", error=str(exc))
+
 
-app = FastAPI()
+review_writer = ReviewWriter()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    tasks = []
+    if LEARN_INTERVAL_S > 0:
+        tasks.append(asyncio.create_task(_learn_periodically(LEARN_INTERVAL_S)))
+    if ARCHIVE_INTERVAL_S > 0:
+        tasks.append(asyncio.create_task(_archive_periodically(ARCHIVE_INTERVAL_S)))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Flush write-behind reviews before the process goes away.
+    await run_in_threadpool(review_writer.close)
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,15 +88,14 @@ def healthz():
 
 @app.post('/clean', response_model=CleanResponse)
 async def clean(req: CleanRequest):
-    result = await run_in_threadpool(
-        run_pipeline,
+    result = await run_pipeline_async(
         req.text,
         req.translate_embedded,
         req.terms,
         req.id,
     )
     if result.get("review_status") == "pending":
-        enqueue_review(
+        await review_writer.enqueue_async(
             str(req.id or ""),
             {"text": req.text, "clean_text": result.get("clean_text"), "flags": result.get("flags"), "changes": result.get("changes")},
         )
@@ -46,11 +104,87 @@ async def clean(req: CleanRequest):
 
 @app.post('/review/{item_id}')
 async def review(item_id: str, body: ReviewRequest):
-    """Human-in-the-loop review endpoint."""
-    updated = update_review(item_id, approved=body.approved, correction=body.correction)
+    """Human-in-the-loop review endpoint.
+
+    With ``reviewer``, the decision is refused (409) when another reviewer
+    holds the item or it is decided already.
+    """
+    try:
+        updated = await run_in_threadpool(
+            update_review, item_id, approved=body.approved, correction=body.correction, reviewer=body.reviewer
+        )
+    except ReviewConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     return updated
 
 
+@app.post('/reviews/claim')
+async def claim(body: ClaimRequest):
+    """Claim the next ``limit`` pending items for ``reviewer``; other reviewers get other items."""
+    lease_s = body.lease_s or REVIEW_LEASE_S
+    items = await run_in_threadpool(claim_reviews, body.reviewer, body.limit, lease_s)
+    return {"items": items, "lease_s": lease_s}
+
+
+@app.post('/reviews/heartbeat')
+async def heartbeat(body: ClaimUpdate):
+    """Extend the reviewer's claims; ``held`` lists the items still claimed."""
+    lease_s = body.lease_s or REVIEW_LEASE_S
+    held = await run_in_threadpool(heartbeat_reviews, body.reviewer, body.ids, lease_s)
+    return {"held": held, "lease_s": lease_s}
+
+
+@app.post('/reviews/release')
+async def release(body: ClaimUpdate):
+    """Hand the reviewer's claimed items (all, or ``ids``) back to the queue."""
+    return {"released": await run_in_threadpool(release_reviews, body.reviewer, body.ids)}
+
+
+@app.post('/learn')
+async def learn():
+    """Mine new reviews and update the in-memory rule set."""
+    learner = get_learner()
+    new_rules = await run_in_threadpool(learner.learn)
+    return {"new_rules": new_rules, "total_rules": len(learner.get_rules())}
+
+
 @app.get('/reviews/pending')
-async def pending_reviews():
-    return get_pending_reviews()
+async def pending_reviews(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = None,
+    flag: Optional[str] = None,
+    source: Optional[str] = None,
+    view: str = Query("summary", pattern="^(summary|full)$"),
+):
+    """Return one page of pending reviews; pass ``next_cursor`` back as ``cursor``.
+
+    ``flag`` and ``source`` route a reviewer to items with that flag type or
+    with changes from that source (``slm``, ``spell``, ...).
+    """
+    return await run_in_threadpool(
+        get_pending_page,
+        limit=limit,
+        after=cursor,
+        flag_type=flag,
+        summary=view == "summary",
+        change_source=source,
+    )
+
+
+@app.get('/reviews/{item_id}')
+async def review_detail(item_id: str):
+    item = await run_in_threadpool(get_review, item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="review not found")
+    return item
+
+
+@app.get('/debug/profile', response_class=PlainTextResponse)
+async def debug_profile(seconds: float = Query(5.0, gt=0, le=60)):
+    """Sample all threads for *seconds*; collapsed stacks for flamegraph tools.
+
+    Disabled (404) unless ``DEBUG_PROFILE=1``.
+    """
+    if not DEBUG_PROFILE:
+        raise HTTPException(status_code=404, detail="profiling disabled")
+    return await run_in_threadpool(capture, seconds)
@@ -4,15 +4,129 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from .config import CTX, DRAFT_MODE, DRAFT_MODEL_PATH, DRAFT_TOKENS, N_THREADS, OUTPUT_MODE
 from .guardrails import JSON_END, JSON_START, extract_json
+from .logging_utils import get_logger
+from .metrics import DRAFT_ACCEPTED, DRAFT_PROPOSED, GENERATED_TOKENS, GENERATION_TPS
 
 try:  # optional dependency
     from llama_cpp import Llama  # type: ignore
 except Exception:  # pragma: no cover - llama_cpp is optional
     Llama = None  # type: ignore
 
+try:  # llama-cpp-python >= 0.2.57
+    from llama_cpp.llama_speculative import LlamaPromptLookupDecoding  # type: ignore
+except Exception:  # pragma: no cover - llama_cpp is optional
+    LlamaPromptLookupDecoding = None  # type: ignore
+
+
+class LlamaDraft:
+    """Draft model backed by a small GGUF sharing the main model's vocabulary.
+
+    Implements llama-cpp-python's draft-model protocol: called with the
+    token ids so far, it returns up to ``num_pred_tokens`` greedy
+    continuations.  ``Llama.generate`` reuses the longest cached prefix, so
+    each call only evaluates the tokens added since the previous one.  The
+    draft sees the same prompt as the main model, so *n_ctx* should match
+    the main model's context size.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int = DRAFT_TOKENS, n_threads: int = N_THREADS, n_ctx: int = CTX):
+        self.num_pred_tokens = num_pred_tokens
+        self.llama = Llama(model_path=model_path, n_threads=n_threads, n_ctx=n_ctx, verbose=False)
+
+    def __call__(self, input_ids: np.ndarray, **kwargs: Any) -> np.ndarray:
+        out: List[int] = []
+        for token in self.llama.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            if token == self.llama.token_eos():
+                break
+            out.append(token)
+            if len(out) >= self.num_pred_tokens:
+                break
+        return np.array(out, dtype=np.intc)
+
+
+class CountingDraft:
+    """Wrap a draft model and measure how many of its tokens get accepted.
+
+    llama-cpp-python does not report acceptance, but it calls the draft
+    again with the tokens it kept: the part of the previous proposal that
+    reappears right after the previous input is what was accepted.
+    """
+
+    def __init__(self, draft: Any, mode: str):
+        self.draft = draft
+        self.mode = mode
+        self.proposed = 0
+        self.accepted = 0
+        self._last_input: Optional[np.ndarray] = None
+        self._last_proposal: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+    def _settle(self, input_ids: np.ndarray) -> None:
+        prev, proposal = self._last_input, self._last_proposal
+        if prev is None or proposal is None or len(proposal) == 0:
+            return
+        n = len(prev)
+        if len(input_ids) <= n or not np.array_equal(input_ids[:n], prev):
+            return  # a new generation started; the last proposal is unknown
+        added = input_ids[n : n + len(proposal)]
+        mismatch = np.flatnonzero(added != proposal[: len(added)])
+        accepted = int(mismatch[0]) if len(mismatch) else len(added)
+        self.accepted += accepted
+        DRAFT_ACCEPTED.labels(self.mode).inc(accepted)
+
+    def __call__(self, input_ids: np.ndarray, **kwargs: Any) -> np.ndarray:
+        proposal = self.draft(input_ids, **kwargs)
+        with self._lock:
+            self._settle(input_ids)
+            self._last_input = np.array(input_ids, copy=True)
+            self._last_proposal = np.asarray(proposal)
+            self.proposed += len(proposal)
+        DRAFT_PROPOSED.labels(self.mode).inc(len(proposal))
+        return proposal
+
+
+DRAFT_MODES = ("off", "prompt_lookup", "model")
+
+
+def build_draft_model(
+    mode: str = DRAFT_MODE,
+    model_path: Optional[str] = DRAFT_MODEL_PATH,
+    num_pred_tokens: int = DRAFT_TOKENS,
+    n_ctx: int = CTX,
+):
+    """Return the ``draft_model`` to pass to ``Llama``, or ``None`` for plain decoding.
+
+    ``prompt_lookup`` proposes continuations of n-grams found earlier in the
+    context; since ``clean_text`` is mostly a copy of the ``<USER_INPUT>``
+    block, most proposals are accepted.  ``model`` runs a small draft GGUF
+    with the main model's context size *n_ctx*.  An unknown *mode*, or one
+    this installation cannot provide, logs a warning and decodes plainly.
+    """
+    if mode not in DRAFT_MODES:
+        log, _ = get_logger()
+        log.warning("draft_mode_unknown", event="draft_mode_unknown", mode=mode, expected=list(DRAFT_MODES))
+        return None
+    if mode == "prompt_lookup" and LlamaPromptLookupDecoding is not None:
+        return CountingDraft(LlamaPromptLookupDecoding(num_pred_tokens=num_pred_tokens), mode)
+    if mode == "model" and Llama is not None and model_path:
+        return CountingDraft(LlamaDraft(model_path, num_pred_tokens=num_pred_tokens, n_ctx=n_ctx), mode)
+    if mode != "off":
+        log, _ = get_logger()
+        log.warning("draft_mode_unavailable", event="draft_mode_unavailable", mode=mode)
+    return None
+
 # Generation system prompt and JSON sentinels
 SYSTEM = (
     "Olet kielipuhdistusagentti. Älä muuta merkitystä. "
@@ -37,6 +151,82 @@ number ::= ("-"? ([0-9] | [1-9] [0-9]*)) ("." [0-9]+)? ([eE] [-+]? [0-9]+)?
 """
 
 
+# Edits mode: the model lists span edits instead of rewriting the whole text,
+# so output length follows the number of corrections, not the input length.
+EDITS_SYSTEM = (
+    "Olet kielipuhdistusagentti. Älä muuta merkitystä. "
+    "Älä muuta <TERM>...</TERM>-sisältöä. "
+    "Käsittele vain <USER_INPUT>...</USER_INPUT> -lohkon sisältö ja vastaa AINOASTAAN JSONILLA. "
+    "Älä kirjoita tekstiä uudelleen: luettele vain korjaukset.\n"
+    "Esimerkki 1:\n"
+    "User: \"Tämä on <TERM>ABC-123</TERM>, joka on hyvä.\"\n"
+    "Assistant: {\"edits\": [], \"flags\": []}\n\n"
+    "Esimerkki 2:\n"
+    "User: \"Takki on lämmin,ja kevyt\"\n"
+    "Assistant: {\"edits\": [{\"before\": \"lämmin,ja\", \"after\": \"lämmin ja\", \"type\": \"punctuation\"}], \"flags\": []}\n"
+)
+
+EDITS_GRAMMAR = r"""
+root   ::= "{" space "\"edits\"" space ":" space edits "," space "\"flags\"" space ":" space array "}"
+edits  ::= "[" space ( edit ("," space edit)* )? "]"
+edit   ::= "{" space "\"before\"" space ":" space string "," space "\"after\"" space ":" space string ( "," space "\"type\"" space ":" space string )? "}" space
+array  ::= "[" space ( value ("," space value)* )? "]"
+value  ::= obj | string | number | "true" | "false" | "null"
+obj    ::= "{" space ( string space ":" space value ("," space string space ":" space value)* )? "}" space
+string ::= "\"" ( [^"\\] | "\\" (["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F]) )* "\""
+space  ::= [ \t\n]*
+number ::= ("-"? ([0-9] | [1-9] [0-9]*)) ("." [0-9]+)? ([eE] [-+]? [0-9]+)?
+"""
+
+
+def apply_edits(text: str, edits: Any) -> Tuple[str, List[Dict]]:
+    """Apply model *edits* to *text*; return the new text and its ``changes``.
+
+    Each edit replaces the first occurrence of ``before`` at or after the end
+    of the previous edit, so edits must come in text order.  Spans in the
+    returned changes refer to *text*.  Raises ``ValueError`` when an edit is
+    malformed or its ``before`` cannot be found, which sends the caller down
+    the usual JSON-failure fallbacks.
+    """
+    if not isinstance(edits, list):
+        raise ValueError("edits must be a list")
+    parts: List[str] = []
+    changes: List[Dict] = []
+    cursor = 0
+    for edit in edits:
+        if not isinstance(edit, dict) or not isinstance(edit.get("before"), str) or not isinstance(edit.get("after"), str):
+            raise ValueError("malformed edit")
+        before, after = edit["before"], edit["after"]
+        if before == after:
+            continue
+        if not before:
+            raise ValueError("edit has no anchor text")
+        i = text.find(before, cursor)
+        if i == -1:
+            raise ValueError(f"edit anchor not found: {before!r}")
+        parts.append(text[cursor:i])
+        parts.append(after)
+        changes.append({
+            "span": [i, i + len(before)],
+            "type": edit.get("type") or "grammar",
+            "source": "slm",
+            "before": before,
+            "after": after,
+        })
+        cursor = i + len(before)
+    parts.append(text[cursor:])
+    return "".join(parts), changes
+
+
+def _record_generation(llama: Any, out: Dict, seconds: float) -> None:
+    draft = getattr(llama, "draft_model", None)
+    mode = draft.mode if isinstance(draft, CountingDraft) else "off"
+    tokens = (out.get("usage") or {}).get("completion_tokens") or 0
+    GENERATED_TOKENS.labels(mode).inc(tokens)
+    if tokens and seconds > 0:
+        GENERATION_TPS.labels(mode).observe(tokens / seconds)
+
+
 def _build_user(masked_text: str, translate_embedded: bool) -> str:
     """Return user prompt for the model."""
     return (
@@ -57,54 +247,92 @@ KÄSITELTÄVÄ TEKSTI (käsittele vain tämä lohko):
     )
 
 
+def _build_user_edits(masked_text: str, translate_embedded: bool) -> str:
+    """Return the user prompt for edits mode."""
+    return (
+        f"""Kontekstikieli: FI. Sallitut kielet: FI ja EN.
+Ohjeet:
+- Korjaa kielioppi ja välimerkit.
+- Jos FI-tekstissä on upotettu EN-segmentti, lisää flags: {{ "type":"embedded_en","start":i,"end":j }}.
+- translate_embedded = {"true" if translate_embedded else "false"} → jos true, käännä EN-osiot suomeksi.
+- Älä muuta <TERM>...</TERM> -osuuksia.
+- Älä kirjoita koko tekstiä uudelleen. Palauta jokainen korjaus muodossa {{"before":"...","after":"..."}}:
+  "before" on lyhyt katkelma täsmälleen tekstin mukaisena, korjaukset tekstin järjestyksessä.
+  Jos korjattavaa ei ole, palauta tyhjä edits-lista.
+- Palauta VAIN JSON seuraavan skeeman mukaan, ilman mitään muuta tekstiä:
+{JSON_START}{{"edits":[{{"before":"","after":"","type":"grammar|spelling|punctuation|translation"}}],"flags":[{{"type":"embedded_en","start":0,"end":0}}]}}{JSON_END}
+
+KÄSITELTÄVÄ TEKSTI (käsittele vain tämä lohko):
+<USER_INPUT>
+{masked_text}
+</USER_INPUT>
+"""
+    )
+
+
 def slm_cleanup(masked_text: str, translate_embedded: bool, **kwargs: Any) -> Dict:
     """Clean up text using an optional ``llama`` instance.
 
     Parameters are accepted as ``**kwargs`` so that unused generation
     parameters (e.g. ``temperature`` or ``max_tokens``) do not raise errors.
     When ``llama`` is ``None`` the function acts as a deterministic stub
-    returning the original ``masked_text``.
+    returning the original ``masked_text``.  With ``output_mode="edits"``
+    (default ``OUTPUT_MODE``) the model only lists span edits, which are
+    applied here to produce the usual ``clean_text``/``changes`` result.
+    A ``stats`` dict, if given, accumulates ``prompt_tokens`` and
+    ``completion_tokens`` and records ``fallback_used``.
     """
 
     llama = kwargs.get("llama")
     temperature = kwargs.get("temperature", kwargs.get("temp", 0.0))
     max_tokens = kwargs.get("max_tokens", 512)
+    edits_mode = kwargs.get("output_mode", OUTPUT_MODE) == "edits"
+    stats = kwargs.get("stats")
+
+    def _stub(t: str) -> str:
+        payload = {"edits": [], "flags": []} if edits_mode else {"clean_text": t, "flags": [], "changes": []}
+        return JSON_START + json.dumps(payload, ensure_ascii=False) + JSON_END
 
     def _call(t: str) -> Dict:
         """Generate and parse model output for ``t``."""
 
         if llama is None or not hasattr(llama, "create_chat_completion"):
             # Deterministic stub used in tests
-            raw = (
-                JSON_START
-                + json.dumps({"clean_text": t, "flags": [], "changes": []}, ensure_ascii=False)
-                + JSON_END
-            )
-        else:  # pragma: no cover - requires llama_cpp
+            raw = _stub(t)
+        else:  # requires llama_cpp or app.fake_llama.FakeLlama
             try:
-                prompt = _build_user(t, translate_embedded)
+                prompt = _build_user_edits(t, translate_embedded) if edits_mode else _build_user(t, translate_embedded)
+                start = time.perf_counter()
                 out = llama.create_chat_completion(
                     messages=[
-                        {"role": "system", "content": SYSTEM},
+                        {"role": "system", "content": EDITS_SYSTEM if edits_mode else SYSTEM},
                         {"role": "user", "content": prompt},
                     ],
                     temperature=temperature,
                     max_tokens=max_tokens,
-                    grammar=GRAMMAR,
+                    grammar=EDITS_GRAMMAR if edits_mode else GRAMMAR,
                 )
+                _record_generation(llama, out, time.perf_counter() - start)
+                if stats is not None:
+                    usage = out.get("usage") or {}
+                    stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + int(usage.get("prompt_tokens") or 0)
+                    stats["completion_tokens"] = stats.get("completion_tokens", 0) + int(usage.get("completion_tokens") or 0)
                 raw = out["choices"][0]["message"]["content"]
             except Exception:
-                raw = (
-                    JSON_START
-                    + json.dumps({"clean_text": t, "flags": [], "changes": []}, ensure_ascii=False)
-                    + JSON_END
-                )
-        return extract_json(raw)
+                if stats is not None:
+                    stats["fallback_used"] = "model_error"
+                raw = _stub(t)
+        obj = extract_json(raw)
+        if edits_mode:
+            obj["clean_text"], obj["changes"] = apply_edits(t, obj.pop("edits", None))
+        return obj
 
     try:
         return _call(masked_text)
     except Exception:
         # Fallback: process sentence by sentence
+        if stats is not None:
+            stats["fallback_used"] = "sentence_split"
         parts = [m.group(0) for m in re.finditer(r"[^.!?]+[.!?]?\s*", masked_text)]
         clean_parts = []
         flags = []
@@ -0,0 +1,46 @@
+import argparse
+import json
+
+from app.archive import archive_reviews, enable_incremental_vacuum
+from app.config import ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS, VACUUM_PAGES
+from app.logging_utils import get_logger
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Move finalized reviews older than the retention window to the archive")
+    ap.add_argument(
+        "--retention-days",
+        type=float,
+        default=ARCHIVE_RETENTION_DAYS,
+        help=f"Keep reviews decided within this many days (default {ARCHIVE_RETENTION_DAYS:g})",
+    )
+    ap.add_argument("--archive-dir", default=ARCHIVE_DIR, help=f"Archive root (default {ARCHIVE_DIR})")
+    ap.add_argument("--batch-size", type=int, default=5000, help="Rows per archive transaction (default 5000)")
+    ap.add_argument(
+        "--vacuum-pages",
+        type=int,
+        default=VACUUM_PAGES,
+        help=f"Pages freed by the incremental VACUUM step, 0 = all (default {VACUUM_PAGES})",
+    )
+    ap.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Convert an older database to incremental auto-vacuum first (one full VACUUM)",
+    )
+    args = ap.parse_args()
+
+    log, _ = get_logger()
+    if args.enable_incremental_vacuum and enable_incremental_vacuum():
+        log.info("vacuum_mode_converted", event="vacuum_mode_converted")
+    result = archive_reviews(
+        retention_days=args.retention_days,
+        archive_dir=args.archive_dir,
+        batch_size=max(1, args.batch_size),
+        vacuum_pages=args.vacuum_pages,
+    )
+    log.info("archive_complete", event="archive_complete", **result)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
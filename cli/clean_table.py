@@ -1,24 +1,87 @@
 import argparse
+import json
+import multiprocessing
 import os
 import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
-from app.io_utils import read_table, write_table, parse_terms, serialize
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from app.io_utils import (
+    EXCEL_SUFFIXES,
+    NESTED_COLUMNS,
+    PIPELINE_COLUMNS,
+    TableWriter,
+    estimate_rows,
+    iter_table,
+    parse_flag,
+    parse_terms,
+    serialize,
+    table_columns,
+)
+from app.batch_stats import ROW_STATS_COLUMNS, BatchStats, row_stats_columns
 from app.checkpointing import Checkpointer
 from app.review_queue import enqueue as enqueue_review
 from app.logging_utils import get_logger
+from app.procmem import report_pid, rss_breakdown
+
+
+def finish_checkpoint(checkpointer: Checkpointer, out: Path, chunk_rows: int) -> None:
+    """Convert an intermediate checkpoint CSV into *out* and remove it.
+
+    Cells are copied as the text the checkpoint holds, so ids like ``007``
+    and texts like ``NA`` reach *out* unchanged.
+    """
+    with TableWriter(str(out), columns=checkpointer.fieldnames) as writer:
+        for frame in iter_table(str(checkpointer.output_path), chunk_size=chunk_rows, as_text=True):
+            writer.write(frame)
+    checkpointer.output_path.unlink()
+    checkpointer.index_path.unlink(missing_ok=True)
+
+
+def make_process_pool(processes: int):
+    """Worker processes forked from a fork server that has the model loaded.
+
+    Returns the executor and a queue on which each worker puts its pid when
+    it starts (see ``log_worker_memory``).
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["app.model_preload"])
+    else:  # each worker loads the model itself; USE_MMAP still shares weights
+        ctx = multiprocessing.get_context("spawn")
+    pids = ctx.SimpleQueue()
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=ctx, initializer=report_pid, initargs=(pids,))
+    return executor, pids
+
+
+def log_worker_memory(log, worker_pids=None) -> None:
+    """Log shared vs private RSS of this process and each pool worker.
+
+    *worker_pids* is the queue from ``make_process_pool``; thread pools have
+    no workers of their own.
+    """
+    workers = set()
+    while worker_pids is not None and not worker_pids.empty():
+        workers.add(worker_pids.get())
+    pids = [("main", os.getpid())] + [("worker", pid) for pid in sorted(workers)]
+    for role, pid in pids:
+        mem = rss_breakdown(pid)
+        if mem:
+            log.info("worker_memory", event="worker_memory", role=role, pid=pid, **mem)
 
 
 def main() -> None:
-    ap = argparse.ArgumentParser(description="Batch-clean CSV/Excel table")
+    ap = argparse.ArgumentParser(description="Batch-clean CSV/Excel/Parquet/Feather table")
     ap.add_argument(
         "input",
-        help="Input CSV/Excel with columns: id,text,(optional)protected_terms,(optional)translate_embedded",
+        help="Input CSV/Excel/Parquet/Feather with columns: id,text,(optional)protected_terms,(optional)translate_embedded",
     )
     ap.add_argument(
         "-o",
         "--output",
-        help="Output path (.csv or .xlsx). Default: <input>.clean.csv",
+        help="Output path (.csv, .xlsx, .parquet or .feather). Default: <input>.clean.csv",
         default=None,
     )
     ap.add_argument(
@@ -32,126 +95,191 @@ def main() -> None:
         default=1,
         help="Number of worker threads (default 1 to avoid CPU thrash with LLM threads)",
     )
+    ap.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="Run the model stage in N worker processes forked after loading the model once (overrides --workers)",
+    )
+    ap.add_argument(
+        "--checkpoint-sync-every",
+        type=int,
+        default=100,
+        help="fsync the checkpointed output and its index every N rows (default 100)",
+    )
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Rows per pipeline batch; post-checks are vectorized per batch (default 64)",
+    )
+    ap.add_argument(
+        "--project-columns",
+        action="store_true",
+        help="Read only id,text,protected_terms,translate_embedded; other input columns are not copied to the output",
+    )
+    ap.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=10_000,
+        help="Rows read per input chunk (Parquet row-group batches, CSV chunks; default 10000)",
+    )
+    ap.add_argument(
+        "--row-stats",
+        action="store_true",
+        help="Add per-row columns: " + ",".join(ROW_STATS_COLUMNS),
+    )
+    ap.add_argument(
+        "--progress-every",
+        type=float,
+        default=10.0,
+        help="Seconds between batch_progress log events (default 10)",
+    )
     args = ap.parse_args()
 
+    from app.config import FAKE_LLM
+
     mp = args.model_path or os.environ.get("MODEL_PATH")
-    if not mp or not Path(mp).exists():
+    if FAKE_LLM:
+        pass  # load test against app.fake_llama; no GGUF needed
+    elif not mp or not Path(mp).exists():
         raise SystemExit(
             "MODEL_PATH is not set or file not found. Use --model-path or export MODEL_PATH=<path/to/model.gguf>"
         )
-    os.environ["MODEL_PATH"] = str(mp)
+    else:
+        os.environ["MODEL_PATH"] = str(mp)
     t0 = time.time()
 
-    from app.pipeline import run_pipeline
+    from app.pipeline import run_pipeline_batch
 
     inp = Path(args.input)
     out = Path(args.output) if args.output else inp.with_suffix(".clean.csv")
 
-    df = read_table(str(inp))
-    if "text" not in df.columns:
+    input_columns = table_columns(str(inp))
+    if "text" not in input_columns:
         raise SystemExit("Input must contain column 'text'")
+    read_columns = [c for c in PIPELINE_COLUMNS if c in input_columns] if args.project_columns else None
+    base_columns = read_columns or input_columns
 
-    has_terms = "protected_terms" in df.columns
-    has_translate = "translate_embedded" in df.columns
-    has_id = "id" in df.columns
+    has_terms = "protected_terms" in base_columns
+    has_translate = "translate_embedded" in base_columns
+    has_id = "id" in base_columns
 
-    base_columns = list(df.columns)
     extra_columns = ["clean_text", "flags", "changes", "mixed_languages", "risk_score", "review_status"]
+    if args.row_stats:
+        extra_columns += ROW_STATS_COLUMNS
     all_columns = base_columns + [c for c in extra_columns if c not in base_columns]
 
-    use_checkpoint = out.suffix.lower() == ".csv" and has_id
+    # Excel files cannot be appended to, so Excel jobs checkpoint into an
+    # intermediate CSV next to the output and convert it once the run is done.
+    use_checkpoint = has_id and out.suffix.lower() in {".csv"} | EXCEL_SUFFIXES
+    checkpoint_path = out if out.suffix.lower() == ".csv" else out.with_name(out.name + ".checkpoint.csv")
     checkpointer = None
+    writer = None
     if use_checkpoint:
-        checkpointer = Checkpointer(out, out.with_suffix(".errors.csv"), id_field="id", fieldnames=all_columns)
-
-    clean_texts: list[str] = []
-    flags_col: list[str] = []
-    changes_col: list[str] = []
-    mixed_col: list[bool] = []
-    risk_scores: list[float] = []
-    review_statuses: list[str] = []
-    flag_stats: dict[str, int] = {"embedded_en": 0, "term_change": 0}
-
-    def process_row(row: dict) -> dict:
-        text = str(row["text"])
-        terms = parse_terms(row.get("protected_terms")) if has_terms else []
-        translate = bool(row.get("translate_embedded")) if has_translate else False
-        row_id = row.get("id")
-        res = run_pipeline(
-            text,
-            translate_embedded=translate,
-            protected_terms=terms,
-            record_id=str(row_id) if row_id is not None else None,
+        checkpointer = Checkpointer(
+            checkpoint_path,
+            out.with_suffix(".errors.csv"),
+            id_field="id",
+            fieldnames=all_columns,
+            sync_every=args.checkpoint_sync_every,
         )
-        if res.get("review_status") == "pending":
-            enqueue_review(str(row_id or ""), {"text": text, "clean_text": res.get("clean_text"), "flags": res.get("flags"), "changes": res.get("changes")})
-        return res
-
-    rows = df.to_dict("records")
-    chunk_size = max(1, args.workers * 4)
-    processed_count = 0
-    skipped = 0
+    else:
+        writer = TableWriter(str(out), columns=all_columns)
+
+    def to_record(row: dict) -> dict:
+        row_id = row.get("id")
+        return {
+            "text": str(row["text"]),
+            "protected_terms": parse_terms(row.get("protected_terms")) if has_terms else [],
+            "translate_embedded": parse_flag(row.get("translate_embedded")) if has_translate else False,
+            "record_id": str(row_id) if row_id is not None else None,
+        }
+
+    parallelism = args.processes if args.processes > 1 else args.workers
+    chunk_size = max(1, args.batch_size, parallelism * 4)
     log, _ = get_logger()
-    with ThreadPoolExecutor(max_workers=args.workers) as ex:
-        for i in range(0, len(rows), chunk_size):
-            chunk = rows[i : i + chunk_size]
-            to_process = []
-            for row in chunk:
-                if use_checkpoint and checkpointer and checkpointer.is_processed(row.get("id")):
-                    skipped += 1
-                    continue
-                to_process.append(row)
-            results = ex.map(process_row, to_process)
-            for row, res in zip(to_process, results):
-                out_row = {**row}
-                out_row["clean_text"] = res["clean_text"]
-                out_row["flags"] = serialize(res["flags"])
-                out_row["changes"] = serialize(res["changes"])
-                out_row["mixed_languages"] = res["mixed_languages"]
-                out_row["risk_score"] = res.get("risk_score", 1.0)
-                out_row["review_status"] = res.get("review_status", "auto_approved")
-
-                if use_checkpoint and checkpointer:
-                    try:
-                        checkpointer.append_row({k: out_row.get(k) for k in all_columns})
-                    except Exception as exc:
-                        checkpointer.append_error(row.get("id"), str(exc), row.get("text", ""))
-                else:
-                    clean_texts.append(out_row["clean_text"])
-                    flags_col.append(serialize(out_row["flags"]))
-                    changes_col.append(serialize(out_row["changes"]))
-                    mixed_col.append(out_row["mixed_languages"])
-                    risk_scores.append(out_row["risk_score"])
-                    review_statuses.append(out_row["review_status"])
-
-                for f in res["flags"]:
-                    t = f.get("type") if isinstance(f, dict) else f
-                    if t:
-                        flag_stats[t] = flag_stats.get(t, 0) + 1
-                processed_count += 1
-            if (i + len(chunk)) % 500 == 0:
-                log.info("batch_progress", event="batch_progress", processed=processed_count, skipped=skipped)
-
-    if not use_checkpoint:
-        df["clean_text"] = clean_texts
-        df["flags"] = flags_col
-        df["changes"] = changes_col
-        df["mixed_languages"] = mixed_col
-        df["risk_score"] = risk_scores
-        df["review_status"] = review_statuses
-        write_table(df, str(out))
-
-    total = processed_count
-    flag_count = sum(flag_stats.values())
+    stats = BatchStats(log, total_rows=estimate_rows(str(inp)), parallelism=parallelism, every_s=args.progress_every)
+    worker_pids = None
+    if args.processes > 1:
+        executor, worker_pids = make_process_pool(args.processes)
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+    with executor as ex:
+        # CSV cells stay text: types guessed per chunk could change between
+        # chunks and break the Parquet/Feather schema fixed by the first one.
+        for frame in iter_table(str(inp), columns=read_columns, chunk_size=args.chunk_rows, as_text=True):
+            rows = frame.to_dict("records")
+            out_rows = []
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i : i + chunk_size]
+                to_process = []
+                for row in chunk:
+                    if use_checkpoint and checkpointer and checkpointer.is_processed(row.get("id")):
+                        stats.skip()
+                        continue
+                    to_process.append(row)
+                # Model calls fan out over the pool; similarity and numeric
+                # checks run once per batch.
+                row_stats: list[dict] = []
+                results = run_pipeline_batch([to_record(r) for r in to_process], map_fn=ex.map, stats=row_stats)
+                for row, res, rstats in zip(to_process, results, row_stats):
+                    if res.get("review_status") == "pending":
+                        enqueue_review(
+                            str(row.get("id") or ""),
+                            {"text": str(row["text"]), "clean_text": res.get("clean_text"), "flags": res.get("flags"), "changes": res.get("changes")},
+                        )
+                    out_row = {**row}
+                    out_row["clean_text"] = res["clean_text"]
+                    out_row["flags"] = res["flags"]
+                    out_row["changes"] = res["changes"]
+                    out_row["mixed_languages"] = res["mixed_languages"]
+                    out_row["risk_score"] = res.get("risk_score", 1.0)
+                    out_row["review_status"] = res.get("review_status", "auto_approved")
+                    if args.row_stats:
+                        out_row.update(row_stats_columns(rstats))
+
+                    if use_checkpoint and checkpointer:
+                        try:
+                            checkpointer.append_row(
+                                {k: serialize(out_row.get(k)) if k in NESTED_COLUMNS else out_row.get(k) for k in all_columns}
+                            )
+                        except Exception as exc:
+                            checkpointer.append_error(row.get("id"), str(exc), row.get("text", ""))
+                    else:
+                        out_rows.append(out_row)
+
+                    stats.add(rstats, res["flags"])
+                stats.maybe_report()
+            if writer and out_rows:
+                writer.write(pd.DataFrame(out_rows, columns=all_columns))
+        log_worker_memory(log, worker_pids)
+
+    if checkpointer:
+        checkpointer.close()
+        if not checkpoint_path.exists():
+            # No rows at all: still leave an output with the header.
+            TableWriter(str(checkpoint_path), columns=all_columns).close()
+        if checkpoint_path != out:
+            finish_checkpoint(checkpointer, out, args.chunk_rows)
+    if writer:
+        writer.close()
+
+    stats.maybe_report(force=True)
+    summary_path = out.with_name(out.name + ".summary.json")
+    summary_path.write_text(json.dumps({"output": str(out), **stats.summary()}, indent=2), encoding="utf-8")
+
+    total = stats.rows
+    flag_count = sum(stats.flags.values())
     elapsed = time.time() - t0
     elapsed_ms = int(elapsed * 1000)
     throughput = total / elapsed if elapsed > 0 else 0
-    summary = ", ".join(f"{k}={v}" for k, v in sorted(flag_stats.items()))
+    summary = ", ".join(f"{k}={v}" for k, v in sorted(stats.flags.items()))
     log.info(
         "batch_complete",
         event="batch_complete",
         processed=total,
-        skipped=skipped,
+        skipped=stats.skipped,
         flags=flag_count,
         elapsed_ms=elapsed_ms,
         throughput_rps=throughput,
@@ -5,3 +5,13 @@ import pytest
 def tmpdir(tmp_path):
     """Alias tmpdir to tmp_path for compatibility."""
     return tmp_path
+
+
+@pytest.fixture
+def review_db(tmp_path, monkeypatch):
+    """Point the review queue at a fresh SQLite file."""
+    from app import db
+
+    path = tmp_path / "cleanroom.db"
+    monkeypatch.setattr(db, "DB_PATH", path)
+    return path
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import db
+from app.archive import archive_reviews, iter_archive
+
+
+def test_archive_moves_old_finalized_reviews(review_db, tmp_path):
+    for i in range(6):
+        db.upsert_review(f"r{i}", {"text": f"teksti {i}", "clean_text": f"Teksti {i}", "flags": [{"type": "numeric_change"}]})
+    db.upsert_review("r0", {"status": "approved", "text": "teksti 0", "clean_text": "Teksti 0"})
+    db.upsert_review("r1", {"status": "rejected", "text": "teksti 1", "clean_text": "Teksti 1", "correction": "Teksti yksi"})
+    db.upsert_review("r2", {"status": "approved", "text": "teksti 2", "clean_text": "Teksti 2", "correction": "Teksti kaksi"})
+    # The learner has consumed everything up to r1, but not r2.
+    db.record_rule_patterns({}, db.get_reviews_since(0)[0]["seq"])
+
+    archive = tmp_path / "archive"
+    assert archive_reviews(retention_days=1, archive_dir=str(archive))["archived"] == 0
+    result = archive_reviews(retention_days=1, archive_dir=str(archive), now=time.time() + 2 * 86400)
+    assert result["archived"] == 2 and result["files"] == 1
+
+    assert db.get_review("r0") is None and db.get_review("r1") is None
+    assert db.get_review("r2")["status"] == "approved"
+    assert db.get_queue_stats() == {"pending": 3, "approved": 1}
+    assert db.get_archive_stats() == {"approved": 1, "rejected": 1}
+
+    rows = sorted(iter_archive(str(archive)), key=lambda r: r["id"])
+    assert [r["id"] for r in rows] == ["r0", "r1"]
+    assert list(archive.glob("date=*/part-*.jsonl.gz"))
+    history = {r["id"]: r["correction"] for r in db.get_review_history()}
+    assert history == {"r1": "Teksti yksi", "r2": "Teksti kaksi"}
+
+
+def test_incremental_vacuum_frees_pages(review_db, tmp_path):
+    db.upsert_reviews([(f"v{i}", {"status": "approved", "text": "x" * 2000, "clean_text": "y"}) for i in range(300)])
+    result = archive_reviews(retention_days=0, archive_dir=str(tmp_path / "archive"), vacuum_pages=0, now=time.time() + 1)
+    assert result["archived"] == 300
+    assert result["freed_pages"] > 100
+
+
+def test_decisions_after_archival_reach_the_learner(review_db, tmp_path):
+    archive = str(tmp_path / "archive")
+    decision = {"status": "approved", "text": "teksti", "clean_text": "Teksti"}
+    db.upsert_review("a", dict(decision, correction="Teksti A"))
+    db.record_rule_patterns({}, db.get_reviews_since(0)[-1]["seq"])
+    assert archive_reviews(retention_days=0, archive_dir=archive, now=time.time() + 1)["archived"] == 1
+
+    # The queue is empty, so a rowid would start over below the watermark.
+    db.upsert_review("b", dict(decision, correction="Teksti B"))
+    since = db.get_reviews_since(db.get_learner_watermark())
+    assert [r["id"] for r in since] == ["b"]
+    db.record_rule_patterns({}, since[-1]["seq"])
+    assert archive_reviews(retention_days=0, archive_dir=archive, now=time.time() + 1)["archived"] == 1
+    assert {r["id"]: r["correction"] for r in db.get_review_history()} == {"a": "Teksti A", "b": "Teksti B"}
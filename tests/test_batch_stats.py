@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.pipeline as pipeline
+from app.batch_stats import BatchStats, LatencyHistogram
+from app.fake_llama import FakeLlama
+from app.pipeline import run_pipeline_batch
+
+
+class _Log:
+    def __init__(self):
+        self.events = []
+
+    def info(self, message, **fields):
+        self.events.append(fields)
+
+
+def test_batch_row_stats_and_summary(monkeypatch):
+    monkeypatch.setattr(pipeline, "_LLAMA", FakeLlama(prompt_tps=0, decode_tps=0, ttft_ms=0))
+    records = [
+        {"text": "Takki on lämmin ja kevyt.", "record_id": "s1"},
+        {"text": "Takki on lämmin – super warm for winter commutes!", "record_id": "s2"},
+    ]
+    rows = []
+    results = run_pipeline_batch(records, stats=rows)
+    assert len(rows) == 2
+    assert all(r["completion_tokens"] > 0 and r["prompt_tokens"] > 0 for r in rows)
+    assert set(rows[0]["stage_ms"]) == {"analysis", "model", "guardrails", "post_checks", "harmonize"}
+    assert rows[0]["fallback_used"] is None
+
+    log = _Log()
+    stats = BatchStats(log, total_rows=4, every_s=3600)
+    for row, res in zip(rows, results):
+        stats.add(row, res["flags"])
+    stats.maybe_report()
+    assert log.events == []
+    stats.maybe_report(force=True)
+    assert log.events[0]["processed"] == 2 and log.events[0]["eta_s"] is not None
+
+    summary = stats.summary()
+    assert summary["completion_tokens"] == sum(r["completion_tokens"] for r in rows)
+    assert summary["stage_latency"]["model"]["count"] == 2
+    assert sum(h["count"] for h in summary["flag_latency"].values()) >= 1
+
+
+def test_latency_histogram_buckets():
+    h = LatencyHistogram(buckets=(1, 10))
+    for ms in (0.5, 1, 5, 50):
+        h.observe(ms)
+    assert h.to_dict()["buckets"] == {"<=1": 2, "<=10": 1, ">10": 1}
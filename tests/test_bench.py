@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.bench import compare_results
+from tools.synth_corpus import generate_corpus
+
+
+def test_synthetic_corpus_is_deterministic():
+    a = generate_corpus(50, seed=7, mixed_ratio=0.0, en_row_ratio=0.0, term_rate=1.0)
+    b = generate_corpus(50, seed=7, mixed_ratio=0.0, en_row_ratio=0.0, term_rate=1.0)
+    assert a.equals(b)
+    assert list(a.columns) == ["id", "text", "protected_terms", "translate_embedded"]
+    assert all(row.protected_terms and row.protected_terms in row.text for row in a.itertuples())
+    assert not a["translate_embedded"].any()
+
+
+def test_compare_results_flags_regressions():
+    baseline = {
+        "pipeline": {"median_ms": 10.0, "p95_ms": 20.0, "throughput_rps": 100.0},
+        "stages": {"lang_spans": {"median_us": 50.0, "p95_us": 80.0}},
+    }
+    current = {
+        "pipeline": {"median_ms": 10.5, "p95_ms": 30.0, "throughput_rps": 80.0},
+        "stages": {"lang_spans": {"median_us": 51.0, "p95_us": 81.0}, "difflib": {"median_us": 5.0}},
+    }
+    regressions = compare_results(baseline, current, threshold=0.10)
+    assert [r.split(":")[0] for r in regressions] == ["pipeline.p95_ms", "pipeline.throughput_rps"]
+    assert compare_results(baseline, baseline, threshold=0.0) == []
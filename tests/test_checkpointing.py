@@ -1,3 +1,4 @@
+import csv
 import os
 import sys
 from pathlib import Path
@@ -14,11 +15,72 @@ def test_checkpoint_skip_and_append(tmp_path):
 
     cp.append_row({"id": "1", "text": "hello"})
     assert cp.is_processed("1")
+    # Buffered until the next sync.
+    assert out.stat().st_size == 0
 
     cp.append_error("2", "boom", "bad")
     assert err.exists()
+    cp.close()
 
     # Re-load to ensure state persists
     cp2 = Checkpointer(out, err, id_field="id", fieldnames=["id", "text"])
     assert cp2.is_processed("1")
     assert not cp2.is_processed("3")
+
+
+def test_checkpoint_truncates_partial_row(tmp_path):
+    out = tmp_path / "out.csv"
+    err = tmp_path / "out.errors.csv"
+    with Checkpointer(out, err, id_field="id", fieldnames=["id", "text"], sync_every=2) as cp:
+        cp.append_row({"id": "1", "text": "hello"})
+        cp.append_row({"id": "2", "text": "multi\nline"})
+    complete = out.read_bytes()
+
+    # Simulate a crash halfway through writing row 3.
+    with out.open("ab") as f:
+        f.write(b'3,"half a ro')
+
+    cp2 = Checkpointer(out, err, id_field="id", fieldnames=["id", "text"])
+    assert cp2.is_processed("1") and cp2.is_processed("2")
+    assert not cp2.is_processed("3")
+    assert out.read_bytes() == complete
+    cp2.append_row({"id": "3", "text": "again"})
+    cp2.close()
+
+    with out.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["id"] for r in rows] == ["1", "2", "3"]
+    assert rows[1]["text"] == "multi\nline"
+
+
+def test_checkpoint_rebuilds_missing_index(tmp_path):
+    out = tmp_path / "out.csv"
+    err = tmp_path / "out.errors.csv"
+    out.write_text("id,text\r\n1,a\r\n2,b\r\n3,partial", encoding="utf-8")
+
+    cp = Checkpointer(out, err, id_field="id", fieldnames=["id", "text"])
+    assert cp.is_processed("1") and cp.is_processed("2")
+    assert not cp.is_processed("3")
+    assert cp.index_path.exists()
+    cp.append_row({"id": "3", "text": "c"})
+    cp.close()
+    assert out.read_bytes() == b"id,text\r\n1,a\r\n2,b\r\n3,c\r\n"
+    assert Checkpointer(out, err, id_field="id").is_processed("3")
+
+
+def test_finish_checkpoint_keeps_cells_as_written(tmp_path):
+    import openpyxl
+    from cli.clean_table import finish_checkpoint
+
+    out = tmp_path / "out.xlsx"
+    cp = Checkpointer(
+        out.with_name(out.name + ".checkpoint.csv"), tmp_path / "out.errors.csv", fieldnames=["id", "text", "clean_text"]
+    )
+    cp.append_row({"id": "007", "text": "NA", "clean_text": "null"})
+    cp.append_row({"id": "8", "text": "", "clean_text": "x"})
+    cp.close()
+
+    finish_checkpoint(cp, out, chunk_rows=10)
+    rows = list(openpyxl.load_workbook(out).active.iter_rows(values_only=True))
+    assert rows == [("id", "text", "clean_text"), ("007", "NA", "null"), ("8", None, "x")]
+    assert not cp.output_path.exists()
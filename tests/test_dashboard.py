@@ -0,0 +1,40 @@
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import learner as learner_mod
+from app.dashboard import router
+
+
+def test_rules_sorted_paged_with_etag(tmp_path, monkeypatch):
+    monkeypatch.setattr(learner_mod, "RULES_PATH", tmp_path / "rules.json")
+    learner = learner_mod.Learner()
+    learner.rules = [
+        {"type": "casing", "pattern": f"p{i}", "fix": f"P{i}", "confidence": i / 10}
+        for i in range(5)
+    ] + [{"type": "spacing", "pattern": "a b", "fix": "ab", "confidence": 0.95}]
+    learner.save_rules()
+    monkeypatch.setattr(learner_mod, "_LEARNER", learner)
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    resp = client.get("/stats/rules", params={"limit": 2})
+    body = resp.json()
+    assert body["total"] == 6
+    assert [r["pattern"] for r in body["items"]] == ["a b", "p4"]
+    page = client.get("/stats/rules", params={"type": "casing", "sort": "pattern", "order": "asc", "offset": 3}).json()
+    assert [r["pattern"] for r in page["items"]] == ["p3", "p4"]
+
+    etag = resp.headers["etag"]
+    assert client.get("/stats/rules", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 304
+
+    learner.rules = learner.rules[:1]
+    learner.save_rules()
+    fresh = client.get("/stats/rules", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.json()["total"] == 1
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.pipeline as pipeline
+import app.slm_llamacpp as slm
+from app.fake_llama import FakeLlama
+from app.pipeline import run_pipeline
+from app.slm_llamacpp import apply_edits
+
+
+def test_apply_edits_in_order():
+    text = "Takki on lämmin,ja kevyt. Takki on musta"
+    edits = [
+        {"before": "lämmin,ja", "after": "lämmin ja", "type": "punctuation"},
+        {"before": "on", "after": "on"},
+        {"before": "musta", "after": "musta."},
+    ]
+    clean, changes = apply_edits(text, edits)
+    assert clean == "Takki on lämmin ja kevyt. Takki on musta."
+    assert [c["span"] for c in changes] == [[9, 18], [35, 40]]
+    assert [c["type"] for c in changes] == ["punctuation", "grammar"]
+
+    with pytest.raises(ValueError):
+        # The anchors are out of order.
+        apply_edits(text, [edits[2], edits[0]])
+
+
+def test_edits_mode_matches_full_with_fewer_tokens(monkeypatch):
+    text = "Tämä takki on lämmin ja kevyt, sopii talvella kaupunkiin. Koko 38, paino 1,2 kg."
+    fake = FakeLlama(prompt_tps=0, decode_tps=0, ttft_ms=0)
+    used = []
+    create = fake.create_chat_completion
+
+    def counting(*args, **kwargs):
+        out = create(*args, **kwargs)
+        used.append(out["usage"]["completion_tokens"])
+        return out
+
+    monkeypatch.setattr(fake, "create_chat_completion", counting)
+    monkeypatch.setattr(pipeline, "_LLAMA", fake)
+
+    full = run_pipeline(text)
+    monkeypatch.setattr(slm, "OUTPUT_MODE", "edits")
+    edits = run_pipeline(text)
+
+    assert edits["clean_text"] == full["clean_text"] == text
+    assert edits["flags"] == full["flags"]
+    assert used[1] * 3 < used[0]
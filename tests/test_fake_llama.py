@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.pipeline as pipeline
+from app.fake_llama import FakeLlama
+from app.pipeline import run_pipeline
+
+
+def test_fake_llama_echoes_input(monkeypatch):
+    fake = FakeLlama(prompt_tps=0, decode_tps=0, ttft_ms=0)
+    monkeypatch.setattr(pipeline, "_LLAMA", fake)
+    text = "Tämä takki on super warm for winter commutes kaupungilla."
+    assert run_pipeline(text)["clean_text"] == text
+
+
+def test_fake_llama_json_failures_fall_back(monkeypatch):
+    fake = FakeLlama(prompt_tps=0, decode_tps=0, ttft_ms=0, json_fail_rate=1.0)
+    monkeypatch.setattr(pipeline, "_LLAMA", fake)
+    text = "Ale -10% vain tänään. Malli on klassikko."
+    result = run_pipeline(text)
+    assert result["clean_text"] == text
+    assert not any(f.get("type") == "numeric_change" for f in result["flags"])
+
+
+def test_fake_llama_single_slot():
+    fake = FakeLlama(prompt_tps=0, decode_tps=0, ttft_ms=50)
+    messages = [{"role": "user", "content": "<USER_INPUT>\nhei\n</USER_INPUT>"}]
+    out = fake.create_chat_completion(messages)
+    assert out["usage"]["completion_tokens"] > 0
+
+    threads = [threading.Thread(target=fake.create_chat_completion, args=(messages,)) for _ in range(3)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.perf_counter() - start >= 0.15
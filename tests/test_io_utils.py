@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.io_utils import TableWriter, iter_table, parse_flag, read_table, table_columns, write_table
+
+
+def _frame(n):
+    return pd.DataFrame(
+        {
+            "id": list(range(n)),
+            "text": [f"rivi {i}" for i in range(n)],
+            "notes": ["x" * 50] * n,
+        }
+    )
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_arrow_round_trip_with_projection(tmp_path, suffix):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"in{suffix}"
+    write_table(_frame(25), str(path))
+
+    assert table_columns(str(path)) == ["id", "text", "notes"]
+    assert list(read_table(str(path), columns=["id", "text"]).columns) == ["id", "text"]
+    chunks = list(iter_table(str(path), columns=["text"], chunk_size=10))
+    assert all(list(c.columns) == ["text"] for c in chunks)
+    assert sum(len(c) for c in chunks) == 25
+    assert chunks[-1]["text"].iloc[-1] == "rivi 24"
+
+
+def test_nested_columns_stored_natively(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "out.parquet"
+    rows = [
+        {"id": 1, "flags": [{"type": "embedded_en", "start": 0, "end": 4}], "changes": []},
+        {"id": 2, "flags": [{"type": "term_change", "term": "ABC-123"}], "changes": [{"span": [1, 2], "type": "spelling"}]},
+    ]
+    with TableWriter(str(path)) as writer:
+        writer.write(pd.DataFrame(rows[:1]))
+        writer.write(pd.DataFrame(rows[1:]))
+
+    table = pq.read_table(path)
+    assert pa.types.is_list(table.schema.field("flags").type)
+    assert pq.ParquetFile(path).num_row_groups == 2
+    flags = table.column("flags").to_pylist()
+    assert flags[0][0]["start"] == 0
+    assert flags[1][0]["extra"] == '{"term": "ABC-123"}'
+
+
+def test_xlsx_streams_in_chunks(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "in.xlsx"
+    with TableWriter(str(path)) as writer:
+        writer.write(_frame(12))
+        writer.write(_frame(13).assign(id=lambda d: d["id"] + 12, notes=float("nan")))
+
+    assert table_columns(str(path)) == ["id", "text", "notes"]
+    chunks = list(iter_table(str(path), columns=["id", "notes"], chunk_size=10))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+    assert list(chunks[0].columns) == ["id", "notes"]
+    df = read_table(str(path))
+    assert df["id"].tolist() == list(range(25))
+    assert df["notes"].isna().sum() == 13
+
+
+def test_csv_as_text_keeps_a_stable_schema(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    src = tmp_path / "in.csv"
+    src.write_text("id,text,translate_embedded\n1,a,1\n2,NA,\nA3,c,false\n", encoding="utf-8")
+    out = tmp_path / "out.parquet"
+    with TableWriter(str(out)) as writer:
+        for chunk in iter_table(str(src), chunk_size=2, as_text=True):
+            writer.write(chunk)
+
+    table = pq.read_table(out)
+    assert table.column("id").to_pylist() == ["1", "2", "A3"]
+    assert table.column("text").to_pylist() == ["a", "NA", "c"]
+    assert [parse_flag(v) for v in table.column("translate_embedded").to_pylist()] == [True, False, False]
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet", ".xlsx"])
+def test_writer_without_rows_leaves_the_header(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"out{suffix}"
+    TableWriter(str(path), columns=["id", "text", "flags"]).close()
+    assert table_columns(str(path)) == ["id", "text", "flags"]
+    assert len(read_table(str(path))) == 0
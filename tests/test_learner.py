@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import learner as learner_mod
+from app.learner import Learner
+from app.review_queue import enqueue, update
+
+
+def _review(item_id, text, correction):
+    enqueue(item_id, {"text": text, "clean_text": text, "flags": [], "changes": []})
+    update(item_id, approved=True, correction=correction)
+
+
+def test_learn_is_incremental(review_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(learner_mod, "RULES_PATH", tmp_path / "rules.json")
+    for i in range(3):
+        _review(f"id-{i}", "north face", "North Face")
+
+    learner = Learner()
+    new_rules = learner.learn()
+    assert [(r["pattern"], r["fix"], r["type"]) for r in new_rules] == [("north face", "North Face", "casing")]
+    assert learner.harmonize("a north face jacket") == "a North Face jacket"
+
+    # Nothing new since the watermark: no rescan, no new rules.
+    assert learner.learn() == []
+
+    # Older corrections keep counting even with a small batch limit.
+    _review("id-3", "north face", "North Face")
+    assert learner.learn(limit=1) == []
+    assert learner.get_rules()[0]["count"] == 4
+    assert learner.get_rules()[0]["confidence"] == 0.4
+
+    reloaded = Learner()
+    assert reloaded.get_rules() == learner.get_rules()
+
+
+def test_token_level_patterns():
+    from app.learner import RuleMiner
+
+    miner = RuleMiner()
+    assert miner.extract_token_patterns("Osta sku 123 nyt heti", "Osta SKU-123 nyt heti") == [
+        {"type": "hyphenation", "pattern": "sku 123", "fix": "SKU-123", "confidence": 0.5}
+    ]
+    rewrite = miner.extract_token_patterns("Tämä on colour sininen.", "Tämä on color sininen.")
+    assert [(r["type"], r["pattern"], r["fix"]) for r in rewrite] == [("rewrite", "on colour sininen.", "on color sininen.")]
+
+    history = [
+        {"text": f"Malli {i} sku 7 on hyvä, sku 7 riittää", "correction": f"Malli {i} SKU-7 on hyvä, SKU-7 riittää"}
+        for i in range(3)
+    ]
+    assert miner.count_patterns(history) == {("sku 7", "SKU-7", "hyphenation"): 3}
+
+
+def test_harmonize_matches_whole_tokens_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(learner_mod, "RULES_PATH", tmp_path / "rules.json")
+    learner = Learner()
+    learner.rules = [{"type": "hyphenation", "pattern": "sku 7", "fix": "SKU-7", "confidence": 0.5}]
+    assert learner.harmonize("Sku 7 ja sku 70") == "SKU-7 ja sku 70"
+    assert learner.harmonize("Osta sku 7.") == "Osta SKU-7."
+    assert learner.harmonize("(sku 7) ja xsku 7") == "(SKU-7) ja xsku 7"
+
+
+def test_mining_counts_each_review_once():
+    from app.learner import RuleMiner
+
+    history = [{"id": f"r{i}", "text": "sku 7 ja sku 7", "correction": "SKU-7 ja SKU-7"} for i in range(2)]
+    assert RuleMiner().mine_from_history(history) == []
+    history.append(dict(history[0], id="r2"))
+    assert [(r["pattern"], r["confidence"]) for r in RuleMiner().mine_from_history(history)] == [("sku 7", 0.3)] * 3
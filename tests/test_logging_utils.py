@@ -0,0 +1,32 @@
+import os
+import sys
+
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.logging_utils as logging_utils
+from app.logging_utils import get_logger, parse_sample_rates
+from app.pipeline import run_pipeline
+
+
+def test_sample_rates_drop_per_record_events(monkeypatch):
+    assert parse_sample_rates("pipeline_start=0, pipeline_end=0.5,bad=x,") == {
+        "pipeline_start": 0.0,
+        "pipeline_end": 0.5,
+    }
+    monkeypatch.setattr(logging_utils, "SAMPLE_RATES", {"pipeline_start": 0.0})
+    events = []
+    sink = logger.add(lambda m: events.append(m.record["extra"]["event"]), level="DEBUG")
+    try:
+        run_pipeline("Takki on lämmin.", record_id="log-1")
+    finally:
+        logger.remove(sink)
+    assert "pipeline_start" not in events
+    assert "pipeline_end" in events
+
+
+def test_generated_correlation_ids_are_unique():
+    ids = {get_logger()[1] for _ in range(1000)}
+    assert len(ids) == 1000
+    assert get_logger("given")[1] == "given"
@@ -2,7 +2,8 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.pipeline import run_pipeline
+from app.pipeline import _extract_numbers, batch_extract_numbers, run_pipeline, run_pipeline_batch
+from tools.synth_corpus import generate_corpus
 
 
 def test_embedded_en_flag():
@@ -15,3 +16,58 @@ def test_term_unchanged():
     text = "Suosittu malli <TERM>NorthFace 1996</TERM> on klassikko."
     result = run_pipeline(text)
     assert '<TERM>NorthFace 1996</TERM>' in result['clean_text']
+
+
+def test_batch_matches_single(monkeypatch):
+    def fake_cleanup(masked_text: str, translate_embedded: bool, **kwargs):
+        # Drop a comma everywhere, bump a number and rewrite heavily on some rows.
+        out = masked_text.replace(",", "", 1)
+        if len(masked_text) % 3 == 0:
+            out = out.replace("0", "1", 1)
+        if len(masked_text) % 5 == 0:
+            out = out[: len(out) // 2]
+        return {"clean_text": out, "flags": [], "changes": []}
+
+    monkeypatch.setattr("app.pipeline.slm_cleanup", fake_cleanup)
+    records = [
+        {"text": r["text"], "protected_terms": r["protected_terms"].split("; ") if r["protected_terms"] else [], "record_id": str(r["id"])}
+        for r in generate_corpus(60, seed=3).to_dict("records")
+    ]
+    single = [run_pipeline(r["text"], protected_terms=r["protected_terms"], record_id=r["record_id"]) for r in records]
+    assert run_pipeline_batch(records) == single
+    assert any(f["type"] == "numeric_change" for res in single for f in res["flags"])
+    assert any(f["type"] == "high_risk_rewrite" for res in single for f in res["flags"])
+
+
+def test_batch_extract_numbers():
+    texts = ["Hinta 12,90 €", "", "-5", "10–15 % ale 3", "ei numeroita"]
+    assert batch_extract_numbers(texts) == [_extract_numbers(t) for t in texts]
+
+
+def test_async_matches_sync():
+    import asyncio
+
+    from app.pipeline import run_pipeline_async
+
+    text = "Tämä takki maksaa 49,90 € ja on super warm for winter commutes."
+    result = asyncio.run(run_pipeline_async(text, record_id="r1"))
+    assert result == run_pipeline(text, record_id="r1")
+
+
+def test_async_keeps_cpu_work_off_the_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    from app import pipeline
+
+    threads = []
+    reconcile = pipeline._reconcile
+
+    def spy(*args):
+        threads.append(threading.get_ident())
+        return reconcile(*args)
+
+    monkeypatch.setattr(pipeline, "_reconcile", spy)
+    loop_thread = threading.get_ident()
+    asyncio.run(pipeline.run_pipeline_async("Tämä takki on super warm.", record_id="r2"))
+    assert threads and loop_thread not in threads
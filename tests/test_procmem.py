@@ -0,0 +1,31 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.procmem import report_pid, rss_breakdown
+
+
+@pytest.mark.skipif(not Path("/proc/self/smaps_rollup").exists(), reason="needs Linux smaps_rollup")
+def test_rss_breakdown_splits_shared_and_private():
+    mem = rss_breakdown(os.getpid())
+    assert mem["rss_kb"] > 0
+    assert mem["shared_kb"] + mem["private_kb"] == mem["rss_kb"]
+    assert rss_breakdown(2**22 + 12345) == {}
+
+
+def test_pool_workers_report_their_pids():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    ctx = multiprocessing.get_context("spawn")
+    pids = ctx.SimpleQueue()
+    with ProcessPoolExecutor(max_workers=2, mp_context=ctx, initializer=report_pid, initargs=(pids,)) as ex:
+        seen = {f.result() for f in [ex.submit(os.getpid) for _ in range(8)]}
+    reported = set()
+    while not pids.empty():
+        reported.add(pids.get())
+    assert seen <= reported and os.getpid() not in reported
@@ -0,0 +1,44 @@
+import os
+import pstats
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import config
+from app.pipeline import run_pipeline
+from app.profiling import capture, should_profile
+
+
+def test_profile_records_write_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PROFILE_RATE", 1.0)
+    monkeypatch.setattr(config, "CLEANROOM_PROFILE", "cprofile")
+    run_pipeline("Takki on lämmin ja kevyt.", record_id="prof/1")
+    (path,) = tmp_path.glob("prof_1.*.pstats")
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert "run_pipeline" in functions or "_prepare" in functions
+
+    monkeypatch.setattr(config, "CLEANROOM_PROFILE", "sampling")
+    monkeypatch.setattr(config, "PROFILE_INTERVAL_MS", 0.5)
+    run_pipeline("Takki on lämmin ja kevyt.", record_id="prof-2")
+    assert len(list(tmp_path.glob("prof-2.*.collapsed"))) == 1
+
+    assert not should_profile("x", rate=0.0)
+
+
+def test_capture_samples_other_threads():
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    t = threading.Thread(target=busy_loop)
+    t.start()
+    try:
+        stacks = capture(0.2, interval_s=0.005)
+    finally:
+        stop.set()
+        t.join()
+    assert "busy_loop" in stacks
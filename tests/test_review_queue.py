@@ -6,7 +6,7 @@ import pytest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import db
+from app import db, review_queue
 
 
 def test_db_upsert_and_retrieve(tmp_path):
@@ -31,3 +31,249 @@ def test_db_upsert_and_retrieve(tmp_path):
 
     pending = db.get_pending_reviews()
     assert any(r["id"] == "id-123" for r in pending)
+
+
+def test_pending_page_keyset_and_flag_filter(review_db):
+    for i in range(5):
+        flags = [{"type": "numeric_change"}] if i % 2 == 0 else [{"type": "high_risk_rewrite", "score": 0.5}]
+        db.upsert_review(f"id-{i}", {"text": f"text {i}", "clean_text": f"clean {i}", "flags": flags, "changes": [{"type": "rewrite"}]})
+
+    first = db.get_pending_page(limit=2)
+    assert [r["id"] for r in first["items"]] == ["id-0", "id-1"]
+    assert first["items"][0]["flags"] == [{"type": "numeric_change"}]
+    assert first["items"][0]["change_count"] == 1
+    assert "clean_text" not in first["items"][0]
+
+    second = db.get_pending_page(limit=2, after=first["next_cursor"])
+    assert [r["id"] for r in second["items"]] == ["id-2", "id-3"]
+    last = db.get_pending_page(limit=2, after=second["next_cursor"])
+    assert [r["id"] for r in last["items"]] == ["id-4"]
+    assert last["next_cursor"] is None
+
+    numeric = db.get_pending_page(limit=10, flag_type="numeric_change", summary=False)
+    assert [r["id"] for r in numeric["items"]] == ["id-0", "id-2", "id-4"]
+    assert numeric["items"][0]["clean_text"] == "clean 0"
+
+
+def test_requeued_item_keeps_its_page_position(review_db):
+    for i in range(3):
+        db.upsert_review(f"p{i}", {"text": f"t{i}", "clean_text": f"T{i}", "flags": [], "changes": []})
+    first = db.get_pending_page(limit=2)
+    assert [r["id"] for r in first["items"]] == ["p0", "p1"]
+
+    # Enqueueing p0 again (e.g. a re-run of the batch) rewrites it in place.
+    db.upsert_review("p0", {"text": "t0", "clean_text": "T0!", "flags": [{"type": "numeric_change"}], "changes": []})
+    assert [r["id"] for r in db.get_pending_page(after=first["next_cursor"])["items"]] == ["p2"]
+    assert db.get_review("p0")["clean_text"] == "T0!"
+    assert db.get_flag_distribution() == {"numeric_change": 1}
+    assert db.get_queue_stats() == {"pending": 3}
+
+
+def test_update_keeps_flags_decoded(review_db):
+    from app.review_queue import enqueue, update
+
+    enqueue("id-1", {"text": "a", "clean_text": "b", "flags": [{"type": "numeric_change"}], "changes": []})
+    update("id-1", approved=True, correction="c")
+    item = db.get_review("id-1")
+    assert item["status"] == "approved"
+    assert item["flags"] == [{"type": "numeric_change"}]
+
+
+def test_writer_shares_commits_in_sync_mode(review_db, monkeypatch):
+    import asyncio
+
+    batches = []
+    real = review_queue.upsert_reviews
+
+    def recording(items):
+        batches.append(len(items))
+        real(items)
+
+    monkeypatch.setattr(review_queue, "upsert_reviews", recording)
+    writer = review_queue.ReviewWriter(durability="sync")
+
+    async def main():
+        await asyncio.gather(
+            *(writer.enqueue_async(f"id-{i}", {"text": "t", "clean_text": "c", "flags": [], "changes": []}) for i in range(20))
+        )
+
+    asyncio.run(main())
+    # Every sync enqueue has returned, so everything is committed already.
+    assert len(db.get_pending_reviews()) == 20
+    assert sum(batches) == 20
+    assert len(batches) < 20
+    writer.close()
+
+
+def test_cancelled_sync_waiter_does_not_stop_the_writer(review_db, monkeypatch):
+    import asyncio
+    import threading
+
+    entered, release = threading.Event(), threading.Event()
+    real = review_queue.upsert_reviews
+
+    def blocking(items):
+        entered.set()
+        release.wait(5)
+        real(items)
+
+    monkeypatch.setattr(review_queue, "upsert_reviews", blocking)
+    writer = review_queue.ReviewWriter(durability="sync")
+    payload = {"text": "t", "clean_text": "c", "flags": [], "changes": []}
+
+    async def main():
+        tasks = [asyncio.create_task(writer.enqueue_async("id-0", dict(payload)))]
+        await asyncio.get_running_loop().run_in_executor(None, entered.wait, 5)
+        # id-0 is being written; the others wait in the queue.
+        tasks += [asyncio.create_task(writer.enqueue_async(f"id-{i}", dict(payload))) for i in (1, 2)]
+        await asyncio.sleep(0)
+        tasks[1].cancel()
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], asyncio.CancelledError)
+    writer.submit("id-3", dict(payload)).result(timeout=5)
+    writer.close(timeout=5)
+    assert sorted(r["id"] for r in db.get_pending_reviews()) == ["id-0", "id-2", "id-3"]
+
+
+def test_batched_writer_flushes_on_close(review_db):
+    from app.review_queue import ReviewWriter
+
+    writer = ReviewWriter(durability="batched", batch_size=1000, flush_ms=60_000)
+    for i in range(5):
+        writer.enqueue(f"id-{i}", {"text": "t", "clean_text": "c", "flags": [], "changes": []})
+    assert db.get_pending_reviews() == []
+    writer.close()
+    assert len(db.get_pending_reviews()) == 5
+
+
+def test_counters_follow_replace_and_update(review_db):
+    import sqlite3
+
+    # A database created before the counters existed is migrated and counted.
+    conn = sqlite3.connect(review_db)
+    conn.execute(
+        "CREATE TABLE review_queue (id TEXT PRIMARY KEY, status TEXT, text TEXT, clean_text TEXT,"
+        " flags TEXT, changes TEXT, correction TEXT)"
+    )
+    conn.execute("INSERT INTO review_queue VALUES ('old', 'approved', 'abcd', 'abc', '[]', '[]', NULL)")
+    conn.commit()
+    conn.close()
+
+    db.upsert_review("a", {"text": "12345", "clean_text": "1234"})
+    db.upsert_review("b", {"text": "xy", "clean_text": "xyz"})
+    created = db.get_review("a")["created_at"]
+    db.upsert_review("a", {"status": "rejected", "text": "12345", "clean_text": "1234"})
+    # Rewrites that keep the status are not new writes of the series.
+    db.upsert_review("a", {"status": "rejected", "text": "12345", "clean_text": "1234", "correction": "x"})
+    db.upsert_review("b", {"text": "xy", "clean_text": "xyz"})
+    assert db.get_review("a")["created_at"] == created
+    assert db.get_queue_stats() == {"approved": 1, "pending": 1, "rejected": 1}
+
+    conn = db.get_conn()
+    with conn:
+        conn.execute("UPDATE review_queue SET status = 'approved' WHERE id = 'b'")
+        conn.execute("DELETE FROM review_queue WHERE id = 'old'")
+    conn.close()
+    assert db.get_queue_stats() == {"approved": 1, "rejected": 1}
+    length = db.get_length_stats()
+    assert length["count"] == 2 and length["avg_input"] == 3.5 and length["avg_clean"] == 3.5
+
+    series = db.get_review_series(0)
+    totals = {}
+    for row in series:
+        totals[row["status"]] = totals.get(row["status"], 0) + row["n"]
+    assert totals == {"pending": 2, "rejected": 1, "approved": 1}
+
+
+def test_identical_pending_reviews_share_one_decision(review_db):
+    payload = {"text": "Sama teksti", "clean_text": "Sama teksti.", "flags": [{"type": "numeric_change"}], "changes": []}
+    db.upsert_reviews([(f"sku-{i}", dict(payload)) for i in range(3)])
+    review_queue.enqueue("sku-3", dict(payload))
+    review_queue.enqueue("other", dict(payload, text="Eri teksti"))
+
+    page = db.get_pending_page(limit=10)
+    assert [(r["id"], r["group_size"]) for r in page["items"]] == [("sku-0", 4), ("other", 1)]
+    assert db.get_review("sku-2")["text"] == "Sama teksti"
+    assert len(db.get_pending_reviews()) == 5
+
+    updated = review_queue.update("sku-1", approved=True, correction="Sama teksti!")
+    assert updated["id"] == "sku-0" and updated["applied"] == 4
+    assert [r["id"] for r in db.get_pending_reviews()] == ["other"]
+    assert db.get_review("sku-3")["correction"] == "Sama teksti!"
+    assert db.get_queue_stats() == {"approved": 4, "pending": 1}
+    assert [r["id"] for r in db.get_reviews_since(0)] == ["sku-0"]
+
+
+def test_flag_and_change_tables_follow_reviews(review_db):
+    changes = [{"type": "spelling", "source": "spell"}, {"type": "spelling", "source": "spell"}]
+    db.upsert_reviews(
+        [
+            ("a", {"text": "a", "clean_text": "A", "flags": [{"type": "numeric_change"}], "changes": changes}),
+            ("b", {"text": "b", "clean_text": "B", "flags": [{"type": "numeric_change"}, {"type": "embedded_en"}]}),
+            ("b2", {"text": "b", "clean_text": "B", "flags": [{"type": "numeric_change"}, {"type": "embedded_en"}]}),
+            ("c", {"text": "c", "clean_text": "C", "flags": [], "changes": [{"type": "grammar", "source": "slm"}]}),
+        ]
+    )
+    assert db.get_flag_distribution() == {"numeric_change": 3, "embedded_en": 2}
+    assert db.get_change_distribution() == [
+        {"source": "slm", "type": "grammar", "items": 1, "changes": 1},
+        {"source": "spell", "type": "spelling", "items": 1, "changes": 2},
+    ]
+    assert [r["id"] for r in db.get_pending_page(flag_type="embedded_en")["items"]] == ["b"]
+    assert [r["id"] for r in db.get_pending_page(change_source="spell")["items"]] == ["a"]
+    page = db.get_pending_page(limit=1, flag_type="numeric_change")
+    assert [r["id"] for r in page["items"]] == ["a"]
+    assert [r["id"] for r in db.get_pending_page(after=page["next_cursor"], flag_type="numeric_change")["items"]] == ["b"]
+
+    review_queue.update("b", approved=False)
+    assert db.get_flag_distribution() == {"numeric_change": 1}
+    assert db.get_flag_distribution("rejected") == {"numeric_change": 2, "embedded_en": 2}
+
+
+def test_claims_give_reviewers_disjoint_items(review_db):
+    from prometheus_client import REGISTRY
+
+    for i in range(4):
+        review_queue.enqueue(f"c{i}", {"text": f"t{i}", "clean_text": f"T{i}", "flags": [], "changes": []})
+    alice = [r["id"] for r in review_queue.claim("alice", limit=2)]
+    bob = [r["id"] for r in review_queue.claim("bob", limit=5)]
+    assert alice == ["c0", "c1"] and bob == ["c2", "c3"]
+    # Claiming again renews what alice holds instead of taking more.
+    assert [r["id"] for r in review_queue.claim("alice", limit=2)] == alice
+    assert review_queue.heartbeat("alice", ["c0", "c2"]) == ["c0"]
+
+    with pytest.raises(review_queue.ReviewConflict):
+        review_queue.update("c2", approved=True, reviewer="alice")
+    before = REGISTRY.get_sample_value("cleanroom_review_decision_seconds_count", {"status": "approved"}) or 0
+    assert review_queue.update("c0", approved=True, reviewer="alice")["status"] == "approved"
+    after = REGISTRY.get_sample_value("cleanroom_review_decision_seconds_count", {"status": "approved"})
+    assert after == before + 1
+    with pytest.raises(review_queue.ReviewConflict):
+        review_queue.update("c0", approved=False, reviewer="bob")
+
+    assert review_queue.release("bob") == 2
+    assert [r["id"] for r in review_queue.claim("carol", limit=5)] == ["c2", "c3"]
+    assert review_queue.heartbeat("alice") == ["c1"]
+
+
+def test_update_without_reviewer_respects_claims(review_db):
+    for i in range(3):
+        review_queue.enqueue(f"n{i}", {"text": f"t{i}", "clean_text": f"T{i}", "flags": [], "changes": []})
+    assert [r["id"] for r in review_queue.claim("alice", limit=1)] == ["n0"]
+
+    with pytest.raises(review_queue.ReviewConflict):
+        review_queue.update("n0", approved=False)
+    assert db.get_review("n0")["status"] == "pending"
+
+    assert review_queue.update("n1", approved=True)["status"] == "approved"
+    with pytest.raises(review_queue.ReviewConflict):
+        review_queue.update("n1", approved=False)
+    assert db.get_review("n1")["status"] == "approved"
+
+    # Once the claim is released, anyone may decide the item.
+    review_queue.release("alice")
+    assert review_queue.update("n0", approved=False)["status"] == "rejected"
@@ -0,0 +1,174 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import config, db
+from app.review_store import SQLiteReviewStore, get_store, open_store
+
+# A disposable database; its review tables are dropped before each test.
+PG_URL = os.environ.get("REVIEW_STORE_TEST_PG_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def store(request, review_db):
+    if request.param == "sqlite":
+        yield SQLiteReviewStore()
+        return
+    if not PG_URL:
+        pytest.skip("REVIEW_STORE_TEST_PG_URL not set")
+    # With a database configured (as in CI), a missing driver is an error.
+    import psycopg
+
+    with psycopg.connect(PG_URL, autocommit=True) as conn:
+        conn.execute(
+            "DROP TABLE IF EXISTS review_queue, rule_patterns, learner_state,"
+            " review_counters, review_series, review_flags, review_changes"
+        )
+        conn.execute("DROP SEQUENCE IF EXISTS review_seq")
+    from app.pg_store import PostgresReviewStore
+
+    pg = PostgresReviewStore(PG_URL, min_size=1, max_size=4)
+    yield pg
+    pg.close()
+
+
+def test_store_contract(store):
+    same = {"text": "Sama", "clean_text": "Sama.", "flags": [{"type": "numeric_change"}], "changes": [{"type": "spelling", "source": "spell"}]}
+    store.upsert_reviews([(f"s{i}", dict(same)) for i in range(3)])
+    store.upsert_review("d", {"text": "Eri", "clean_text": "Eri.", "flags": [], "changes": []})
+
+    page = store.get_pending_page(limit=10)
+    assert [(r["id"], r["group_size"]) for r in page["items"]] == [("s0", 3), ("d", 1)]
+    assert [r["id"] for r in store.get_pending_page(flag_type="numeric_change")["items"]] == ["s0"]
+    assert [r["id"] for r in store.get_pending_page(change_source="spell")["items"]] == ["s0"]
+    assert store.get_review("s2")["text"] == "Sama"
+    assert len(store.get_pending_reviews()) == 4
+    assert store.get_flag_distribution() == {"numeric_change": 3}
+
+    first = store.claim_pending("r1", limit=1, lease_s=60)
+    second = store.claim_pending("r2", limit=5, lease_s=60)
+    assert [r["id"] for r in first] == ["s0"] and [r["id"] for r in second] == ["d"]
+    assert second[0]["claimed_by"] == "r2"
+    assert store.claim_pending("r3", limit=5) == []
+    assert store.claim_items("r1", ["d"]) == [] and store.heartbeat_claims("r2") == ["d"]
+    assert store.release_claims("r2") == 1 and store.claim_items("r1", ["d", "s1"]) == ["d"]
+
+    assert store.decide_group("s0", "approved", "Sama!") is None
+    assert len(store.decide_group("s0", "approved", "Sama!", reviewer="r1")) == 3
+    assert store.decide_group("missing", "approved") is None
+    assert store.get_review("s0")["claimed_by"] is None
+    assert store.get_queue_stats() == {"approved": 3, "pending": 1}
+    since = store.get_reviews_since(0)
+    assert [r["id"] for r in since] == ["s0"]
+    assert [r["id"] for r in store.get_review_history()] == ["s0"]
+
+    assert store.record_rule_patterns({("a", "b", "t"): 2}, since[-1]["seq"]) == {("a", "b", "t"): 2}
+    assert store.get_learner_watermark() == since[-1]["seq"]
+    assert store.get_rule_patterns(min_count=2)[0]["count"] == 2
+
+
+def test_concurrent_writers_elect_one_leader(store):
+    from concurrent.futures import ThreadPoolExecutor
+
+    payload = {"text": "Sama", "clean_text": "Sama.", "flags": [], "changes": []}
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda i: store.upsert_review(f"c{i}", dict(payload)), range(32)))
+    page = store.get_pending_page(limit=50)["items"]
+    assert len(page) == 1 and page[0]["group_size"] == 32
+
+
+def test_racing_decisions_apply_once(store):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store.upsert_reviews([(f"r{i}", {"text": "Sama", "clean_text": "Sama.", "flags": [], "changes": []}) for i in range(3)])
+    store.upsert_review("held", {"text": "Eri", "clean_text": "Eri.", "flags": [], "changes": []})
+    assert store.claim_items("alice", ["held"]) == ["held"]
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(lambda i: store.decide_group("r0", ("approved", "rejected")[i % 2], f"fix {i}"), range(8)))
+    assert sum(r is not None for r in results) == 1
+    assert [len(r) for r in results if r is not None] == [3]
+    assert store.get_queue_stats()["pending"] == 1
+
+    assert store.decide_group("held", "approved") is None
+    assert store.decide_group("held", "approved", reviewer="bob") is None
+    assert len(store.decide_group("held", "approved", reviewer="alice")) == 1
+
+
+def test_statistics_follow_writes(store):
+    spell = {"type": "spelling", "source": "spell"}
+    store.upsert_reviews(
+        [
+            ("a", {"text": "abcd", "clean_text": "abc", "flags": [{"type": "numeric_change"}], "changes": [spell, spell]}),
+            ("a2", {"text": "abcd", "clean_text": "abc", "flags": [{"type": "numeric_change"}], "changes": [spell, spell]}),
+            ("b", {"text": "xy", "clean_text": "xyz", "flags": ["embedded_en"], "changes": [{"type": "grammar", "source": "slm"}]}),
+        ]
+    )
+    # A rewrite with new flags replaces the old ones; the status is unchanged.
+    store.upsert_review("b", {"text": "xy", "clean_text": "xyz", "flags": [{"type": "term_change"}], "changes": []})
+    assert store.decide_group("a", "approved", "Abcd") is not None
+
+    assert store.get_queue_stats() == {"approved": 2, "pending": 1}
+    assert store.get_length_stats() == {"count": 2, "avg_input": 3.0, "avg_clean": 3.0, "avg_delta": 0.0}
+    assert store.get_flag_distribution() == {"term_change": 1}
+    assert store.get_flag_distribution("approved") == {"numeric_change": 2}
+    changes = store.get_change_distribution(None)
+    assert changes == [{"source": "spell", "type": "spelling", "items": 2, "changes": 4}]
+    assert type(changes[0]["changes"]) is int
+    totals = {}
+    for row in store.get_review_series(0):
+        totals[row["status"]] = totals.get(row["status"], 0) + row["n"]
+    assert totals == {"pending": 3, "approved": 2}
+    assert store.get_review_series(0, status="approved")[0]["n"] == 2
+
+
+def test_concurrent_claims_are_disjoint(store):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store.upsert_reviews([(f"q{i}", {"text": f"t{i}", "clean_text": f"T{i}", "flags": [], "changes": []}) for i in range(20)])
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        claims = list(ex.map(lambda i: [r["id"] for r in store.claim_pending(f"r{i}", limit=3)], range(8)))
+    claimed = [item_id for ids in claims for item_id in ids]
+    assert len(claimed) == len(set(claimed)) == 20
+
+
+def test_postgres_backfills_statistics(store):
+    if isinstance(store, SQLiteReviewStore):
+        pytest.skip("PostgreSQL only; SQLite backfills in its migrations")
+    from app.pg_store import PostgresReviewStore
+
+    store.upsert_reviews([(f"f{i}", {"text": "t", "clean_text": "T", "flags": ["numeric_change"], "changes": []}) for i in range(3)])
+    store.upsert_review("g", {"text": "u", "clean_text": "U", "flags": [], "changes": []})
+    assert store.decide_group("g", "rejected") is not None
+    expected = (store.get_queue_stats(), store.get_length_stats(), store.get_flag_distribution(None))
+    with store.pool.connection() as conn:
+        conn.execute("DROP TRIGGER review_queue_stats ON review_queue")
+        conn.execute("TRUNCATE review_counters, review_series, review_flags, review_changes")
+
+    reopened = PostgresReviewStore(PG_URL, min_size=1, max_size=2)
+    try:
+        assert (reopened.get_queue_stats(), reopened.get_length_stats(), reopened.get_flag_distribution(None)) == expected
+        assert {r["status"]: r["n"] for r in reopened.get_review_series(0)} == {"pending": 4, "rejected": 1}
+        reopened.upsert_review("h", {"text": "v", "clean_text": "V", "flags": [], "changes": []})
+        assert reopened.get_queue_stats() == {"pending": 4, "rejected": 1}
+    finally:
+        reopened.close()
+
+
+def test_get_store_follows_url(review_db, tmp_path, monkeypatch):
+    assert isinstance(get_store(), SQLiteReviewStore)
+    path = tmp_path / "other.db"
+    monkeypatch.setattr(config, "REVIEW_STORE_URL", f"sqlite:///{path}")
+    store = get_store()
+    assert store.key == f"sqlite:///{path}"
+    # The store keeps its own file; the module default is left alone.
+    assert db.DB_PATH == review_db and store.path == path
+    store.upsert_review("x", {"text": "t", "clean_text": "c"})
+    assert store.get_queue_stats() == {"pending": 1}
+    assert [r["id"] for r in store.claim_pending("r1")] == ["x"]
+    assert db.get_queue_stats() == {}
+    with pytest.raises(ValueError):
+        open_store("mysql://localhost/reviews")
@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import routing
+from app.pipeline import run_pipeline
+
+
+def test_parse_and_choose_routes(tmp_path):
+    spec = [
+        {"name": "small", "model_path": "tiny.gguf", "max_chars": 40, "langs": ["fi", "en"]},
+        {"name": "large", "model_path": "large.gguf", "concurrency": 2},
+    ]
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(spec), encoding="utf-8")
+    for source in (json.dumps(spec), str(path)):
+        routes = routing.parse_routes(source)
+        assert [r.name for r in routes] == ["small", "large"]
+        assert routes[1].concurrency == 2
+
+    assert routing.choose_route({"length": 30, "lang": "fi"}, routes).name == "small"
+    assert routing.choose_route({"length": 30, "lang": "mixed"}, routes).name == "large"
+    assert routing.choose_route({"length": 300, "lang": "en"}, routes).name == "large"
+
+
+def test_pipeline_uses_chosen_route(monkeypatch):
+    calls = []
+
+    def loader(name):
+        def load():
+            calls.append(name)
+            return None  # stub model
+
+        return load
+
+    routes = [
+        routing.Route("small", max_chars=60, langs=["fi"], loader=loader("small")),
+        routing.Route("large", loader=loader("large")),
+    ]
+    monkeypatch.setattr(routing, "_ROUTES", routes)
+
+    run_pipeline("Tämä takki on lämmin.")
+    run_pipeline("Tämä takki on super warm for winter commutes kaupungilla.")
+    assert calls == ["small", "large"]
+
+
+def test_preload_loads_every_route(monkeypatch):
+    import importlib
+
+    loaded = []
+    routes = [routing.Route(name, loader=lambda name=name: loaded.append(name)) for name in ("small", "large")]
+    monkeypatch.setattr(routing, "_ROUTES", routes)
+
+    from app import model_preload
+
+    loaded.clear()
+    importlib.reload(model_preload)
+    assert loaded == ["small", "large"]
+
+
+def test_each_call_holds_its_own_model_instance(monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    class Model:
+        """Fails if two calls use it at once, as a llama.cpp context would."""
+
+        created = []
+
+        def __init__(self, **kwargs):
+            self.busy = threading.Lock()
+            Model.created.append(self)
+
+        def call(self):
+            assert self.busy.acquire(blocking=False), "model used concurrently"
+            time.sleep(0.01)
+            self.busy.release()
+
+    monkeypatch.setattr(routing, "FAKE_LLM", False)
+    monkeypatch.setattr(routing, "Llama", Model)
+    shared = Model()
+    routes = [
+        routing.Route("pooled", model_path="large.gguf", concurrency=2),
+        routing.Route("loaded", loader=lambda: shared, concurrency=4),
+    ]
+    for route in routes:
+        Model.created.clear()
+
+        def call(_, route=route):
+            with route.model() as model:
+                model.call()
+
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            list(ex.map(call, range(32)))
+        # A loader hands out one shared model, so only one call holds it.
+        assert len(Model.created) == (2 if route.model_path else 0)
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.slm_llamacpp import CountingDraft, build_draft_model
+
+
+def test_counting_draft_measures_acceptance():
+    proposals = iter([[4, 5, 6], [10, 11], [1, 1]])
+    draft = CountingDraft(lambda ids, **_: np.array(next(proposals), dtype=np.intc), "prompt_lookup")
+
+    draft(np.array([1, 2, 3], dtype=np.intc))
+    # The main model kept 4, 5 and then sampled 9 instead of 6.
+    draft(np.array([1, 2, 3, 4, 5, 9], dtype=np.intc))
+    # A new prompt: the pending proposal [10, 11] is not scored.
+    draft(np.array([7, 8], dtype=np.intc))
+
+    assert draft.proposed == 7
+    assert draft.accepted == 2
+    assert abs(draft.acceptance_rate - 2 / 7) < 1e-9
+
+
+def test_draft_off_by_default():
+    from loguru import logger
+
+    events = []
+    sink = logger.add(lambda m: events.append(m.record["extra"].get("event")), level="WARNING")
+    try:
+        assert build_draft_model(mode="off") is None
+        assert build_draft_model(mode="prompt-lookup") is None
+    finally:
+        logger.remove(sink)
+    assert events == ["draft_mode_unknown"]
@@ -1,22 +1,40 @@
 import argparse
+import difflib
+import json
+import platform
+import tempfile
 import time
 import random
 from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from pathlib import Path
 import os
 import sys
+from typing import Callable, Dict, Iterable, List
 
 import pandas as pd
 
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT))
 
+from app import db
+from app import pipeline
 from app.pipeline import run_pipeline
 from app.io_utils import parse_terms
+from app.guardrails import JSON_END, JSON_START, extract_json
+from app.lang_utils import lang_spans
+from app.learner import Learner
+from app.fake_llama import FakeLlama
+from app.slm_llamacpp import CountingDraft
+from tools.synth_corpus import TERMS, generate_corpus
 
 
 MAX_RETRIES = 3
+# Metrics where a larger value is a regression; everything else compared is
+# a "higher is better" rate.
+HIGHER_IS_WORSE = {"median_ms", "p95_ms", "median_us", "p95_us"}
+LOWER_IS_WORSE = {"throughput_rps"}
 
 
 def _process_row(row):
@@ -39,28 +57,23 @@ def _process_row(row):
     return (end - start), retries, res.get("flags", [])
 
 
-def main():
-    ap = argparse.ArgumentParser(description="Benchmark the cleaning pipeline")
-    ap.add_argument("--file", required=True, help="Input CSV/Excel file with text column")
-    ap.add_argument("--workers", type=int, default=1, help="Number of worker threads")
-    ap.add_argument("--samples", type=int, default=200, help="Number of rows to sample")
-    args = ap.parse_args()
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
 
-    df = pd.read_csv(args.file) if Path(args.file).suffix.lower().endswith(".csv") else pd.read_excel(args.file)
-    n = args.samples
-    if n > len(df):
-        sampled = df.sample(n=n, replace=True, random_state=random.randint(0, 1_000_000))
-    else:
-        sampled = df.sample(n=n, random_state=random.randint(0, 1_000_000))
 
-    rows = sampled.to_dict("records")
+def _median(sorted_values: List[float]) -> float:
+    n = len(sorted_values)
+    return sorted_values[n // 2] if n % 2 == 1 else 0.5 * (sorted_values[n // 2 - 1] + sorted_values[n // 2])
 
+
+def bench_pipeline(rows: List[Dict], workers: int) -> Dict:
+    """Run the full pipeline over *rows* and return latency/throughput stats."""
     latencies = []
     total_retries = 0
     flag_counter = Counter()
 
     t0 = time.perf_counter()
-    with ThreadPoolExecutor(max_workers=args.workers) as ex:
+    with ThreadPoolExecutor(max_workers=workers) as ex:
         futures = [ex.submit(_process_row, r) for r in rows]
         for fut in as_completed(futures):
             dur, retries, flags = fut.result()
@@ -74,30 +87,209 @@ def main():
     t1 = time.perf_counter()
 
     if not latencies:
-        print("No rows processed")
-        return
+        return {"rows": 0}
+    lat_ms = sorted(l * 1000 for l in latencies)
+    total_time = t1 - t0
+    return {
+        "rows": len(lat_ms),
+        "median_ms": _median(lat_ms),
+        "p95_ms": _percentile(lat_ms, 0.95),
+        "throughput_rps": len(lat_ms) / total_time if total_time > 0 else float("inf"),
+        "retry_rate": total_retries / len(lat_ms),
+        "flags": dict(flag_counter),
+    }
 
-    lat_ms = [l * 1000 for l in latencies]
-    lat_ms.sort()
-    median = lat_ms[len(lat_ms)//2] if len(lat_ms)%2==1 else 0.5*(lat_ms[len(lat_ms)//2-1] + lat_ms[len(lat_ms)//2])
-    p95_index = min(len(lat_ms)-1, int(len(lat_ms)*0.95))
-    p95 = lat_ms[p95_index]
 
-    total_time = t1 - t0
-    throughput = len(lat_ms) / total_time if total_time > 0 else float('inf')
-    retry_rate = total_retries / len(lat_ms)
-
-    print(f"median latency: {median:.1f} ms")
-    print(f"95p latency: {p95:.1f} ms")
-    print(f"throughput: {throughput:.2f} rows/sec")
-    print(f"JSON-retry rate: {retry_rate*100:.1f}%")
-    if flag_counter:
+def _time_calls(fn: Callable, items: Iterable) -> Dict:
+    durations = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        durations.append(time.perf_counter() - start)
+    if not durations:
+        return {"n": 0}
+    total = sum(durations)
+    lat_us = sorted(d * 1e6 for d in durations)
+    return {
+        "n": len(lat_us),
+        "median_us": _median(lat_us),
+        "p95_us": _percentile(lat_us, 0.95),
+        "ops_per_s": len(lat_us) / total if total > 0 else float("inf"),
+    }
+
+
+def _perturb(text: str) -> str:
+    """Return a lightly edited copy of *text*, standing in for model output."""
+    return text.replace(",", "", 1).replace(" on ", " On ").replace("  ", " ")
+
+
+def bench_stages(texts: List[str]) -> Dict[str, Dict]:
+    """Micro-benchmark the individual pipeline stages on *texts*."""
+    stages: Dict[str, Dict] = {}
+    stages["lang_spans"] = _time_calls(lang_spans, texts)
+    if pipeline.SP_EN is None:
+        stages["en_misspellings"] = {"n": 0, "available": False}
+    else:
+        stages["en_misspellings"] = _time_calls(pipeline.en_misspellings, texts)
+    payloads = [
+        JSON_START + json.dumps({"clean_text": t, "flags": [], "changes": []}, ensure_ascii=False) + JSON_END
+        for t in texts
+    ]
+    stages["extract_json"] = _time_calls(extract_json, payloads)
+    stages["difflib"] = _time_calls(
+        lambda pair: difflib.SequenceMatcher(a=pair[0], b=pair[1]).get_opcodes(),
+        [(t, _perturb(t)) for t in texts],
+    )
+    learner = Learner()
+    learner.rules = [
+        {"type": "casing", "pattern": term.lower(), "fix": term, "confidence": 1.0} for term in TERMS
+    ]
+    stages["harmonize"] = _time_calls(learner.harmonize, texts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        stages["db_enqueue"] = _time_calls(
+            lambda item: db.upsert_review(item[0], item[1], path=path),
+            [
+                (f"bench-{i}", {"text": t, "clean_text": _perturb(t), "flags": [{"type": "high_risk_rewrite"}], "changes": []})
+                for i, t in enumerate(texts)
+            ],
+        )
+    return stages
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Return human-readable regressions of *current* against *baseline*."""
+    regressions = []
+    sections = [("pipeline", baseline.get("pipeline") or {}, current.get("pipeline") or {})]
+    for name, stats in (current.get("stages") or {}).items():
+        sections.append((f"stages.{name}", (baseline.get("stages") or {}).get(name) or {}, stats))
+    for section, base, cur in sections:
+        for metric in sorted(HIGHER_IS_WORSE | LOWER_IS_WORSE):
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            if metric in HIGHER_IS_WORSE and c > b * (1 + threshold):
+                regressions.append(f"{section}.{metric}: {b:.1f} -> {c:.1f} (+{(c / b - 1) * 100:.0f}%)")
+            elif metric in LOWER_IS_WORSE and c < b * (1 - threshold):
+                regressions.append(f"{section}.{metric}: {b:.1f} -> {c:.1f} (-{(1 - c / b) * 100:.0f}%)")
+    return regressions
+
+
+def _print_pipeline(stats: Dict) -> None:
+    if not stats.get("rows"):
+        print("No rows processed")
+        return
+    print(f"median latency: {stats['median_ms']:.1f} ms")
+    print(f"95p latency: {stats['p95_ms']:.1f} ms")
+    print(f"throughput: {stats['throughput_rps']:.2f} rows/sec")
+    print(f"JSON-retry rate: {stats['retry_rate']*100:.1f}%")
+    if stats["flags"]:
         print("flag distribution:")
-        for k, v in flag_counter.items():
+        for k, v in stats["flags"].items():
             print(f"  {k}: {v}")
     else:
         print("flag distribution: none")
 
 
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the cleaning pipeline")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--file", help="Input CSV/Excel file with text column")
+    src.add_argument("--synthetic", type=int, metavar="N", help="Generate N synthetic rows instead of reading a file")
+    ap.add_argument("--workers", type=int, default=1, help="Number of worker threads")
+    ap.add_argument("--samples", type=int, default=200, help="Number of rows to sample")
+    ap.add_argument("--seed", type=int, default=None, help="Seed for sampling and corpus generation")
+    ap.add_argument("--stages", action="store_true", help="Also run per-stage micro-benchmarks")
+    ap.add_argument("--json-out", help="Write machine-readable results to this JSON file")
+    ap.add_argument("--compare", help="Baseline JSON to compare against; exits 1 on regressions")
+    ap.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (default 0.10)")
+    ap.add_argument("--fake-llm", action="store_true", help="Use the fake model latency backend instead of a GGUF")
+    ap.add_argument("--fake-prompt-tps", type=float, default=200.0, help="Fake prompt-eval tokens/sec")
+    ap.add_argument("--fake-decode-tps", type=float, default=20.0, help="Fake decode tokens/sec")
+    ap.add_argument("--fake-ttft-ms", type=float, default=50.0, help="Fake fixed time-to-first-token overhead")
+    ap.add_argument("--fake-json-fail-rate", type=float, default=0.0, help="Share of fake answers with broken JSON")
+    args = ap.parse_args()
+
+    if args.fake_llm:
+        pipeline._LLAMA = FakeLlama(
+            prompt_tps=args.fake_prompt_tps,
+            decode_tps=args.fake_decode_tps,
+            ttft_ms=args.fake_ttft_ms,
+            json_fail_rate=args.fake_json_fail_rate,
+        )
+    llama = pipeline._load_llama()
+    if isinstance(llama, FakeLlama):
+        model_kind = "fake"
+    else:
+        model_kind = "llama" if llama is not None else "stub"
+
+    seed = args.seed if args.seed is not None else random.randint(0, 1_000_000)
+    if args.synthetic:
+        df = generate_corpus(args.synthetic, seed=seed)
+    else:
+        df = pd.read_csv(args.file) if Path(args.file).suffix.lower().endswith(".csv") else pd.read_excel(args.file)
+    n = args.samples
+    if n > len(df):
+        sampled = df.sample(n=n, replace=True, random_state=seed)
+    else:
+        sampled = df.sample(n=n, random_state=seed)
+
+    rows = sampled.to_dict("records")
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "model": model_kind,
+            "model_path": pipeline.MODEL_PATH,
+            "fake_llm": {k: v for k, v in vars(llama).items() if not k.startswith("_")} if model_kind == "fake" else None,
+            "source": f"synthetic:{args.synthetic}" if args.synthetic else args.file,
+            "samples": n,
+            "workers": args.workers,
+            "seed": seed,
+        },
+        "pipeline": bench_pipeline(rows, args.workers),
+    }
+    print(f"model: {results['meta']['model']}")
+    _print_pipeline(results["pipeline"])
+    draft = getattr(llama, "draft_model", None)
+    if isinstance(draft, CountingDraft):
+        results["draft"] = {
+            "mode": draft.mode,
+            "proposed": draft.proposed,
+            "accepted": draft.accepted,
+            "acceptance_rate": draft.acceptance_rate,
+        }
+        print(f"draft ({draft.mode}) acceptance: {draft.acceptance_rate*100:.1f}% of {draft.proposed} tokens")
+
+    if args.stages:
+        results["stages"] = bench_stages([str(r.get("text", "")) for r in rows])
+        print("stages (median / p95 us):")
+        for name, stats in results["stages"].items():
+            if stats.get("n"):
+                print(f"  {name}: {stats['median_us']:.1f} / {stats['p95_us']:.1f}")
+            else:
+                print(f"  {name}: unavailable")
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("model") != results["meta"]["model"]:
+            raise SystemExit(
+                f"baseline model {baseline.get('meta', {}).get('model')!r} differs from {results['meta']['model']!r}"
+            )
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print("regressions:")
+            for r in regressions:
+                print(f"  {r}")
+            raise SystemExit(1)
+        print("no regressions")
+
+
 if __name__ == "__main__":
     main()
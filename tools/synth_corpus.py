@@ -0,0 +1,166 @@
+"""Synthetic FI/EN product-text corpus for benchmarking.
+
+Rows follow the shape of ``data/mock_inputs.csv``: Finnish product copy with
+embedded English fragments, prices, SKUs, sizes, percentages and protected
+brand terms.  Generation is deterministic for a given seed.
+"""
+
+import argparse
+import math
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.io_utils import write_table
+
+
+FI_CLAUSES = [
+    "Tämä takki on lämmin ja kevyt",
+    "väri on tummansininen",
+    "materiaali kestää sadetta",
+    "sopii pitkille vaelluksille",
+    "huolto: pesu 30 asteessa",
+    "paketissa tulee käyttöohjeet",
+    "heijastimet parantavat näkyvyyttä",
+    "malli on suosittu klassikko",
+    "hinta riippuu koosta",
+    "tuote on myynnissä vain tänään",
+]
+EN_CLAUSES = [
+    "super warm for winter commutes",
+    "the fabric is durable",
+    "breathable and water-proof",
+    "limited edition available now",
+    "replacement parts sold separately",
+    "perfect for office casual",
+    "battery life up to 24h",
+    "fits true to size",
+]
+TERMS = ["NorthFace 1996", "ABC-123", "XYZ-789", "Pro-200", "Fjällräven Kånken", "Helly Hansen"]
+
+
+def _entity(rng: random.Random) -> str:
+    kind = rng.choice(["price", "sku", "size", "dimensions", "percent", "range"])
+    if kind == "price":
+        return f"{rng.randint(5, 499)},{rng.choice(['00', '90', '95'])} €"
+    if kind == "sku":
+        return f"{''.join(rng.choices('ABCDEFGHJKLMNPRSTUVXYZ', k=3))}-{rng.randint(100, 999)}"
+    if kind == "size":
+        return rng.choice(["XS", "S", "M", "L", "XL", "XXL"])
+    if kind == "dimensions":
+        return f"{rng.randint(10, 90)}x{rng.randint(10, 90)} cm"
+    if kind == "percent":
+        return f"-{rng.choice([5, 10, 15, 20, 30, 50])}%"
+    low = rng.randint(10, 40)
+    return f"{low}–{low + rng.randint(2, 15)} €"
+
+
+def _sentence_count(rng: random.Random, dist: str, mean: float, max_sentences: int) -> int:
+    if dist == "fixed":
+        n = round(mean)
+    elif dist == "uniform":
+        n = rng.randint(1, max(1, round(2 * mean - 1)))
+    else:  # lognormal: mostly short rows with a long tail
+        n = round(rng.lognormvariate(math.log(max(mean, 1.0)), 0.6))
+    return max(1, min(max_sentences, n))
+
+
+def generate_corpus(
+    n: int,
+    seed: int = 0,
+    length_dist: str = "lognormal",
+    mean_sentences: float = 2.0,
+    max_sentences: int = 20,
+    mixed_ratio: float = 0.5,
+    en_share: float = 0.3,
+    en_row_ratio: float = 0.1,
+    entity_density: float = 0.5,
+    term_rate: float = 0.3,
+) -> pd.DataFrame:
+    """Return *n* synthetic rows with ``id,text,protected_terms,translate_embedded``.
+
+    ``mixed_ratio`` of the rows are Finnish with English clauses (each clause
+    English with probability ``en_share``), ``en_row_ratio`` are pure English
+    and the rest pure Finnish.  ``entity_density`` is the mean number of
+    locked entities per sentence and ``term_rate`` the share of rows carrying a
+    protected term.
+    """
+    rng = random.Random(seed)
+    rows: List[Dict] = []
+    for i in range(n):
+        roll = rng.random()
+        if roll < en_row_ratio:
+            mode = "en"
+        elif roll < en_row_ratio + mixed_ratio:
+            mode = "mixed"
+        else:
+            mode = "fi"
+        sentences = []
+        for _ in range(_sentence_count(rng, length_dist, mean_sentences, max_sentences)):
+            clauses = []
+            for _ in range(rng.randint(1, 3)):
+                use_en = mode == "en" or (mode == "mixed" and rng.random() < en_share)
+                clauses.append(rng.choice(EN_CLAUSES if use_en else FI_CLAUSES))
+            # Poisson-distributed entity count per sentence.
+            k, p, limit = 0, rng.random(), math.exp(-entity_density)
+            while p > limit:
+                k += 1
+                p *= rng.random()
+            clauses.extend(_entity(rng) for _ in range(k))
+            sentence = ", ".join(clauses)
+            sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        terms = []
+        if rng.random() < term_rate:
+            term = rng.choice(TERMS)
+            terms.append(term)
+            sentences.insert(rng.randint(0, len(sentences)), f"Malli {term} on klassikko.")
+        rows.append(
+            {
+                "id": i + 1,
+                "text": " ".join(sentences),
+                "protected_terms": "; ".join(terms),
+                "translate_embedded": mode != "fi" and rng.random() < 0.5,
+            }
+        )
+    return pd.DataFrame(rows, columns=["id", "text", "protected_terms", "translate_embedded"])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic FI/EN benchmark corpus")
+    ap.add_argument("-n", "--rows", type=int, default=1000, help="Number of rows")
+    ap.add_argument("-o", "--output", required=True, help="Output CSV/Excel path")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--length-dist", choices=["lognormal", "uniform", "fixed"], default="lognormal")
+    ap.add_argument("--mean-sentences", type=float, default=2.0)
+    ap.add_argument("--max-sentences", type=int, default=20)
+    ap.add_argument("--mixed-ratio", type=float, default=0.5, help="Share of FI rows with embedded EN")
+    ap.add_argument("--en-share", type=float, default=0.3, help="Share of EN clauses within mixed rows")
+    ap.add_argument("--en-row-ratio", type=float, default=0.1, help="Share of pure EN rows")
+    ap.add_argument("--entity-density", type=float, default=0.5, help="Mean locked entities per sentence")
+    ap.add_argument("--term-rate", type=float, default=0.3, help="Share of rows with a protected term")
+    args = ap.parse_args()
+
+    df = generate_corpus(
+        args.rows,
+        seed=args.seed,
+        length_dist=args.length_dist,
+        mean_sentences=args.mean_sentences,
+        max_sentences=args.max_sentences,
+        mixed_ratio=args.mixed_ratio,
+        en_share=args.en_share,
+        en_row_ratio=args.en_row_ratio,
+        entity_density=args.entity_density,
+        term_rate=args.term_rate,
+    )
+    write_table(df, args.output)
+    print(f"wrote {len(df)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
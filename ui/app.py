@@ -20,24 +20,68 @@ def call_clean(text: str, terms=None, translate=False, rid=None):
     return resp.json()
 
 
+REVIEW_FLAG_FILTERS = ["", "numeric_change", "high_risk_rewrite", "locked_entity_changed", "harmonized", "embedded_en"]
+
+
+def decide(item_id: str, body: dict, reviewer: str = ""):
+    if reviewer:
+        body = dict(body, reviewer=reviewer)
+    resp = requests.post(f"{API_URL}/review/{item_id}", json=body, timeout=10)
+    if resp.status_code == 409:
+        st.warning(resp.json().get("detail", "Item was taken by another reviewer."))
+        return
+    st.rerun()
+
+
 def review_tab():
     st.header("Review Queue (via API)")
+    # Cursors of the pages visited so far; the last entry is the current page.
+    cursors = st.session_state.setdefault("review_cursors", [None])
+    col_flag, col_size = st.columns(2)
+    with col_flag:
+        flag = st.selectbox("Filter by flag", REVIEW_FLAG_FILTERS, format_func=lambda f: f or "(all)")
+    with col_size:
+        page_size = st.selectbox("Page size", [10, 20, 50], index=1)
+    if st.session_state.get("review_filter") != (flag, page_size):
+        st.session_state["review_filter"] = (flag, page_size)
+        cursors[:] = [None]
+
+    # With a reviewer name, items are claimed so other reviewers skip them.
+    reviewer = st.text_input("Reviewer name (claims items while you work)", key="reviewer").strip()
     try:
-        resp = requests.get(f"{API_URL}/reviews/pending", timeout=10)
-        resp.raise_for_status()
-        items = resp.json()
+        if reviewer:
+            resp = requests.post(
+                f"{API_URL}/reviews/claim", json={"reviewer": reviewer, "limit": page_size}, timeout=10
+            )
+            resp.raise_for_status()
+            page = {"items": resp.json().get("items", []), "next_cursor": None}
+            if st.button("Release my items"):
+                requests.post(f"{API_URL}/reviews/release", json={"reviewer": reviewer}, timeout=10)
+                st.session_state["reviewer"] = ""
+                st.rerun()
+        else:
+            params = {"limit": page_size, "view": "full"}
+            if cursors[-1] is not None:
+                params["cursor"] = cursors[-1]
+            if flag:
+                params["flag"] = flag
+            resp = requests.get(f"{API_URL}/reviews/pending", params=params, timeout=10)
+            resp.raise_for_status()
+            page = resp.json()
     except Exception as exc:
         st.error(f"Failed to load review queue: {exc}")
         return
 
-    pending = [i for i in items if i.get("status") == "pending"]
+    pending = page.get("items", [])
     if not pending:
         st.info("No pending items.")
-        return
 
     for item in pending:
         iid = item.get("id", "")
         st.subheader(f"ID: {iid}")
+        group_size = item.get("group_size") or 1
+        if group_size > 1:
+            st.caption(f"Identical to {group_size - 1} other pending item(s); a decision applies to all {group_size}.")
         col1, col2 = st.columns(2)
         with col1:
             st.text_area("Original", item.get("text", ""), height=180, key=f"orig_{iid}")
@@ -54,17 +98,24 @@ def review_tab():
         col_ok, col_rej, col_edit = st.columns(3)
         with col_ok:
             if st.button(f"Approve {iid}", key=f"approve_{iid}"):
-                requests.post(f"{API_URL}/review/{iid}", json={"approved": True})
-                st.rerun()
+                decide(iid, {"approved": True}, reviewer)
         with col_rej:
             if st.button(f"Reject {iid}", key=f"reject_{iid}"):
-                requests.post(f"{API_URL}/review/{iid}", json={"approved": False})
-                st.rerun()
+                decide(iid, {"approved": False}, reviewer)
         with col_edit:
             correction = st.text_area("Edit & Approve", value=item.get("clean_text", ""), key=f"edit_{iid}")
             if st.button(f"Save {iid}", key=f"save_{iid}"):
-                requests.post(f"{API_URL}/review/{iid}", json={"approved": True, "correction": correction})
-                st.rerun()
+                decide(iid, {"approved": True, "correction": correction}, reviewer)
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if len(cursors) > 1 and st.button("Previous page"):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if page.get("next_cursor") is not None and st.button("Next page"):
+            cursors.append(page["next_cursor"])
+            st.rerun()
 
 
 def upload_tab():
@@ -130,14 +181,36 @@ def analytics_tab():
             )
 
     try:
-        rules = requests.get(f"{API_URL}/stats/rules", timeout=10).json()
+        series = requests.get(f"{API_URL}/stats/series", params={"hours": 48}, timeout=10).json()
+    except Exception as exc:
+        st.error(f"Failed to load review series: {exc}")
+        series = []
+    if series:
+        st.subheader("Reviews per hour (last 48 h)")
+        df = pd.DataFrame(series)
+        df["bucket"] = pd.to_datetime(df["bucket"], unit="s")
+        st.line_chart(df.pivot_table(index="bucket", columns="status", values="n", fill_value=0))
+
+    try:
+        flag_stats = requests.get(f"{API_URL}/stats/flags", timeout=10).json()
+    except Exception as exc:
+        st.error(f"Failed to load flag stats: {exc}")
+        flag_stats = {}
+    if flag_stats.get("flags"):
+        st.subheader("Pending items per flag")
+        st.bar_chart(pd.DataFrame.from_dict(flag_stats["flags"], orient="index", columns=["items"]))
+
+    try:
+        rules = requests.get(
+            f"{API_URL}/stats/rules", params={"sort": "confidence", "limit": 200}, timeout=10
+        ).json()
     except Exception as exc:
         st.error(f"Failed to load rules: {exc}")
-        rules = []
+        rules = {}
     st.subheader("Learned harmonization rules")
-    if rules:
-        df = pd.DataFrame(rules).sort_values(by="confidence", ascending=False)
-        st.table(df)
+    if rules.get("items"):
+        st.caption(f"Top {len(rules['items'])} of {rules['total']} rules by confidence")
+        st.table(pd.DataFrame(rules["items"]))
     else:
         st.write("No rules learned yet.")
 